@@ -1,19 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse, FileResponse, JSONResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from ..app.database import get_db
+from ..app.database import get_db, SessionLocal
+from ..app.exporters import stream_fires_csv, forces_summary
+from ..app.queries import analytics_by_region_month, fire_date_filters
+from ..app.forecasting import get_registry, MODEL_TYPES, MAX_DAYS_AHEAD, ALL_REGIONS
+from ..app.reports import get_service as get_report_service, normalize_filters, FORMATS as REPORT_FORMATS, PENDING, RUNNING, DONE
 from .. import models, schemas
 from ..auth import get_current_user
 import logging
-import csv
-from io import StringIO, BytesIO
-from datetime import datetime, timedelta
-import pandas as pd
-from statsmodels.tsa.arima.model import ARIMA
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet
+from datetime import datetime
 
 router = APIRouter(prefix="/analytics", tags=["analytics"])
 logger = logging.getLogger(__name__)
@@ -28,7 +24,7 @@ logging.basicConfig(
 @router.get("/")
 def get_analytics(
     year: int = None,
-    month: int = None,
+    month: int = Query(None, ge=1, le=12),
     db: Session = Depends(get_db),
     user: models.User = Depends(get_current_user)
 ):
@@ -37,36 +33,7 @@ def get_analytics(
         logger.warning(f"Unauthorized access to analytics by user {user.id} with role {user.role}")
         raise HTTPException(status_code=403, detail="Only admins and analysts can access analytics")
     
-    query = db.query(
-        models.Fire.region,
-        func.extract('month', models.Fire.fire_date).label('month'),
-        func.count(models.Fire.id).label('count'),
-        func.sum(models.Fire.area).label('total_area'),
-        func.sum(models.Fire.damage_tenge).label('total_damage')
-    ).group_by(models.Fire.region, func.extract('month', models.Fire.fire_date))
-    
-    if year:
-        query = query.filter(func.extract('year', models.Fire.fire_date) == year)
-    if month:
-        query = query.filter(func.extract('month', models.Fire.fire_date) == month)
-    
-    results = query.all()
-    fires = db.query(models.Fire).all()  # Для получения полных данных о силах
-    
-    data = [
-        {
-            "region": row.region,
-            "month": int(row.month),
-            "count": row.count,
-            "total_area": float(row.total_area),
-            "total_damage": float(row.total_damage) if row.total_damage else 0,
-            "forces": [
-                {"force_type": f.force_type, "people_count": f.people_count}
-                for fire in fires if fire.region == row.region and fire.fire_date.month == row.month for f in fire.forces
-            ]
-        }
-        for row in results
-    ]
+    data = analytics_by_region_month(db, {"year": year, "month": month})
     
     logger.info(f"User {user.id} retrieved analytics data")
     return {"data": data}
@@ -75,48 +42,43 @@ def get_analytics(
 def predict_fires(
     days_ahead: int,
     model: str = "linear",
-    db: Session = Depends(get_db),
+    region: str = ALL_REGIONS,
     user: models.User = Depends(get_current_user)
 ):
-    """Прогнозирование площади пожаров с использованием линейной регрессии или ARIMA."""
+    """Прогноз площади пожаров по обученной модели из реестра (linear, arima или sarima)."""
     if user.role not in ["admin", "analyst"]:
         logger.warning(f"Unauthorized access to prediction by user {user.id} with role {user.role}")
         raise HTTPException(status_code=403, detail="Only admins and analysts can access predictions")
     
-    if days_ahead < 1 or days_ahead > 365:
-        raise HTTPException(status_code=400, detail="Days ahead must be between 1 and 365")
+    if days_ahead < 1 or days_ahead > MAX_DAYS_AHEAD:
+        raise HTTPException(status_code=400, detail=f"Days ahead must be between 1 and {MAX_DAYS_AHEAD}")
+    if model not in MODEL_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unsupported model. Use one of: {', '.join(MODEL_TYPES)}")
     
-    fires = db.query(models.Fire).order_by(models.Fire.fire_date).all()
-    dates = [fire.fire_date for fire in fires]
-    areas = [fire.area for fire in fires]
-    df = pd.DataFrame({"date": dates, "area": areas}).set_index("date").resample("D").sum().fillna(0)
+    prediction = get_registry().predict(model, region, days_ahead)
+    if prediction is None:
+        raise HTTPException(status_code=404, detail=f"No trained {model} model for region {region}")
     
-    try:
-        if model == "linear":
-            slope = (df["area"].iloc[-1] - df["area"].iloc[0]) / max(1, len(df) - 1)
-            predicted_area = max(0, df["area"].iloc[-1] + slope * days_ahead)
-        elif model == "arima":
-            arima_model = ARIMA(df["area"], order=(5, 1, 0)).fit()
-            forecast = arima_model.forecast(steps=days_ahead)
-            predicted_area = max(0, forecast.iloc[-1])
-        else:
-            raise HTTPException(status_code=400, detail="Unsupported model. Use 'linear' or 'arima'")
-        
-        predicted_date = (datetime.now() + timedelta(days=days_ahead)).strftime("%Y-%m-%d")
-        logger.info(f"User {user.id} generated {model} prediction for {days_ahead} days ahead: {predicted_area} ha")
-        return {
-            "success": True,
-            "date": predicted_date,
-            "predicted_area": float(predicted_area)
-        }
-    except Exception as e:
-        logger.error(f"Error in prediction for user {user.id}: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
+    logger.info(f"User {user.id} generated {model} prediction for {days_ahead} days ahead: {prediction['predicted_area']} ha")
+    return {"success": True, **prediction}
+
+@router.get("/models")
+def get_forecast_models(
+    model: str = None,
+    region: str = None,
+    user: models.User = Depends(get_current_user)
+):
+    """Метаданные обученных моделей прогноза: окно обучения, время обучения, ошибки."""
+    if user.role not in ["admin", "analyst"]:
+        logger.warning(f"Unauthorized access to forecast models by user {user.id} with role {user.role}")
+        raise HTTPException(status_code=403, detail="Only admins and analysts can access forecast models")
+    
+    return {"models": get_registry().models(model, region)}
 
 @router.get("/export/csv")
 def export_analytics_csv(
     year: int = None,
-    month: int = None,
+    month: int = Query(None, ge=1, le=12),
     db: Session = Depends(get_db),
     user: models.User = Depends(get_current_user)
 ):
@@ -125,33 +87,25 @@ def export_analytics_csv(
         logger.warning(f"Unauthorized export attempt by user {user.id} with role {user.role}")
         raise HTTPException(status_code=403, detail="Only admins and analysts can export analytics")
     
-    query = db.query(models.Fire)
-    if year:
-        query = query.filter(func.extract('year', models.Fire.fire_date) == year)
-    if month:
-        query = query.filter(func.extract('month', models.Fire.fire_date) == month)
-    
-    fires = query.all()
-    output = StringIO()
-    writer = csv.writer(output)
+    filters = fire_date_filters(year=year, month=month)
     
     headers = [
         "id", "fire_date", "region", "area", "damage_tenge", "forces", "quarter", "allotment",
         "damage_les", "damage_les_lesopokryt", "damage_les_verh", "damage_not_les", "firefighting_costs"
     ]
-    writer.writerow(headers)
-    
-    for fire in fires:
-        forces_str = "; ".join(f"{f.force_type}: {f.people_count} people, {f.tecnic_count} tecnic, {f.aircraft_count} aircraft" for f in fire.forces)
-        writer.writerow([
-            fire.id, fire.fire_date.isoformat(), fire.region, fire.area, fire.damage_tenge or 0, forces_str,
+    chunks = stream_fires_csv(
+        SessionLocal, filters, headers,
+        lambda fire: [
+            fire.id, fire.fire_date.isoformat(), fire.region, fire.area, fire.damage_tenge or 0, forces_summary(fire),
             fire.quarter or '', fire.allotment or '', fire.damage_les or 0, fire.damage_les_lesopokryt or 0,
             fire.damage_les_verh or 0, fire.damage_not_les or 0, fire.firefighting_costs or 0
-        ])
+        ],
+        with_forces=True
+    )
     
     logger.info(f"User {user.id} exported analytics to CSV")
-    return Response(
-        content=output.getvalue(),
+    return StreamingResponse(
+        chunks,
         media_type="text/csv",
         headers={"Content-Disposition": f"attachment; filename=analytics_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"}
     )
@@ -159,66 +113,67 @@ def export_analytics_csv(
 @router.get("/export/pdf")
 def export_analytics_pdf(
     year: int = None,
-    month: int = None,
+    month: int = Query(None, ge=1, le=12),
+    region: str = None,
     lang: str = "ru",
-    db: Session = Depends(get_db),
     user: models.User = Depends(get_current_user)
 ):
-    """Экспорт аналитических данных в PDF."""
+    """Экспорт списка пожаров в PDF (строится в пуле отчетов, повторные запросы — из кэша)."""
     if user.role not in ["admin", "analyst"]:
         logger.warning(f"Unauthorized export attempt by user {user.id} with role {user.role}")
         raise HTTPException(status_code=403, detail="Only admins and analysts can export analytics")
     
-    query = db.query(models.Fire)
-    if year:
-        query = query.filter(func.extract('year', models.Fire.fire_date) == year)
-    if month:
-        query = query.filter(func.extract('month', models.Fire.fire_date) == month)
-    
-    fires = query.all()
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter)
-    styles = getSampleStyleSheet()
-    elements = []
-
-    title = "Аналитика пожаров" if lang == "ru" else "Өрт аналитикасы"
-    elements.append(Paragraph(title, styles['Title']))
-    
-    headers = [
-        "ID", "Дата", "Регион", "Площадь (га)", "Ущерб (тенге)", "Силы", "Квартал", "Выдел",
-        "Ущерб лесу (га)", "Ущерб лесопокрытым (га)", "Ущерб верхним (га)", "Ущерб нелесным (га)", "Затраты (тенге)"
-    ]
-    data = [headers]
-    
-    for fire in fires:
-        forces_str = "; ".join(f"{f.force_type}: {f.people_count}" for f in fire.forces)
-        data.append([
-            str(fire.id), fire.fire_date.strftime("%Y-%m-%d %H:%M:%S"), fire.region, f"{fire.area:.2f}",
-            f"{fire.damage_tenge or 0:.2f}", forces_str, fire.quarter or '', fire.allotment or '',
-            f"{fire.damage_les or 0:.2f}", f"{fire.damage_les_lesopokryt or 0:.2f}", f"{fire.damage_les_verh or 0:.2f}",
-            f"{fire.damage_not_les or 0:.2f}", f"{fire.firefighting_costs or 0:.2f}"
-        ])
-    
-    table = Table(data)
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-    ]))
-    elements.append(table)
-    
-    doc.build(elements)
-    pdf_content = buffer.getvalue()
-    buffer.close()
+    service = get_report_service()
+    job = service.request("fires", "pdf", normalize_filters(year, month, region, lang), user.id)
+    if job["status"] in (PENDING, RUNNING):
+        job = service.wait(job["id"])
+    if job["status"] in (PENDING, RUNNING):
+        return JSONResponse(status_code=202, content={"job": job})
+    if job["status"] != DONE:
+        raise HTTPException(status_code=500, detail=f"Report failed: {job['error']}")
     
     logger.info(f"User {user.id} exported analytics to PDF")
-    return Response(
-        content=pdf_content,
+    return FileResponse(
+        job["file_path"],
         media_type="application/pdf",
-        headers={"Content-Disposition": f"attachment; filename=analytics_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"}
-    )
\ No newline at end of file
+        filename=f"analytics_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+    )
+
+@router.post("/reports", status_code=202)
+def create_report(
+    request: schemas.ReportRequest,
+    user: models.User = Depends(get_current_user)
+):
+    """Постановка отчета в очередь; готовый отчет с теми же фильтрами возвращается сразу."""
+    if user.role not in ["admin", "analyst"]:
+        logger.warning(f"Unauthorized report request by user {user.id} with role {user.role}")
+        raise HTTPException(status_code=403, detail="Only admins and analysts can request reports")
+    
+    try:
+        filters = normalize_filters(request.year, request.month, request.region, request.lang)
+        return {"job": get_report_service().request(request.type, request.format, filters, user.id)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/reports/{job_id}")
+def get_report(job_id: int, user: models.User = Depends(get_current_user)):
+    """Статус задания отчета."""
+    if user.role not in ["admin", "analyst"]:
+        raise HTTPException(status_code=403, detail="Only admins and analysts can access reports")
+    job = get_report_service().job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Report not found")
+    return {"job": job}
+
+@router.get("/reports/{job_id}/download")
+def download_report(job_id: int, user: models.User = Depends(get_current_user)):
+    """Скачивание готового отчета."""
+    if user.role not in ["admin", "analyst"]:
+        raise HTTPException(status_code=403, detail="Only admins and analysts can access reports")
+    job = get_report_service().job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Report not found")
+    if job["status"] != DONE:
+        raise HTTPException(status_code=409, detail=f"Report is {job['status']}")
+    return FileResponse(job["file_path"], media_type=REPORT_FORMATS[job["format"]],
+                        filename=f"{job['report_type']}_{job['id']}.{job['format']}")
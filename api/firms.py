@@ -1,9 +1,11 @@
 # /api/firms.py - NASA FIRMS API
 from flask import jsonify
-import requests
+from ..app.http_client import http_client, UpstreamError
 from . import firms_bp
 
 @firms_bp.route('/')
 def get_firms_data():
-    response = requests.get("https://firms.modaps.eosdis.nasa.gov/api/area/csv/...")
-    return response.text if response.status_code == 200 else jsonify({"error": "Ошибка получения данных"})
+    try:
+        return http_client.get_text("https://firms.modaps.eosdis.nasa.gov/api/area/csv/...")
+    except UpstreamError:
+        return jsonify({"error": "Ошибка получения данных"})
@@ -29,6 +29,7 @@ socketio = SocketIO(
     app,
     cors_allowed_origins="*",
     async_mode='eventlet',
+    message_queue=Config.SOCKETIO_MESSAGE_QUEUE,
     logger=True,
     engineio_logger=True
 )
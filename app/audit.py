@@ -0,0 +1,76 @@
+# audit.py
+import atexit
+import logging
+import queue
+import time
+from datetime import timedelta
+from typing import Callable, List, Optional
+from sqlalchemy import insert, select
+from sqlalchemy.sql import func as sql_func
+from models import AuditLog
+from batching import BatchWriter
+import cache_tags
+
+logger = logging.getLogger(__name__)
+
+
+class AuditQueue(BatchWriter):
+    """Буферизованная запись журнала аудита в фоновом потоке.
+
+    События копятся в ограниченной очереди и записываются пачками (многострочный INSERT,
+    один COMMIT на пачку), поэтому обработчик запроса не ждет базу данных. Пачка
+    сбрасывается при достижении batch_size событий или через flush_interval секунд.
+    Если очередь заполнена, put() ждет до put_timeout секунд, а затем записывает событие
+    синхронно — события не теряются, а нагрузка сдерживается.
+
+    Время события — по часам сервера БД, как у default=func.now() колонки timestamp
+    (локальное время сервера, а не UTC): при записи пачки берется текущее время БД и из
+    него вычитается время ожидания каждого события в очереди.
+    """
+
+    def __init__(self, session_factory: Callable, batch_size: int = 500, flush_interval: float = 1.0,
+                 max_size: int = 10000, put_timeout: float = 0.5):
+        super().__init__("audit-writer", batch_size, flush_interval, max_size)
+        self.session_factory = session_factory
+        self.put_timeout = put_timeout
+
+    def put(self, user_id: int, action: str, table_name: str, record_id: Optional[int] = None,
+            changes: Optional[str] = None) -> None:
+        """Ставит событие аудита в очередь на запись."""
+        event = {
+            'enqueued': time.monotonic(),
+            'user_id': user_id,
+            'action': action,
+            'table_name': table_name,
+            'record_id': record_id,
+            'changes': changes[:1000] if changes else changes
+        }
+        try:
+            self._enqueue(event, timeout=self.put_timeout)
+        except queue.Full:
+            logger.warning("Очередь аудита переполнена, событие записывается синхронно")
+            self._write([event])
+
+    def _write(self, events: List[dict]) -> None:
+        try:
+            with self.session_factory() as db:
+                now, clock = db.scalar(select(sql_func.now())), time.monotonic()
+                rows = [
+                    {**{key: value for key, value in event.items() if key != 'enqueued'},
+                     'timestamp': now - timedelta(seconds=clock - event['enqueued'])}
+                    for event in events
+                ]
+                db.execute(insert(AuditLog), rows)
+                cache_tags.track(db, {'logs'})
+                db.commit()
+        except Exception as e:
+            logger.error(f"Ошибка записи {len(events)} событий аудита: {str(e)}")
+
+
+def _create_default_queue() -> AuditQueue:
+    from database import SessionLocal
+    return AuditQueue(SessionLocal)
+
+
+audit_queue = _create_default_queue()
+atexit.register(audit_queue.close)
@@ -3,6 +3,7 @@ from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from .database import get_db
 from . import models, schemas
+from .principals import principal_cache
 from .config import Config
 import jwt
 from datetime import datetime, timedelta
@@ -28,7 +29,8 @@ def create_token(user_id: int, role: str, region: str):
 async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
     try:
         payload = jwt.decode(token, Config.SECRET_KEY, algorithms=["HS256"])
-        user = db.query(models.User).filter(models.User.id == payload["user_id"]).first()
+        # Пользователь берется из кэша процесса и присоединяется к сессии запроса без SELECT
+        user = principal_cache.attach(db, payload["user_id"])
         if not user:
             raise HTTPException(status_code=401, detail="Invalid token")
         return user
@@ -63,6 +65,7 @@ def setup_totp(current_user: models.User = Depends(get_current_user), db: Sessio
     
     current_user.totp_secret = totp_secret
     db.commit()
+    principal_cache.invalidate(current_user.id)
     logger.info(f"2FA setup initiated for user {current_user.id}")
     return {"totp_uri": totp_uri}
 
@@ -85,16 +88,19 @@ def update_profile(
         current_user.totp_secret = totp_secret
         totp_uri = pyotp.totp.TOTP(totp_secret).provisioning_uri(name=current_user.username, issuer_name="ForestFires")
         db.commit()
+        principal_cache.invalidate(current_user.id)
         logger.info(f"2FA enabled for user {current_user.id}")
         return {"totp_uri": totp_uri}
     
     if totp_disable and current_user.totp_secret:
         current_user.totp_secret = None
         db.commit()
+        principal_cache.invalidate(current_user.id)
         logger.info(f"2FA disabled for user {current_user.id}")
         return {"totp_disabled": True}
     
     db.commit()
+    principal_cache.invalidate(current_user.id)
     logger.info(f"Profile updated for user {current_user.id}")
     return {"success": True}
 
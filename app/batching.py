@@ -0,0 +1,94 @@
+# batching.py
+import os
+import queue
+import threading
+import time
+from typing import Any, List, Optional
+
+_STOP = object()
+
+
+class BatchWriter:
+    """Фоновый поток, записывающий элементы очереди пачками.
+
+    Элементы копятся в ограниченной очереди; поток забирает до batch_size элементов
+    или ждет не дольше flush_interval секунд после первого из них и передает пачку в
+    _write. Поток запускается лениво и заново после fork (воркеры gunicorn).
+    Наследники реализуют _write и при необходимости _open/_close — ресурсы, которые
+    принадлежат фоновому потоку (например, соединение с БД).
+    """
+
+    def __init__(self, name: str, batch_size: int, flush_interval: float, max_size: int):
+        self.name = name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_size)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def _enqueue(self, item: Any, timeout: Optional[float] = None) -> None:
+        """Ставит элемент в очередь; queue.Full, если место не освободилось за timeout секунд."""
+        self._ensure_started()
+        self._queue.put(item, timeout=timeout)
+
+    def _open(self) -> None:
+        """Вызывается в фоновом потоке перед первой пачкой."""
+
+    def _close(self) -> None:
+        """Вызывается в фоновом потоке после последней пачки."""
+
+    def _write(self, batch: List[Any]) -> None:
+        raise NotImplementedError
+
+    def _run(self) -> None:
+        self._open()
+        try:
+            stop = False
+            while not stop:
+                item = self._queue.get()
+                if item is _STOP:
+                    self._queue.task_done()
+                    break
+                batch = [item]
+                deadline = time.monotonic() + self.flush_interval
+                while len(batch) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = self._queue.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stop = True
+                        break
+                    batch.append(item)
+                try:
+                    self._write(batch)
+                finally:
+                    for _ in range(len(batch) + stop):
+                        self._queue.task_done()
+        finally:
+            self._close()
+
+    def flush(self) -> None:
+        """Блокирует до записи всех элементов, поставленных в очередь."""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.join()
+
+    def close(self) -> None:
+        """Записывает остаток очереди и останавливает фоновый поток."""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+        self._thread = None
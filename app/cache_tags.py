@@ -0,0 +1,235 @@
+# cache_tags.py
+import logging
+import os
+import threading
+import time
+import uuid
+from itertools import chain
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import msgpack
+import redis
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+ANY = '*'
+CHANNEL = 'response-cache:tags'     # Канал Redis с новыми версиями тегов
+KEY_PREFIX = 'response-cache:tag:'  # Ключи Redis с текущими версиями тегов
+LOCAL_TTL = 60         # Время жизни версии в памяти процесса, если версии приходят по pub/sub (секунды)
+TAG_TTL = 2            # Время жизни версии в памяти без pub/sub — задержка сброса между процессами
+RECONNECT_DELAY = 5    # Пауза перед переподключением подписчика (секунды)
+
+# Таблицы, запись в которые сбрасывает кэш ответов, и их теги
+TABLE_TAGS = {'fires': 'fires', 'fire_forces': 'fires', 'users': 'users', 'audit_logs': 'logs',
+              'forecast_models': 'forecasts', 'forecasts': 'forecasts'}
+
+
+def write_tags(region: Optional[str], year: Optional[int]) -> Set[str]:
+    """Теги, которые сбрасывает запись пожара региона region за год year."""
+    return {f"fires:{r}:{y}" for r in (region, ANY) for y in (year, ANY)}
+
+
+def fire_tags(region: Optional[str] = None, year: Optional[int] = None) -> List[str]:
+    """Теги данных по пожарам: таблица и окно (регион, год); None — все регионы или годы."""
+    return ['fires', f"fires:{region or ANY}:{year or ANY}"]
+
+
+def user_tag(user_id: Optional[int] = None) -> str:
+    """Тег пользователя user_id; None — тег всех пользователей (массовые изменения users)."""
+    return f"user:{ANY if user_id is None else user_id}"
+
+
+class TagStore:
+    """Версии тегов кэша ответов, общие для всех процессов.
+
+    Версии хранятся в Redis как есть, без префиксов и сериализации Flask-Caching, поэтому
+    их меняют и читают Flask, FastAPI и фоновые задачи (tasks.py). Новые версии
+    публикуются в CHANNEL; подписчик каждого читающего процесса сразу обновляет копию
+    версий в памяти, так что чтение версии обычно не обращается к Redis. Без Redis версии
+    известны только текущему процессу.
+    """
+
+    def __init__(self, redis_client: Optional[redis.Redis] = None, local_ttl: float = LOCAL_TTL):
+        self.redis = redis_client
+        self.local_ttl = local_ttl
+        self._versions: Dict[str, Tuple[float, str]] = {}
+        self._lock = threading.Lock()
+        self._subscriber: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._subscribed = threading.Event()
+
+    @classmethod
+    def from_url(cls, redis_url: Optional[str]) -> 'TagStore':
+        return cls(redis.Redis.from_url(redis_url) if redis_url else None)
+
+    def _ensure_subscribed(self) -> None:
+        # Подписчик запускается лениво и заново после fork (воркеры gunicorn)
+        if self.redis is None or (self._pid == os.getpid() and self._subscriber.is_alive()):
+            return
+        with self._lock:
+            if self._subscriber is None or self._pid != os.getpid() or not self._subscriber.is_alive():
+                self._pid = os.getpid()
+                self._subscribed.clear()
+                self._subscriber = threading.Thread(target=self._listen, name="response-cache-tags", daemon=True)
+                self._subscriber.start()
+
+    def _listen(self) -> None:
+        while True:
+            try:
+                pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(CHANNEL)
+                # Пока подписки не было, сообщения могли потеряться — версии перечитываются из Redis
+                with self._lock:
+                    self._versions.clear()
+                self._subscribed.set()
+                for message in pubsub.listen():
+                    self.apply(msgpack.unpackb(message['data'], raw=False))
+            except Exception as e:
+                self._subscribed.clear()
+                logger.error(f"Подписка на версии тегов кэша прервана: {str(e)}")
+                time.sleep(RECONNECT_DELAY)
+
+    def _ttl(self) -> float:
+        if self.redis is None:
+            return float('inf')
+        return self.local_ttl if self._subscribed.is_set() else min(TAG_TTL, self.local_ttl)
+
+    def apply(self, versions: Dict[str, str]) -> None:
+        """Запоминает версии тегов, назначенные этим или другим процессом."""
+        expires = time.monotonic() + self._ttl()
+        with self._lock:
+            for tag, version in versions.items():
+                self._versions[tag] = (expires, version)
+
+    def versions(self, tags: Iterable[str]) -> Dict[str, str]:
+        """Текущие версии тегов; отсутствующим тегам назначается новая версия."""
+        self._ensure_subscribed()
+        tags = sorted(set(tags))
+        now = time.monotonic()
+        values = {}
+        with self._lock:
+            for tag in tags:
+                item = self._versions.get(tag)
+                if item is not None and item[0] > now:
+                    values[tag] = item[1]
+        missing = [tag for tag in tags if tag not in values]
+        if missing:
+            loaded = self._load(missing)
+            self.apply(loaded)
+            values.update(loaded)
+        return values
+
+    def _load(self, tags: list) -> Dict[str, str]:
+        if self.redis is None:
+            # Без Redis версии не истекают; первая назначенная версия остается у всех потоков
+            with self._lock:
+                return {tag: self._versions.setdefault(tag, (float('inf'), uuid.uuid4().hex))[1] for tag in tags}
+        keys = [KEY_PREFIX + tag for tag in tags]
+        loaded = {}
+        for tag, key, version in zip(tags, keys, self.redis.mget(keys)):
+            if version is None:
+                version = uuid.uuid4().hex
+                if not self.redis.set(key, version, nx=True):
+                    version = self.redis.get(key) or version
+            loaded[tag] = version.decode() if isinstance(version, bytes) else version
+        return loaded
+
+    def bump(self, tags: Iterable[str]) -> Dict[str, str]:
+        """Назначает тегам новые версии во всех процессах; ответы со старыми версиями больше не находятся."""
+        versions = {tag: uuid.uuid4().hex for tag in tags}
+        if not versions:
+            return versions
+        if self.redis is not None:
+            try:
+                self.redis.mset({KEY_PREFIX + tag: version for tag, version in versions.items()})
+                self.redis.publish(CHANNEL, msgpack.packb(versions, use_bin_type=True))
+            except redis.RedisError as e:
+                logger.error(f"Ошибка записи версий тегов кэша: {str(e)}")
+        self.apply(versions)
+        return versions
+
+
+_store = TagStore()
+
+
+def configure(store: TagStore) -> TagStore:
+    """Задает хранилище версий тегов процесса (см. database.py)."""
+    global _store
+    _store = store
+    return store
+
+
+def get_store() -> TagStore:
+    return _store
+
+
+def bump(tags: Iterable[str]) -> Dict[str, str]:
+    """Сбрасывает теги во всех процессах через хранилище версий процесса."""
+    return _store.bump(tags)
+
+
+# Инвалидация: записи копятся в сессии и сбрасывают теги только после коммита
+
+def _fire_tags(fire) -> Set[str]:
+    """Теги окон пожара до и после изменения."""
+    state = inspect(fire)
+    regions = set(state.attrs.region.history.deleted or ()) | {fire.region}
+    dates = set(state.attrs.fire_date.history.deleted or ()) | {fire.fire_date}
+    return {tag for region in regions for date in dates if date is not None
+            for tag in write_tags(region, date.year)}
+
+
+def _object_tags(target) -> Set[str]:
+    table = getattr(target, '__tablename__', None)
+    if table == 'fires':
+        return _fire_tags(target)
+    if table == 'fire_forces':
+        fire = inspect(target).attrs.fire.loaded_value
+        # Если пожар не загружен, окно неизвестно — сбрасываются все ответы по пожарам
+        return _fire_tags(fire) if getattr(fire, '__tablename__', None) == 'fires' else {'fires'}
+    if table == 'users':
+        return {'users', user_tag(target.id)}
+    return {TABLE_TAGS[table]} if table in TABLE_TAGS else set()
+
+
+def track(db: Optional[Session], tags: Iterable[str]) -> None:
+    """Помечает теги для сброса после коммита сессии db.
+
+    Записи ORM отслеживаются автоматически; вызывается для массовых insert() мимо ORM
+    (например, пачек журнала аудита).
+    """
+    if db is not None:
+        db.info.setdefault('response_tags', set()).update(tags)
+
+
+@event.listens_for(Session, 'after_flush')
+def _track_flush(db: Session, flush_context) -> None:
+    # До after_flush_postexec сессия еще хранит списки new/dirty/deleted и историю атрибутов
+    for target in chain(db.new, db.dirty, db.deleted):
+        tags = _object_tags(target)
+        if tags:
+            track(db, tags)
+
+
+def _track_bulk_write(update_context) -> None:
+    # Массовые update()/delete() по таблице сбрасывают все ее ответы
+    table = update_context.mapper.local_table.name
+    if table in TABLE_TAGS:
+        track(update_context.session, {TABLE_TAGS[table], user_tag()} if table == 'users' else {TABLE_TAGS[table]})
+
+
+@event.listens_for(Session, 'after_commit')
+def _bump_after_commit(db: Session) -> None:
+    tags = db.info.pop('response_tags', None)
+    if tags:
+        bump(tags)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_after_rollback(db: Session) -> None:
+    db.info.pop('response_tags', None)
+
+
+event.listen(Session, 'after_bulk_update', _track_bulk_write)
+event.listen(Session, 'after_bulk_delete', _track_bulk_write)
@@ -13,12 +13,16 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SECRET_KEY: str = os.getenv('SECRET_KEY') or "your_unique_secret_key_here_64_chars_long_very_secure_key_1234567890"
     UPLOAD_FOLDER: str = os.getenv('UPLOAD_FOLDER', 'uploads')
+    REPORTS_FOLDER: str = os.getenv('REPORTS_FOLDER', 'reports')
+    REPORT_WORKERS: int = int(os.getenv('REPORT_WORKERS', 2))  # Процессы построения отчетов
     MAX_CONTENT_LENGTH: int = 16 * 1024 * 1024  # 16 МБ
 
     # Кэширование (Redis для продакшена)
     CACHE_TYPE: str = 'redis'
     CACHE_REDIS_URL: str = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
     CACHE_DEFAULT_TIMEOUT: int = 300  # 5 минут
+    # Очередь Socket.IO: события из любого воркера доходят до клиентов всех воркеров
+    SOCKETIO_MESSAGE_QUEUE: str = os.getenv('SOCKETIO_MESSAGE_QUEUE', CACHE_REDIS_URL)
 
     # Настройки базы данных MySQL
     MYSQL_HOST: str = os.getenv('MYSQL_HOST')
@@ -33,6 +37,7 @@ class Config:
     # API-ключи
     OPENWEATHERMAP_API_KEY: str = os.getenv('OPENWEATHERMAP_API_KEY')
     NASA_FIRMS_API_KEY: str = os.getenv('NASA_FIRMS_API_KEY')
+    NASA_FIRMS_URL: str = os.getenv('NASA_FIRMS_URL', 'https://firms.modaps.eosdis.nasa.gov')
 
     def __init__(self) -> None:
         """Проверяет наличие обязательных переменных окружения."""
@@ -1,7 +1,8 @@
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 from passlib.context import CryptContext
-from . import models, schemas
+from . import models, schemas, rollup, audit, principals
+from .passwords import hasher
 from typing import List, Optional
 import logging
 from datetime import datetime
@@ -18,8 +19,8 @@ logger = logging.getLogger(__name__)
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 def get_password_hash(password: str) -> str:
-    """Хеширует пароль с использованием bcrypt."""
-    return pwd_context.hash(password)
+    """Хеширует пароль с использованием bcrypt (в нативном потоке, см. passwords)."""
+    return hasher.run(pwd_context.hash, password)
 
 # --- Операции с Fire ---
 def create_fire(db: Session, fire_data: schemas.FireData, user_id: int) -> models.Fire:
@@ -44,6 +45,8 @@ def create_fire(db: Session, fire_data: schemas.FireData, user_id: int) -> model
             description=fire_data.description,
             edited_by_engineer=False
         )
+        # Ячейка сводки блокируется до записи пожара (см. rollup.lock)
+        rollup.lock(db, [(db_fire.region, db_fire.fire_date)])
         db.add(db_fire)
         db.flush()  # Получаем ID без коммита
 
@@ -59,6 +62,7 @@ def create_fire(db: Session, fire_data: schemas.FireData, user_id: int) -> model
                 )
                 db.add(db_force)
 
+        rollup.refresh(db, [(db_fire.region, db_fire.fire_date)])
         db.commit()
         db.refresh(db_fire)
         log_action(db, user_id, "INSERT", "fires", db_fire.id, str(fire_data.dict()))
@@ -90,6 +94,7 @@ def update_fire(db: Session, fire_id: int, fire_data: schemas.FireData, user_id:
         db_fire = get_fire(db, fire_id)
         if not db_fire:
             return None
+        old_key = (db_fire.region, db_fire.fire_date)
 
         # Обновляем основные поля
         for key, value in fire_data.dict(exclude={"forces"}).items():
@@ -98,6 +103,7 @@ def update_fire(db: Session, fire_id: int, fire_data: schemas.FireData, user_id:
             if value is not None:
                 setattr(db_fire, key, value)
         db_fire.edited_by_engineer = True if db.query(models.User).filter(models.User.id == user_id, models.User.role == "engineer").first() else db_fire.edited_by_engineer
+        rollup.lock(db, [old_key, (db_fire.region, db_fire.fire_date)])  # До удаления сил пожара
 
         # Обновляем силы
         if fire_data.forces is not None:
@@ -112,6 +118,7 @@ def update_fire(db: Session, fire_id: int, fire_data: schemas.FireData, user_id:
                 )
                 db.add(db_force)
 
+        rollup.refresh(db, [old_key, (db_fire.region, db_fire.fire_date)])
         db.commit()
         db.refresh(db_fire)
         log_action(db, user_id, "UPDATE", "fires", fire_id, str(fire_data.dict()))
@@ -128,7 +135,9 @@ def delete_fire(db: Session, fire_id: int, user_id: int) -> bool:
         db_fire = get_fire(db, fire_id)
         if not db_fire:
             return False
+        key = (db_fire.region, db_fire.fire_date)
         db.delete(db_fire)
+        rollup.refresh(db, [key])
         db.commit()
         log_action(db, user_id, "DELETE", "fires", fire_id)
         logger.info(f"Fire {fire_id} deleted by user {user_id}")
@@ -186,6 +195,7 @@ def update_user(db: Session, user_id: int, user_data: schemas.UserData, admin_id
         db_user.region = user_data.region
         db_user.totp_secret = user_data.totp_secret
         db.commit()
+        principals.principal_cache.invalidate(user_id)
         db.refresh(db_user)
         log_action(db, admin_id, "UPDATE", "users", user_id, str(user_data.dict(exclude={"password"})))
         logger.info(f"User {user_id} updated by admin {admin_id}")
@@ -207,6 +217,7 @@ def delete_user(db: Session, user_id: int, admin_id: int) -> bool:
             return False
         db.delete(db_user)
         db.commit()
+        principals.principal_cache.invalidate(user_id)
         log_action(db, admin_id, "DELETE", "users", user_id)
         logger.info(f"User {user_id} deleted by admin {admin_id}")
         return True
@@ -217,21 +228,11 @@ def delete_user(db: Session, user_id: int, admin_id: int) -> bool:
 
 # --- Логирование действий ---
 def log_action(db: Session, user_id: int, action: str, table_name: str, record_id: int, changes: str = None) -> None:
-    """Логирует действие пользователя в audit_logs."""
-    try:
-        audit_log = models.AuditLog(
-            user_id=user_id,
-            action=action,
-            table_name=table_name,
-            record_id=record_id,
-            changes=changes
-        )
-        db.add(audit_log)
-        db.commit()
-    except Exception as e:
-        db.rollback()
-        logger.error(f"Error logging action: {str(e)}")
-        raise
+    """Ставит действие пользователя в очередь записи audit_logs.
+
+    Запись выполняется пачками в фоновом потоке и не затрагивает транзакцию db.
+    """
+    audit.audit_queue.put(user_id, action, table_name, record_id, changes)
 
 def get_audit_logs(db: Session, skip: int = 0, limit: int = 10) -> List[models.AuditLog]:
     """Получает список записей аудита."""
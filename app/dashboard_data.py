@@ -0,0 +1,100 @@
+# dashboard_data.py
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional, Tuple
+import pandas as pd
+from sqlalchemy import select
+import cache_tags
+from cache_tags import TagStore, fire_tags
+from models import Fire, FirmsHotspot
+from queries import fire_date_filters
+
+CACHE_TTL = 300        # Кадры живут не дольше 5 минут (изменения процессов без общего Redis)
+FIRMS_DAYS = 7         # Глубина термоточек FIRMS на дашборде (дней)
+
+FrameKey = Tuple[Optional[str], Optional[int]]
+
+FIRE_COLUMNS = {
+    'region': 'string',
+    'damage_area': 'float64',
+    'damage_tenge': 'float64'
+}
+
+
+class DashboardData:
+    """Данные дашборда, читаемые напрямую из БД и кэшируемые в процессе.
+
+    Пожары читаются одним запросом сразу в типизированный DataFrame и кэшируются по
+    ключу (регион, год) вместе с версиями тегов окна (cache_tags.fire_tags), как ответы
+    ResponseCache. Коммит записи пожара в любом процессе меняет версии затронутых тегов,
+    и кадр перечитывается; CACHE_TTL ограничивает устаревание, если версии не общие
+    (без Redis). Термоточки FIRMS берутся из таблицы firms_hotspots, которую наполняет
+    модуль firms.
+    """
+
+    def __init__(self, session_factory: Callable, ttl: float = CACHE_TTL, tag_store: Optional[TagStore] = None):
+        self.session_factory = session_factory
+        self.ttl = ttl
+        self._tag_store = tag_store
+        self._frames: Dict[FrameKey, Tuple[float, Dict[str, str], pd.DataFrame]] = {}
+        self._hotspots: Dict[int, Tuple[float, Dict[str, str], pd.DataFrame]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def tag_store(self) -> TagStore:
+        return self._tag_store or cache_tags.get_store()
+
+    def _cached(self, store: dict, key, load: Callable[[], pd.DataFrame],
+                versions: Optional[Dict[str, str]] = None) -> pd.DataFrame:
+        with self._lock:
+            entry = store.get(key)
+        if entry and time.monotonic() - entry[0] < self.ttl and entry[1] == versions:
+            return entry[2]
+        frame = load()
+        with self._lock:
+            store[key] = (time.monotonic(), versions, frame)
+        return frame
+
+    def fires(self, region: Optional[str] = None, year: Optional[int] = None) -> pd.DataFrame:
+        """Пожары с колонками region, year, month, damage_area, damage_tenge."""
+        # Версии читаются до запроса: запись, закоммиченная во время чтения, сбросит кадр
+        versions = self.tag_store.versions(fire_tags(region, year))
+        return self._cached(self._frames, (region, year), lambda: self._load_fires(region, year), versions)
+
+    def _load_fires(self, region: Optional[str], year: Optional[int]) -> pd.DataFrame:
+        stmt = select(
+            Fire.fire_date, Fire.region, Fire.area.label('damage_area'), Fire.damage_tenge
+        ).where(*fire_date_filters(year=year, region=region))
+        with self.session_factory() as db:
+            frame = pd.read_sql(stmt, db.connection(), parse_dates=['fire_date'])
+        frame = frame.astype(FIRE_COLUMNS)
+        frame[['damage_area', 'damage_tenge']] = frame[['damage_area', 'damage_tenge']].fillna(0.0)
+        frame.insert(2, 'year', frame['fire_date'].dt.year.astype('Int64'))
+        frame.insert(3, 'month', frame['fire_date'].dt.month.astype('Int64'))
+        return frame.drop(columns='fire_date')
+
+    def hotspots(self, days: int = FIRMS_DAYS) -> pd.DataFrame:
+        """Термоточки FIRMS за последние days дней."""
+        return self._cached(self._hotspots, days, lambda: self._load_hotspots(days))
+
+    def _load_hotspots(self, days: int) -> pd.DataFrame:
+        since = datetime.utcnow().date() - timedelta(days=days - 1)
+        stmt = select(
+            FirmsHotspot.latitude, FirmsHotspot.longitude, FirmsHotspot.acq_date,
+            FirmsHotspot.confidence, FirmsHotspot.frp, FirmsHotspot.region
+        ).where(FirmsHotspot.acq_date >= since)
+        with self.session_factory() as db:
+            return pd.read_sql(stmt, db.connection(), parse_dates=['acq_date'])
+
+
+_data: Optional[DashboardData] = None
+
+
+def get_dashboard_data() -> DashboardData:
+    """Общий для процесса DashboardData приложения (создается при первом обращении)."""
+    global _data
+    if _data is None:
+        from database import SessionLocal
+        _data = DashboardData(SessionLocal)
+    return _data
@@ -3,6 +3,7 @@ from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, scoped_session
 from config import Config  # Импортируем конфигурацию из Config
+import cache_tags
 
 # Создаём движок для подключения к базе данных
 engine = create_engine(
@@ -20,10 +21,14 @@ Session = scoped_session(SessionLocal)
 # Базовый класс для моделей
 Base = declarative_base()
 
+# Версии тегов кэша ответов хранятся в общем Redis: слушатели сессий cache_tags сбрасывают
+# их после коммита в любом процессе, который работает с моделями (Flask, FastAPI, tasks.py)
+cache_tags.configure(cache_tags.TagStore.from_url(Config.CACHE_REDIS_URL if Config.CACHE_TYPE == 'redis' else None))
+
 def init_db():
     """Инициализирует все таблицы в базе данных."""
     # Импортируем все модели, чтобы они зарегистрировались в Base.metadata
-    from models import KGUOOPT, Fire, FireForce, User, AuditLog, ReportCache, Region
+    from models import KGUOOPT, Fire, FireForce, User, AuditLog, ReportCache, Region, FireStatsMonthly, FireForceStatsMonthly, FireCreatorMonthly, FirmsHotspot, WeatherReading, ForecastModel, Forecast
     Base.metadata.create_all(bind=engine)
 
 def get_db():
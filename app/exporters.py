@@ -0,0 +1,204 @@
+# exporters.py
+import csv
+from io import BytesIO, StringIO
+from tempfile import SpooledTemporaryFile
+from typing import Callable, Iterable, Iterator, Sequence
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import select
+from sqlalchemy.orm import Session, selectinload
+from models import Fire
+
+CHUNK_SIZE = 64 * 1024  # Размер порции CSV, отправляемой клиенту (байт)
+BATCH_SIZE = 1000       # Количество строк, получаемых из курсора за раз
+SPOOL_SIZE = 32 * 1024 * 1024  # Parquet-файл держится в памяти до этого размера, дальше — на диске
+
+# Типизированная схема выгрузки для аналитиков (Parquet / Arrow)
+FORCE_ARROW_TYPE = pa.struct([
+    ('force_type', pa.string()),
+    ('people_count', pa.int32()),
+    ('tecnic_count', pa.int32()),
+    ('aircraft_count', pa.int32())
+])
+FIRE_ARROW_SCHEMA = pa.schema([
+    ('id', pa.int64()),
+    ('fire_date', pa.timestamp('ms')),  # ms: в Parquet нет единицы «секунда», схема после чтения совпадает
+    ('region', pa.string()),
+    ('kgu_oopt_id', pa.int64()),
+    ('area', pa.float64()),
+    ('damage_tenge', pa.float64()),
+    ('damage_les', pa.float64()),
+    ('damage_les_lesopokryt', pa.float64()),
+    ('damage_les_verh', pa.float64()),
+    ('damage_not_les', pa.float64()),
+    ('firefighting_costs', pa.float64()),
+    ('quarter', pa.string()),
+    ('allotment', pa.string()),
+    ('description', pa.string()),
+    ('file_path', pa.string()),
+    ('created_by', pa.int64()),
+    ('forces', pa.list_(FORCE_ARROW_TYPE))
+])
+COLUMNAR_FORMATS = {
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrow')
+}
+
+
+def iter_fires(db: Session, filters: list, batch_size: int = BATCH_SIZE, with_forces: bool = False) -> Iterable[Fire]:
+    """Проходит по пожарам серверным курсором, не материализуя всю выборку.
+
+    Args:
+        db (Session): Сессия базы данных.
+        filters (list): Условия по таблице fires.
+        batch_size (int): Размер пачки строк, получаемых из курсора.
+        with_forces (bool): Подгружать ли силы пачками (SELECT ... IN) для каждой порции пожаров.
+
+    Returns:
+        Iterable[Fire]: Ленивый итератор по пожарам.
+    """
+    stmt = select(Fire).where(*filters).order_by(Fire.id)
+    if with_forces:
+        stmt = stmt.options(selectinload(Fire.forces))
+    return db.execute(stmt.execution_options(yield_per=batch_size)).scalars()
+
+
+def csv_chunks(header: Sequence, rows: Iterable[Sequence], chunk_size: int = CHUNK_SIZE, bom: bool = False) -> Iterator[str]:
+    """Превращает строки в CSV-порции размером около chunk_size символов.
+
+    Заголовок (с BOM) отдается отдельной первой порцией до чтения строк, чтобы клиент
+    сразу получил ответ, даже если первая пачка из курсора готовится долго.
+
+    Args:
+        header (Sequence): Заголовок CSV.
+        rows (Iterable[Sequence]): Строки данных.
+        chunk_size (int): Порог размера буфера, после которого порция отдается клиенту.
+        bom (bool): Добавить BOM в начало файла (для корректного открытия в Excel).
+
+    Yields:
+        str: Очередная порция CSV.
+    """
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    if bom:
+        buffer.write('\ufeff')
+    writer.writerow(header)
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= chunk_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def stream_fires_csv(session_factory: Callable, filters: list, header: Sequence, row: Callable[[Fire], Sequence],
+                     with_forces: bool = False, bom: bool = False) -> Iterator[str]:
+    """Потоковая выгрузка пожаров в CSV.
+
+    Открывает собственную сессию на все время передачи ответа, поэтому генератор можно
+    отдавать напрямую в Flask Response или FastAPI StreamingResponse.
+
+    Args:
+        session_factory (Callable): Фабрика сессий (SessionLocal).
+        filters (list): Условия по таблице fires.
+        header (Sequence): Заголовок CSV.
+        row (Callable[[Fire], Sequence]): Преобразование пожара в строку CSV.
+        with_forces (bool): Нужны ли строке данные о силах.
+        bom (bool): Добавить BOM в начало файла.
+
+    Yields:
+        str: Очередная порция CSV.
+    """
+    with session_factory() as db:
+        fires = iter_fires(db, filters, with_forces=with_forces)
+        yield from csv_chunks(header, (row(fire) for fire in fires), bom=bom)
+
+
+def forces_summary(fire: Fire) -> str:
+    """Краткое описание задействованных сил для одной ячейки CSV."""
+    return "; ".join(
+        f"{force.force_type}: {force.people_count} people, {force.tecnic_count} tecnic, {force.aircraft_count} aircraft"
+        for force in fire.forces
+    )
+
+
+def iter_record_batches(db: Session, filters: list, batch_size: int = BATCH_SIZE) -> Iterator[pa.RecordBatch]:
+    """Собирает пожары в типизированные пачки Arrow прямо из курсора.
+
+    Args:
+        db (Session): Сессия базы данных.
+        filters (list): Условия по таблице fires.
+        batch_size (int): Количество строк в одной пачке.
+
+    Yields:
+        pa.RecordBatch: Очередная пачка по схеме FIRE_ARROW_SCHEMA.
+    """
+    names = [name for name in FIRE_ARROW_SCHEMA.names if name != 'forces']
+    columns = {name: [] for name in FIRE_ARROW_SCHEMA.names}
+    for fire in iter_fires(db, filters, batch_size=batch_size, with_forces=True):
+        for name in names:
+            columns[name].append(getattr(fire, name))
+        columns['forces'].append([
+            {
+                'force_type': force.force_type,
+                'people_count': force.people_count,
+                'tecnic_count': force.tecnic_count,
+                'aircraft_count': force.aircraft_count
+            }
+            for force in fire.forces
+        ])
+        if len(columns['id']) >= batch_size:
+            yield pa.RecordBatch.from_pydict(columns, schema=FIRE_ARROW_SCHEMA)
+            columns = {name: [] for name in FIRE_ARROW_SCHEMA.names}
+    if columns['id']:
+        yield pa.RecordBatch.from_pydict(columns, schema=FIRE_ARROW_SCHEMA)
+
+
+def stream_fires_arrow(session_factory: Callable, filters: list) -> Iterator[bytes]:
+    """Потоковая выгрузка пожаров в формате Arrow IPC stream.
+
+    Каждая пачка из курсора сразу отдается клиенту, поэтому память не зависит от объема выгрузки.
+
+    Args:
+        session_factory (Callable): Фабрика сессий (SessionLocal).
+        filters (list): Условия по таблице fires.
+
+    Yields:
+        bytes: Очередная порция потока Arrow.
+    """
+    sink = BytesIO()
+    with session_factory() as db:
+        with pa.ipc.new_stream(sink, FIRE_ARROW_SCHEMA) as writer:
+            for batch in iter_record_batches(db, filters):
+                writer.write_batch(batch)
+                yield sink.getvalue()
+                sink.seek(0)
+                sink.truncate()
+    yield sink.getvalue()
+
+
+def write_fires_parquet(session_factory: Callable, filters: list) -> SpooledTemporaryFile:
+    """Пишет пожары в Parquet (zstd), по одной группе строк на пачку курсора.
+
+    Parquet хранит метаданные в конце файла, поэтому файл собирается целиком во временном
+    буфере, который переходит на диск при превышении SPOOL_SIZE.
+
+    Args:
+        session_factory (Callable): Фабрика сессий (SessionLocal).
+        filters (list): Условия по таблице fires.
+
+    Returns:
+        SpooledTemporaryFile: Готовый файл, позиция установлена в начало.
+    """
+    output = SpooledTemporaryFile(max_size=SPOOL_SIZE)
+    with session_factory() as db:
+        with pq.ParquetWriter(output, FIRE_ARROW_SCHEMA, compression='zstd') as writer:
+            for batch in iter_record_batches(db, filters):
+                writer.write_batch(batch)
+    output.seek(0)
+    return output
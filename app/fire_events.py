@@ -0,0 +1,90 @@
+# fire_events.py
+import logging
+import os
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional
+from response_cache import SCOPED_ROLES
+
+logger = logging.getLogger(__name__)
+
+EVENT_INTERVAL = 2.0   # Пожары за это время отправляются одним сообщением на комнату (секунды)
+ALL_REGIONS = '*'      # Комната пользователей, которым видны все регионы
+MAX_EVENT_IDS = 100    # id пожаров в одном сообщении (массовый импорт — только счетчик count)
+
+
+def room(region: str) -> str:
+    """Имя комнаты Socket.IO региона (ALL_REGIONS — все регионы)."""
+    return f"region:{region}"
+
+
+def user_rooms(user: dict) -> List[str]:
+    """Комнаты пользователя по данным JWT: свой регион для operator/engineer, иначе все регионы."""
+    if user.get('role') in SCOPED_ROLES and user.get('region'):
+        return [room(user['region'])]
+    return [room(ALL_REGIONS)]
+
+
+def batch_message(fires: List[dict]) -> dict:
+    """Одно сообщение new_fire о пачке пожаров (поля message и region понимают все страницы)."""
+    regions = sorted({fire['region'] for fire in fires})
+    region = regions[0] if len(regions) == 1 else None
+    if len(fires) == 1:
+        message = f"Новый пожар в {fires[0]['region']}"
+    elif region:
+        message = f"Новых пожаров в {region}: {len(fires)}"
+    else:
+        message = f"Новых пожаров: {len(fires)} ({', '.join(regions)})"
+    return {'message': message, 'region': region, 'count': len(fires), 'fires': [fire['id'] for fire in fires[:MAX_EVENT_IDS]]}
+
+
+class FireEventBatcher:
+    """Рассылает события new_fire по комнатам регионов, объединяя всплески.
+
+    Пожары копятся в процессе и раз в interval секунд уходят одним сообщением в комнату
+    своего региона и одним общим сообщением в комнату всех регионов. Через
+    message_queue SocketIO (Redis) сообщение доходит до клиентов всех воркеров.
+    Фоновая задача запускается средствами SocketIO (под eventlet — зеленый поток).
+    """
+
+    def __init__(self, socketio, interval: float = EVENT_INTERVAL):
+        self.socketio = socketio
+        self.interval = interval
+        self._pending: Dict[str, List[dict]] = defaultdict(list)
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+
+    def _ensure_started(self) -> None:
+        # Задача запускается лениво и заново после fork (воркеры gunicorn)
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self.socketio.start_background_task(self._run)
+
+    def publish(self, fire_id: int, region: str) -> None:
+        """Ставит пожар в очередь на рассылку."""
+        self._ensure_started()
+        with self._lock:
+            self._pending[region].append({'id': fire_id, 'region': region})
+
+    def flush(self) -> int:
+        """Отправляет накопленные пожары; возвращает число отправленных сообщений."""
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(list)
+        if not pending:
+            return 0
+        for region, fires in pending.items():
+            self.socketio.emit('new_fire', batch_message(fires), to=room(region))
+        everything = [fire for fires in pending.values() for fire in fires]
+        self.socketio.emit('new_fire', batch_message(everything), to=room(ALL_REGIONS))
+        return len(pending) + 1
+
+    def _run(self) -> None:
+        while True:
+            self.socketio.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Ошибка рассылки событий о пожарах: {str(e)}")
@@ -0,0 +1,367 @@
+# fire_import.py
+import csv
+import os
+import zipfile
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Tuple
+import pandas as pd
+from openpyxl import load_workbook
+from sqlalchemy import insert, text
+from sqlalchemy.orm import Session
+from models import Fire, FireForce, KGUOOPT, REGIONS
+from regions import REGIONS_AND_LOCATIONS
+import cache_tags
+import reports
+import response_cache
+import rollup
+
+CHUNK_ROWS = 5000          # Строк файла, читаемых и проверяемых за раз
+MAX_REPORTED_ERRORS = 1000  # Строк с ошибками в ответе (всего отклоненных — в счетчике rejected)
+IMPORT_EXTENSIONS = {'csv', 'xlsx'}
+
+# Области справочника REGIONS_AND_LOCATIONS и их имена в models.REGIONS
+REGION_NAMES = {
+    'Акмолинская область': 'Akmola',
+    'Актюбинская область': 'Aktobe',
+    'Алматинская область': 'Almaty',
+    'Атырауская область': 'Atyrau',
+    'Восточно-Казахстанская область': 'East Kazakhstan',
+    'Жамбылская область': 'Zhambyl',
+    'Область Жетысу': 'Zhetysu',
+    'Западно-Казахстанская область': 'West Kazakhstan',
+    'Карагандинская область': 'Karaganda',
+    'Костанайская область': 'Kostanay',
+    'Кызылординская область': 'Kyzylorda',
+    'Мангыстауская область': 'Mangystau',
+    'Павлодарская область': 'Pavlodar',
+    'Северо-Казахстанская область': 'North Kazakhstan',
+    'Область Улытау': 'Ulytau',
+    'Туркестанская область': 'Turkistan',
+    'Область Абай': 'Abai'
+}
+
+# Заголовки полевых отчетов (как в fire_data_export.csv) и поля формы пожара
+HEADERS = {
+    'Дата пожара': 'fire_date',
+    'Область': 'region',
+    'КГУ/ООПТ': 'location',
+    'Квартал': 'quarter',
+    'Выдел': 'allotment',
+    'Площадь пожара': 'area',
+    'Лесная площадь': 'damage_les',
+    'Лесопокрытая площадь': 'damage_les_lesopokryt',
+    'Верховой пожар': 'damage_les_verh',
+    'Нелесная площадь': 'damage_not_les',
+    'Описание': 'description',
+    'Ущерб (тенге)': 'damage_tenge',
+    'Затраты на тушение': 'firefighting_costs',
+    'Лесная охрана': 'LO_flag',
+    'Кол-во людей Лесной охраны': 'LO_people_count',
+    'Кол-во техники Лесной охраны': 'LO_tecnic_count',
+    'АПС': 'APS_flag',
+    'Кол-во людей АПС': 'APS_people_count',
+    'Кол-во техники АПС': 'APS_tecnic_count',
+    'Кол-во возд.судов АПС': 'APS_aircraft_count',
+    'КПС': 'KPS_flag',
+    'Кол-во людей КПС': 'KPS_people_count',
+    'Кол-во техники КПС': 'KPS_tecnic_count',
+    'Кол-во возд.судов КПС': 'KPS_aircraft_count',
+    'МИО': 'MIO_flag',
+    'Кол-во людей МИО': 'MIO_people_count',
+    'Кол-во техники МИО': 'MIO_tecnic_count',
+    'Кол-во возд.судов МИО': 'MIO_aircraft_count',
+    'др. организации': 'other_org_flag',
+    'Кол-во людей др.орг': 'other_org_people_count',
+    'Кол-во техники др.орг': 'other_org_tecnic_count',
+    'Кол-во возд.судов др.орг': 'other_org_aircraft_count'
+}
+
+REQUIRED = {'fire_date': 'Дата пожара', 'region': 'Область', 'area': 'Площадь пожара'}
+AREA_COLUMNS = {
+    'area': 'Площадь пожара',
+    'damage_les': 'Лесная площадь',
+    'damage_les_lesopokryt': 'Лесопокрытая площадь',
+    'damage_les_verh': 'Верховой пожар',
+    'damage_not_les': 'Нелесная площадь',
+    'damage_tenge': 'Ущерб (тенге)',
+    'firefighting_costs': 'Затраты на тушение'
+}
+TEXT_LIMITS = {'location': 255, 'quarter': 255, 'allotment': 255, 'description': 1000}
+FORCE_PREFIXES = {'LO': 'LO', 'APS': 'APS', 'KPS': 'KPS', 'MIO': 'MIO', 'Other': 'other_org'}
+FORCE_COUNTS = ('people_count', 'tecnic_count', 'aircraft_count')
+YES = {'да', 'yes', 'true', '1', 'on'}
+
+FIRE_COLUMNS = ['fire_date', 'region', 'area', 'quarter', 'allotment', 'damage_tenge', 'damage_les',
+                'damage_les_lesopokryt', 'damage_les_verh', 'damage_not_les', 'firefighting_costs', 'description']
+COLUMNS = ['location'] + FIRE_COLUMNS + [f"{prefix}_{suffix}" for prefix in FORCE_PREFIXES.values()
+                                         for suffix in ('flag',) + FORCE_COUNTS]
+
+_ALIASES = {**{name: name for name in REGIONS}, **REGION_NAMES}
+_LOCATIONS = pd.MultiIndex.from_tuples(
+    [(REGION_NAMES[oblast], location) for oblast, locations in REGIONS_AND_LOCATIONS.items()
+     if oblast in REGION_NAMES for location in locations],
+    names=['region', 'location']
+)
+_WITH_LOCATIONS = set(_LOCATIONS.get_level_values('region'))
+
+
+class ImportFileError(ValueError):
+    """Файл нельзя импортировать целиком (формат, заголовки)."""
+
+
+def allowed_import(filename: str) -> bool:
+    """Проверяет, что файл импорта — CSV или XLSX."""
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in IMPORT_EXTENSIONS
+
+
+# Чтение: файл читается по CHUNK_ROWS строк; индекс кадра — номер строки в файле
+
+def _csv_chunks(stream, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    sample = stream.read(8192)
+    stream.seek(0)
+    try:
+        sep = csv.Sniffer().sniff(sample.decode('utf-8-sig', errors='ignore'), delimiters=',;\t').delimiter
+    except csv.Error:
+        sep = ','
+    reader = pd.read_csv(stream, sep=sep, dtype=str, keep_default_na=False, encoding='utf-8-sig',
+                         chunksize=chunk_rows, skip_blank_lines=True)
+    for chunk in reader:
+        chunk.index = chunk.index + 2
+        yield chunk
+
+
+def _xlsx_chunks(stream, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(cell).strip() if cell is not None else '' for cell in next(rows, ())]
+        batch, numbers = [], []
+        for number, row in enumerate(rows, start=2):
+            if all(cell is None or cell == '' for cell in row):
+                continue
+            batch.append(row[:len(header)])
+            numbers.append(number)
+            if len(batch) == chunk_rows:
+                yield pd.DataFrame(batch, columns=header, index=numbers, dtype=object)
+                batch, numbers = [], []
+        if batch or not numbers:
+            yield pd.DataFrame(batch, columns=header, index=numbers, dtype=object)
+    finally:
+        workbook.close()
+
+
+def read_chunks(stream, filename: str, chunk_rows: int = CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """Читает CSV/XLSX по частям и приводит заголовки к полям пожара.
+
+    Заголовки — как в выгрузке fire_data_export.csv или имена полей формы пожара;
+    остальные столбцы (ID пожара, Филиал, Лесничество, КПО) игнорируются.
+    """
+    extension = filename.rsplit('.', 1)[-1].lower()
+    chunks = _xlsx_chunks(stream, chunk_rows) if extension == 'xlsx' else _csv_chunks(stream, chunk_rows)
+    for chunk in chunks:
+        chunk = chunk.rename(columns=lambda name: HEADERS.get(str(name).strip(), str(name).strip()))
+        chunk = chunk.loc[:, ~chunk.columns.duplicated()]
+        missing = [label for column, label in REQUIRED.items() if column not in chunk.columns]
+        if missing:
+            raise ImportFileError(f"В файле нет столбцов: {', '.join(missing)}")
+        yield chunk.reindex(columns=COLUMNS)
+
+
+# Проверка: правила FireData и справочник REGIONS_AND_LOCATIONS применяются ко всему кадру сразу
+
+def _text(series: pd.Series) -> pd.Series:
+    text = series.astype('string').str.strip()
+    return text.mask(text == '')
+
+
+def _fail(errors: Dict[int, List[str]], mask: pd.Series, message: str) -> None:
+    for row in mask.index[mask.fillna(False).astype(bool)]:
+        errors[row].append(message)
+
+
+def _numbers(series: pd.Series, label: str, errors: Dict[int, List[str]], integer: bool = False) -> pd.Series:
+    text = _text(series)
+    values = pd.to_numeric(text.str.replace(' ', '', regex=False).str.replace(',', '.', regex=False),
+                           errors='coerce')
+    _fail(errors, text.notna() & values.isna(), f"{label}: ожидается число")
+    _fail(errors, values < 0, f"{label}: отрицательное значение")
+    if integer:
+        _fail(errors, values.notna() & (values % 1 != 0), f"{label}: ожидается целое число")
+    return values
+
+
+def _dates(series: pd.Series, errors: Dict[int, List[str]]) -> pd.Series:
+    text = _text(series)
+    dates = pd.to_datetime(text, format='ISO8601', errors='coerce')
+    for fmt in ('%d.%m.%Y', '%d.%m.%Y %H:%M', '%d.%m.%Y %H:%M:%S'):
+        unparsed = dates.isna() & text.notna()
+        if not unparsed.any():
+            break
+        dates = dates.mask(unparsed, pd.to_datetime(text.where(unparsed), format=fmt, errors='coerce'))
+    _fail(errors, text.notna() & dates.isna(), "Дата пожара: неверный формат (ГГГГ-ММ-ДД или ДД.ММ.ГГГГ)")
+    _fail(errors, dates > pd.Timestamp(datetime.now() + timedelta(days=1)), "Дата пожара: дата в будущем")
+    return dates
+
+
+def validate(chunk: pd.DataFrame, user: dict) -> Tuple[pd.DataFrame, Dict[int, List[str]]]:
+    """Проверяет строки кадра.
+
+    Args:
+        chunk (pd.DataFrame): Кадр из read_chunks.
+        user (dict): Данные JWT (role, region) — operator и engineer импортируют только свой регион.
+
+    Returns:
+        Tuple[pd.DataFrame, Dict[int, List[str]]]: Проверенные строки с приведенными типами и
+        ошибки по номерам строк файла.
+    """
+    errors: Dict[int, List[str]] = defaultdict(list)
+    rows = pd.DataFrame(index=chunk.index)
+    for column, label in REQUIRED.items():
+        _fail(errors, _text(chunk[column]).isna(), f"{label}: обязательное поле")
+
+    rows['fire_date'] = _dates(chunk['fire_date'], errors)
+    raw_region = _text(chunk['region'])
+    rows['region'] = raw_region.map(_ALIASES)
+    _fail(errors, raw_region.notna() & rows['region'].isna(), "Область: неизвестный регион")
+    if user.get('role') in response_cache.SCOPED_ROLES and user.get('region'):
+        _fail(errors, rows['region'].notna() & (rows['region'] != user['region']),
+              f"Область: доступен только регион {user['region']}")
+
+    for column, limit in TEXT_LIMITS.items():
+        rows[column] = _text(chunk[column])
+        _fail(errors, rows[column].str.len() > limit, f"{column}: длиннее {limit} символов")
+    pairs = pd.MultiIndex.from_arrays([rows['region'], rows['location']])
+    checked = rows['location'].notna() & rows['region'].isin(_WITH_LOCATIONS)
+    _fail(errors, checked & ~pd.Series(pairs.isin(_LOCATIONS), index=rows.index),
+          "КГУ/ООПТ: не относится к указанной области")
+
+    for column, label in AREA_COLUMNS.items():
+        rows[column] = _numbers(chunk[column], label, errors)
+    for force_type, prefix in FORCE_PREFIXES.items():
+        counts = [_numbers(chunk[f"{prefix}_{count}"], f"{force_type} {count}", errors, integer=True)
+                  for count in FORCE_COUNTS]
+        for count, values in zip(FORCE_COUNTS, counts):
+            rows[f"{force_type}_{count}"] = values
+        flag = _text(chunk[f"{prefix}_flag"]).str.lower().isin(YES)
+        rows[f"{force_type}_used"] = flag.fillna(False) | pd.concat(counts, axis=1).gt(0).any(axis=1)
+
+    valid = rows.drop(index=list(errors))
+    return valid, errors
+
+
+# Запись: многострочные INSERT в транзакции вызывающего кода
+
+def _kgu_ids(db: Session, names: Iterable[str]) -> Dict[str, int]:
+    names = set(names)
+    if not names:
+        return {}
+    ids = dict(db.query(KGUOOPT.name, KGUOOPT.id).filter(KGUOOPT.name.in_(names)).all())
+    missing = sorted(names - set(ids))
+    if missing:
+        db.execute(insert(KGUOOPT), [{'name': name} for name in missing])
+        ids.update(db.query(KGUOOPT.name, KGUOOPT.id).filter(KGUOOPT.name.in_(missing)).all())
+    return ids
+
+
+def _records(frame: pd.DataFrame, columns: List[str]) -> List[dict]:
+    values = frame[columns].astype(object)
+    return values.where(values.notna(), None).to_dict('records')
+
+
+def _insert_fires(db: Session, records: List[dict]) -> List[int]:
+    dialect = db.get_bind().dialect
+    if dialect.insert_executemany_returning_sort_by_parameter_order:
+        return list(db.scalars(insert(Fire).returning(Fire.id, sort_by_parameter_order=True), records))
+    # MySQL не поддерживает RETURNING: пачка вставляется одним многострочным INSERT. Для такой
+    # простой вставки InnoDB выдает id подряд (с шагом auto_increment_increment), начиная с
+    # LAST_INSERT_ID() — id первой строки
+    result = db.execute(insert(Fire).values(records))
+    if dialect.name == 'mysql':
+        step = db.execute(text('SELECT @@auto_increment_increment')).scalar()
+        first = result.lastrowid
+    else:
+        step = 1
+        first = result.lastrowid - len(records) + 1  # SQLite сообщает id последней строки
+    return list(range(first, first + step * len(records), step))
+
+
+def insert_rows(db: Session, rows: pd.DataFrame, user_id: int) -> List[int]:
+    """Вставляет проверенные строки (пожары и силы); возвращает id пожаров в порядке строк."""
+    if rows.empty:
+        return []
+    # Ячейки сводки блокируются до вставки пожаров, как у одиночных записей (см. rollup.lock)
+    rollup.lock(db, zip(rows['region'], rows['fire_date']))
+    kgu = _kgu_ids(db, rows['location'].dropna().unique())
+    records = _records(rows, FIRE_COLUMNS)
+    for record, location in zip(records, rows['location']):
+        record['fire_date'] = record['fire_date'].to_pydatetime()
+        record['kgu_oopt_id'] = kgu.get(location) if isinstance(location, str) else None
+        record['created_by'] = user_id
+    fire_ids = _insert_fires(db, records)
+
+    forces = []
+    ids = pd.Series(fire_ids, index=rows.index)
+    for force_type in FORCE_PREFIXES:
+        used = rows[f"{force_type}_used"]
+        counts = rows.loc[used, [f"{force_type}_{count}" for count in FORCE_COUNTS]].fillna(0).astype(int)
+        counts.columns = list(FORCE_COUNTS)
+        forces.extend(counts.assign(fire_id=ids[used], force_type=force_type).to_dict('records'))
+    if forces:
+        db.execute(insert(FireForce), forces)
+    return fire_ids
+
+
+def _invalidate(db: Session, rows: pd.DataFrame) -> None:
+    # Многострочный INSERT обходит события ORM: сводка и кэши обновляются явно
+    months = rows[['region']].assign(year=rows['fire_date'].dt.year, month=rows['fire_date'].dt.month)
+    months = {(region, int(year), int(month)) for region, year, month in months.drop_duplicates().itertuples(index=False)}
+    rollup.refresh(db, [(region, datetime(year, month, 1)) for region, year, month in months])
+    reports.invalidate(db, months)
+    years = {(region, year) for region, year, _ in months}
+    cache_tags.track(db, {'fires'} | {tag for region, year in years for tag in cache_tags.write_tags(region, year)})
+
+
+def import_fires(db: Session, stream, filename: str, user: dict, chunk_rows: int = CHUNK_ROWS) -> dict:
+    """Импортирует пожары из CSV/XLSX одной транзакцией.
+
+    Строки с ошибками пропускаются, остальные вставляются пачками по chunk_rows.
+    Сводка, отчеты и кэши обновляются в той же транзакции; коммит выполняет эта функция.
+
+    Args:
+        db (Session): Сессия БД.
+        stream: Файловый объект с содержимым файла.
+        filename (str): Имя файла (по расширению выбирается формат).
+        user (dict): Данные JWT (user_id, role, region).
+        chunk_rows (int): Строк в пачке.
+
+    Returns:
+        dict: imported, rejected, errors (до MAX_REPORTED_ERRORS строк {'row', 'errors'}),
+        fires — пары (id, регион) вставленных пожаров.
+
+    Raises:
+        ImportFileError: Если файл не удалось прочитать или в нем нет обязательных столбцов.
+    """
+    imported, rejected, report, fires, inserted = 0, 0, [], [], []
+    try:
+        for chunk in read_chunks(stream, filename, chunk_rows):
+            rows, errors = validate(chunk, user)
+            rejected += len(errors)
+            report.extend({'row': int(row), 'errors': messages} for row, messages in sorted(errors.items())
+                          if len(report) < MAX_REPORTED_ERRORS)
+            fire_ids = insert_rows(db, rows, user['user_id'])
+            imported += len(fire_ids)
+            fires.extend(zip(fire_ids, rows['region']))
+            inserted.append(rows[['region', 'fire_date']])
+        if inserted:
+            _invalidate(db, pd.concat(inserted))
+        db.commit()
+    except (ValueError, UnicodeDecodeError, zipfile.BadZipFile) as e:
+        db.rollback()
+        if isinstance(e, ImportFileError):
+            raise
+        raise ImportFileError(f"Не удалось прочитать файл {os.path.basename(filename)}: {str(e)}") from e
+    except Exception:
+        db.rollback()
+        raise
+    return {'imported': imported, 'rejected': rejected, 'errors': report, 'fires': fires}
@@ -0,0 +1,188 @@
+# firms.py
+import csv
+import logging
+from datetime import date, datetime, timedelta
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+import requests
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Query, Session
+from sqlalchemy.sql import func as sql_func
+from models import FirmsHotspot
+from http_client import http_client
+from region_index import region_index
+
+logger = logging.getLogger(__name__)
+
+FIRMS_URL = "https://firms.modaps.eosdis.nasa.gov"
+FIRMS_SOURCE = "VIIRS_SNPP_NRT"
+KAZAKHSTAN_BBOX = (46.0, 40.0, 88.0, 56.0)  # west, south, east, north
+MAX_DAY_RANGE = 10    # Area API FIRMS отдает не более 10 дней за запрос
+INITIAL_DAYS = 3      # Глубина первой загрузки, когда таблица пуста
+BATCH_SIZE = 1000     # Строк CSV на одну пачку вставки
+REQUEST_TIMEOUT = 30  # Секунд на соединение и чтение ответа FIRMS
+
+HotspotKey = Tuple[float, float, date, str, str]
+Bounds = Tuple[float, float, float, float]
+
+
+def area_url(base_url: str, api_key: str, source: str, bbox: Bounds, day_range: int, start: date) -> str:
+    """URL area API FIRMS для окна [start, start + day_range)."""
+    area = ",".join(str(value) for value in bbox)
+    return f"{base_url}/api/area/csv/{api_key}/{source}/{area}/{day_range}/{start.isoformat()}"
+
+
+def parse_rows(lines: Iterable[str]) -> Iterator[dict]:
+    """Разбирает CSV FIRMS построчно; некорректные строки пропускаются.
+
+    Yields:
+        dict: Значения колонок firms_hotspots.
+    """
+    for row in csv.DictReader(lines):
+        try:
+            yield {
+                'latitude': float(row['latitude']),
+                'longitude': float(row['longitude']),
+                'acq_date': date.fromisoformat(row['acq_date']),
+                'acq_time': str(int(row['acq_time'])).zfill(4),
+                'satellite': row['satellite'],
+                'instrument': row.get('instrument'),
+                'confidence': row.get('confidence'),
+                'frp': float(row['frp']) if row.get('frp') else None,
+                'daynight': row.get('daynight')
+            }
+        except (KeyError, TypeError, ValueError) as e:
+            logger.warning(f"Пропущена строка FIRMS {row}: {str(e)}")
+
+
+def hotspot_key(row: dict) -> HotspotKey:
+    return row['latitude'], row['longitude'], row['acq_date'], row['acq_time'], row['satellite']
+
+
+def _insert_skipping_existing(db: Session):
+    """INSERT в firms_hotspots, который пропускает строки с уже загруженным ключом uq_firms_hotspot."""
+    dialect = db.get_bind().dialect.name
+    if dialect == 'mysql':
+        # Не ON DUPLICATE KEY UPDATE: с флагом CLIENT_FOUND_ROWS (его ставит SQLAlchemy) пропущенная
+        # строка считалась бы вставленной. Строки уже проверены parse_rows
+        return mysql_insert(FirmsHotspot).prefix_with('IGNORE')
+    if dialect == 'postgresql':
+        return postgresql_insert(FirmsHotspot).on_conflict_do_nothing(constraint='uq_firms_hotspot')
+    return sqlite_insert(FirmsHotspot).on_conflict_do_nothing()
+
+
+def insert_new(db: Session, rows: List[dict]) -> int:
+    """Вставляет термоточки, которых еще нет в таблице, одним многострочным INSERT.
+
+    Уже загруженные термоточки (загрузка повторяет последнюю дату) пропускает сама БД
+    по ключу uq_firms_hotspot, без предварительного чтения существующих ключей.
+
+    Returns:
+        int: Количество вставленных строк.
+    """
+    new_rows = list({hotspot_key(row): row for row in rows}.values())
+    if not new_rows:
+        return 0
+    regions = region_index.lookup([row['latitude'] for row in new_rows], [row['longitude'] for row in new_rows])
+    for row, region in zip(new_rows, regions):
+        row['region'] = region
+    # Через соединение сессии, а не ORM bulk insert: нужен rowcount — число действительно вставленных строк
+    return db.connection().execute(_insert_skipping_existing(db), new_rows).rowcount
+
+
+def _batches(rows: Iterable[dict], size: int) -> Iterator[List[dict]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def ingest_window(db: Session, http: requests.Session, url: str) -> int:
+    """Загружает одно окно area API потоково: ответ читается и вставляется пачками."""
+    with http.get(url, stream=True, timeout=REQUEST_TIMEOUT) as response:
+        response.raise_for_status()
+        lines = response.iter_lines(decode_unicode=True)
+        inserted = sum(insert_new(db, batch) for batch in _batches(parse_rows(lines), BATCH_SIZE))
+    db.commit()
+    return inserted
+
+
+def last_acq_date(db: Session) -> Optional[date]:
+    """Дата последней загруженной термоточки."""
+    return db.query(sql_func.max(FirmsHotspot.acq_date)).scalar()
+
+
+def ingest(db: Session, api_key: str, base_url: str = FIRMS_URL, source: str = FIRMS_SOURCE,
+           bbox: Bounds = KAZAKHSTAN_BBOX, start: Optional[date] = None, end: Optional[date] = None,
+           http: Optional[requests.Session] = None) -> int:
+    """Инкрементальная загрузка термоточек FIRMS в firms_hotspots.
+
+    Без явного start загрузка продолжается с последней загруженной даты включительно
+    (NRT-данные за нее дополняются в течение дня), а для пустой таблицы начинается
+    INITIAL_DAYS дней назад. Период разбивается на окна по MAX_DAY_RANGE дней; каждое
+    окно фиксируется отдельной транзакцией.
+
+    Args:
+        db (Session): Сессия базы данных.
+        api_key (str): MAP_KEY FIRMS.
+        base_url (str): Адрес сервиса FIRMS.
+        source (str): Источник данных (VIIRS_SNPP_NRT, MODIS_NRT, ...).
+        bbox (Bounds): Область (west, south, east, north).
+        start (Optional[date]): Первая дата периода.
+        end (Optional[date]): Последняя дата периода включительно; по умолчанию сегодня (UTC).
+        http (Optional[requests.Session]): HTTP-сессия.
+
+    Returns:
+        int: Количество новых термоточек.
+    """
+    end = end or datetime.utcnow().date()
+    if start is None:
+        last = last_acq_date(db)
+        start = last if last else end - timedelta(days=INITIAL_DAYS - 1)
+    http = http or requests.Session()
+    inserted = 0
+    while start <= end:
+        day_range = min(MAX_DAY_RANGE, (end - start).days + 1)
+        inserted += ingest_window(db, http, area_url(base_url, api_key, source, bbox, day_range, start))
+        start += timedelta(days=day_range)
+    return inserted
+
+
+def hotspots_in_bbox(db: Session, bbox: Bounds, since: date) -> Query:
+    """Термоточки в области начиная с даты since, новые первыми."""
+    west, south, east, north = bbox
+    return (
+        db.query(FirmsHotspot)
+        .filter(FirmsHotspot.acq_date >= since,
+                FirmsHotspot.latitude.between(south, north),
+                FirmsHotspot.longitude.between(west, east))
+        .order_by(FirmsHotspot.acq_date.desc(), FirmsHotspot.acq_time.desc())
+    )
+
+
+def fetch_nasa_fires(session_factory: Optional[Callable] = None) -> int:
+    """Периодическое задание загрузки FIRMS (см. tasks.py)."""
+    from config import Config
+    if session_factory is None:
+        from database import SessionLocal
+        session_factory = SessionLocal
+    with session_factory() as db:
+        try:
+            inserted = ingest(db, Config.NASA_FIRMS_API_KEY, base_url=Config.NASA_FIRMS_URL, http=http_client.session)
+        except (requests.RequestException, SQLAlchemyError) as e:
+            db.rollback()
+            logger.error(f"Ошибка загрузки FIRMS: {str(e)}")
+            return 0
+    logger.info(f"Загружено новых термоточек FIRMS: {inserted}")
+    return inserted
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    fetch_nasa_fires()
@@ -0,0 +1,435 @@
+# forecasting.py
+import logging
+import os
+import pickle
+import threading
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LinearRegression
+from statsmodels.tsa.arima.model import ARIMA
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session, defer
+from sqlalchemy.sql import func as sql_func
+from models import Fire, ForecastModel, Forecast
+import cache_tags
+
+logger = logging.getLogger(__name__)
+
+ALL_REGIONS = 'all'        # Ключ национальной модели (все регионы вместе)
+TRAIN_DAYS = 3 * 365       # Окно обучения дневных моделей
+MIN_OBSERVATIONS = 30      # Минимальная длина ряда без отложенного периода
+MAX_DAYS_AHEAD = 365       # Максимальный горизонт прогноза через API (дней)
+RELOAD_INTERVAL = 60       # Как часто процесс проверяет, не переобучена ли загруженная модель (секунды)
+MIN_CHANGED_FIRES = 10     # Переобучение по изменению данных: не меньше 10 пожаров...
+CHANGE_RATIO = 0.05        # ...и не меньше 5% от числа пожаров на момент обучения
+HORIZONS = {'D': MAX_DAYS_AHEAD + 7, 'M': 24}  # Сколько периодов прогноза сохраняется в forecasts
+
+
+class LinearForecaster:
+    """Линейный тренд площади пожаров по номеру дня (LinearRegression)."""
+
+    freq = 'D'
+    holdout = 30
+
+    def fit(self, series: np.ndarray) -> 'LinearForecaster':
+        self.nobs = len(series)
+        self.model = LinearRegression().fit(np.arange(self.nobs).reshape(-1, 1), series)
+        return self
+
+    def forecast(self, steps: int) -> np.ndarray:
+        return self.model.predict(np.arange(self.nobs, self.nobs + steps).reshape(-1, 1))
+
+
+class ArimaForecaster:
+    """ARIMA/SARIMA с сохраненными параметрами.
+
+    Сериализуются только оцененные параметры и обучающий ряд: прогноз восстанавливается
+    фильтром Калмана с готовыми параметрами (без повторной оценки) за десятки миллисекунд.
+    """
+
+    def __init__(self, order: Tuple[int, int, int], seasonal_order: Tuple[int, int, int, int] = (0, 0, 0, 0),
+                 freq: str = 'D', holdout: int = 30):
+        self.order = order
+        self.seasonal_order = seasonal_order
+        self.freq = freq
+        self.holdout = holdout
+
+    def _model(self, series: np.ndarray) -> ARIMA:
+        return ARIMA(series, order=self.order, seasonal_order=self.seasonal_order)
+
+    def fit(self, series: np.ndarray) -> 'ArimaForecaster':
+        self.series = np.asarray(series, dtype=float)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')  # statsmodels предупреждает о сходимости на разреженных рядах
+            self.params = self._model(self.series).fit().params
+        return self
+
+    def forecast(self, steps: int) -> np.ndarray:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            return np.asarray(self._model(self.series).filter(self.params).forecast(steps))
+
+
+MODEL_TYPES: Dict[str, Callable] = {
+    'linear': LinearForecaster,
+    'arima': lambda: ArimaForecaster(order=(5, 1, 0)),
+    'sarima': lambda: ArimaForecaster(order=(1, 1, 1), seasonal_order=(1, 1, 1, 12), freq='M', holdout=12)
+}
+
+
+def _series_window(freq: str, today: date) -> Tuple[pd.Period, list]:
+    last = pd.Period(today, freq) - 1
+    filters = [Fire.fire_date < (last + 1).start_time.to_pydatetime()]
+    if freq == 'D':
+        filters.append(Fire.fire_date >= (last - (TRAIN_DAYS - 1)).start_time.to_pydatetime())
+    return last, filters
+
+
+def build_series(frame: pd.DataFrame, freq: str, last: pd.Period) -> Dict[str, pd.Series]:
+    """Ряды суммарной площади по всем регионам (и всей стране) из кадра region, fire_date, area.
+
+    Все ряды строятся одной группировкой по (регион, период). Каждый ряд начинается с
+    первого пожара региона и заканчивается периодом last; пропуски заполняются нулями.
+    """
+    if frame.empty:
+        return {}
+    periods = pd.to_datetime(frame['fire_date']).dt.to_period(freq).rename('period')
+    grouped = frame.groupby(['region', periods])['area']
+    areas = grouped.sum().unstack('region', fill_value=0.0)
+    index = pd.period_range(areas.index.min(), last, freq=freq)
+    areas = areas.reindex(index, fill_value=0.0).astype(float)
+    started = grouped.size().unstack('region', fill_value=0).reindex(index, fill_value=0).cumsum() > 0
+    series = {region: areas[region][started[region]] for region in areas.columns}
+    series[ALL_REGIONS] = areas.sum(axis=1)
+    return series
+
+
+def load_all_series(db: Session, freq: str, today: date) -> Dict[str, pd.Series]:
+    """Ряды по дням (freq='D') или месяцам (freq='M') для всех регионов одним запросом.
+
+    Ряды заканчиваются последним завершенным периодом перед today; дневные ограничены окном TRAIN_DAYS.
+    """
+    last, filters = _series_window(freq, today)
+    frame = pd.DataFrame(db.execute(select(Fire.region, Fire.fire_date, Fire.area).where(*filters)).all(),
+                         columns=['region', 'fire_date', 'area'])
+    return build_series(frame, freq, last)
+
+
+def load_series(db: Session, region: str, freq: str, today: date) -> pd.Series:
+    """Ряд одного региона (или всей страны для ALL_REGIONS), см. load_all_series."""
+    last, filters = _series_window(freq, today)
+    if region != ALL_REGIONS:
+        filters.append(Fire.region == region)
+    frame = pd.DataFrame(db.execute(select(Fire.region, Fire.fire_date, Fire.area).where(*filters)).all(),
+                         columns=['region', 'fire_date', 'area'])
+    return build_series(frame, freq, last).get(region, pd.Series(dtype=float))
+
+
+def holdout_errors(factory: Callable, series: np.ndarray, holdout: int) -> Tuple[float, float]:
+    """MAE и RMSE модели, обученной без последних holdout точек ряда."""
+    forecast = factory().fit(series[:-holdout]).forecast(holdout)
+    errors = forecast - series[-holdout:]
+    return float(np.abs(errors).mean()), float(np.sqrt((errors ** 2).mean()))
+
+
+def fires_counts(db: Session) -> Dict[str, int]:
+    """Количество пожаров по регионам и всего (ключ ALL_REGIONS)."""
+    counts = dict(db.query(Fire.region, sql_func.count(Fire.id)).group_by(Fire.region).all())
+    counts[ALL_REGIONS] = sum(counts.values())
+    return counts
+
+
+def fit_model(model_type: str, series: np.ndarray) -> dict:
+    """Обучает модель на ряде и рассчитывает прогноз на HORIZONS периодов.
+
+    Выполняется в процессах пула train_forecasts, поэтому принимает и возвращает только
+    сериализуемые значения (модель возвращается в виде pickle).
+    """
+    factory = MODEL_TYPES[model_type]
+    forecaster = factory()
+    started = time.perf_counter()
+    mae, rmse = holdout_errors(factory, series, forecaster.holdout)
+    forecaster.fit(series)
+    forecast = forecaster.forecast(HORIZONS[forecaster.freq])
+    return {
+        'freq': forecaster.freq,
+        'payload': pickle.dumps(forecaster, protocol=pickle.HIGHEST_PROTOCOL),
+        'forecast': np.maximum(forecast, 0.0),
+        'fit_seconds': time.perf_counter() - started,
+        'mae': mae,
+        'rmse': rmse
+    }
+
+
+def save_model(db: Session, model_type: str, region: str, series: pd.Series, fitted: dict,
+               fires_count: int) -> ForecastModel:
+    """Сохраняет обученную модель в реестр и заменяет ее прогноз в таблице forecasts (без коммита)."""
+    record = db.query(ForecastModel).filter_by(model_type=model_type, region=region).one_or_none()
+    if record is None:
+        record = ForecastModel(model_type=model_type, region=region)
+        db.add(record)
+    record.freq = fitted['freq']
+    record.train_start = series.index[0].start_time.date()
+    record.train_end = series.index[-1].end_time.date()
+    record.observations = len(series)
+    record.fires_count = fires_count
+    record.fitted_at = datetime.utcnow()
+    record.fit_seconds = fitted['fit_seconds']
+    record.mae = fitted['mae']
+    record.rmse = fitted['rmse']
+    record.payload = fitted['payload']
+    db.flush()
+
+    db.query(Forecast).filter(Forecast.model_id == record.id).delete(synchronize_session=False)
+    periods = pd.period_range(series.index[-1] + 1, periods=len(fitted['forecast']), freq=fitted['freq'])
+    db.execute(insert(Forecast), [
+        {'model_id': record.id, 'period_start': period.start_time.date(), 'period_end': period.end_time.date(),
+         'predicted_area': float(area)}
+        for period, area in zip(periods, fitted['forecast'])
+    ])
+    # Прогноз записан мимо ORM: после коммита ответы /predict сбрасываются во всех процессах
+    cache_tags.track(db, {'forecasts'})
+    logger.info(f"Модель {model_type}/{region} обучена за {fitted['fit_seconds']:.2f} с, MAE {fitted['mae']:.2f}")
+    return record
+
+
+def trainable(model_type: str, series: pd.Series) -> bool:
+    return len(series) >= MIN_OBSERVATIONS + MODEL_TYPES[model_type]().holdout
+
+
+def train(db: Session, model_type: str, region: str = ALL_REGIONS, today: Optional[date] = None,
+          fires_count: Optional[int] = None) -> Optional[ForecastModel]:
+    """Обучает одну модель в текущем процессе и сохраняет ее в реестр (без коммита).
+
+    Returns:
+        Optional[ForecastModel]: Запись реестра или None, если ряд слишком короткий.
+    """
+    series = load_series(db, region, MODEL_TYPES[model_type]().freq, today or date.today())
+    if not trainable(model_type, series):
+        logger.info(f"Недостаточно данных для модели {model_type}/{region}: {len(series)} точек")
+        return None
+    if fires_count is None:
+        fires_count = fires_counts(db).get(region, 0)
+    return save_model(db, model_type, region, series, fit_model(model_type, series.to_numpy()), fires_count)
+
+
+def changed_models(db: Session, counts: Optional[Dict[str, int]] = None) -> List[Tuple[str, str]]:
+    """Модели реестра, регион которых существенно изменился с момента обучения."""
+    counts = fires_counts(db) if counts is None else counts
+    changed = []
+    for model_type, region, trained_count in db.query(ForecastModel.model_type, ForecastModel.region, ForecastModel.fires_count):
+        delta = abs(counts.get(region, 0) - trained_count)
+        if delta >= max(MIN_CHANGED_FIRES, CHANGE_RATIO * trained_count):
+            changed.append((model_type, region))
+    return changed
+
+
+def model_to_dict(record: ForecastModel) -> dict:
+    return {
+        'model_type': record.model_type,
+        'region': record.region,
+        'freq': record.freq,
+        'train_start': record.train_start.isoformat(),
+        'train_end': record.train_end.isoformat(),
+        'observations': record.observations,
+        'fires_count': record.fires_count,
+        'fitted_at': record.fitted_at.isoformat(),
+        'fit_seconds': record.fit_seconds,
+        'mae': record.mae,
+        'rmse': record.rmse
+    }
+
+
+class LoadedModel:
+    """Модель реестра, загруженная в память процесса, с кэшем рассчитанного прогноза."""
+
+    def __init__(self, forecaster, meta: dict, fitted_at: datetime, checked: float):
+        self.forecaster = forecaster
+        self.meta = meta
+        self.fitted_at = fitted_at
+        self.checked = checked
+        self.path = np.empty(0)
+        self.lock = threading.Lock()
+
+    def forecast(self, steps: int) -> np.ndarray:
+        with self.lock:
+            if len(self.path) < steps:
+                self.path = self.forecaster.forecast(steps)
+            return self.path[:steps]
+
+
+class ForecastRegistry:
+    """Выдача прогнозов из реестра обученных моделей.
+
+    Модели обучаются пакетно заданиями train_forecasts / retrain_changed_forecasts (см. tasks.py),
+    которые сразу сохраняют прогноз на HORIZONS периодов в таблицу forecasts; запрос читает
+    из нее одну строку. Если дата вне сохраненного горизонта, сохраненная модель загружается
+    в процесс (раз в reload_interval секунд проверяется, не переобучена ли она).
+    """
+
+    def __init__(self, session_factory: Callable, reload_interval: float = RELOAD_INTERVAL):
+        self.session_factory = session_factory
+        self.reload_interval = reload_interval
+        self._loaded: Dict[Tuple[str, str], LoadedModel] = {}
+        self._lock = threading.Lock()
+
+    def load(self, model_type: str, region: str = ALL_REGIONS) -> Optional[LoadedModel]:
+        key = (model_type, region)
+        with self._lock:
+            loaded = self._loaded.get(key)
+        if loaded is not None and time.monotonic() - loaded.checked < self.reload_interval:
+            return loaded
+        with self.session_factory() as db:
+            query = db.query(ForecastModel).filter_by(model_type=model_type, region=region)
+            if loaded is not None and query.with_entities(ForecastModel.fitted_at).scalar() == loaded.fitted_at:
+                loaded.checked = time.monotonic()
+                return loaded
+            record = query.one_or_none()
+            loaded = None if record is None else LoadedModel(
+                pickle.loads(record.payload), model_to_dict(record), record.fitted_at, time.monotonic()
+            )
+        with self._lock:
+            if loaded is None:
+                self._loaded.pop(key, None)
+            else:
+                self._loaded[key] = loaded
+        return loaded
+
+    def forecast(self, model_type: str, region: str = ALL_REGIONS, steps: Optional[int] = None) -> Optional[pd.Series]:
+        """Сохраненный прогноз модели (индекс — периоды); steps ограничивает число периодов."""
+        with self.session_factory() as db:
+            query = (
+                db.query(Forecast.period_start, Forecast.predicted_area, ForecastModel.freq)
+                .join(ForecastModel, Forecast.model_id == ForecastModel.id)
+                .filter(ForecastModel.model_type == model_type, ForecastModel.region == region)
+                .order_by(Forecast.period_start)
+            )
+            rows = query.limit(steps).all() if steps else query.all()
+        if not rows:
+            return None
+        freq = rows[0][2]
+        return pd.Series([area for _, area, _ in rows], index=pd.PeriodIndex([start for start, _, _ in rows], freq=freq))
+
+    def predict(self, model_type: str, region: str = ALL_REGIONS, days_ahead: int = 30,
+                today: Optional[date] = None) -> Optional[dict]:
+        """Прогноз площади на дату today + days_ahead (для месячных моделей — за месяц этой даты)."""
+        target = (today or date.today()) + timedelta(days=days_ahead)
+        with self.session_factory() as db:
+            row = (
+                db.query(Forecast.predicted_area, ForecastModel)
+                .join(ForecastModel, Forecast.model_id == ForecastModel.id)
+                .options(defer(ForecastModel.payload))
+                .filter(ForecastModel.model_type == model_type, ForecastModel.region == region,
+                        Forecast.period_start <= target, Forecast.period_end >= target)
+                .first()
+            )
+            if row is not None:
+                return {'date': target.strftime('%Y-%m-%d'), 'predicted_area': row[0], 'model': model_to_dict(row[1])}
+
+        loaded = self.load(model_type, region)
+        if loaded is None:
+            return None
+        freq = loaded.meta['freq']
+        steps = max(1, (pd.Period(target, freq) - pd.Period(loaded.meta['train_end'], freq)).n)
+        return {
+            'date': target.strftime('%Y-%m-%d'),
+            'predicted_area': max(0.0, float(loaded.forecast(steps)[-1])),
+            'model': loaded.meta
+        }
+
+    def models(self, model_type: Optional[str] = None, region: Optional[str] = None) -> List[dict]:
+        """Метаданные моделей реестра (без сериализованных моделей)."""
+        with self.session_factory() as db:
+            query = db.query(ForecastModel).options(defer(ForecastModel.payload))
+            if model_type:
+                query = query.filter(ForecastModel.model_type == model_type)
+            if region:
+                query = query.filter(ForecastModel.region == region)
+            return [model_to_dict(record) for record in query.order_by(ForecastModel.model_type, ForecastModel.region)]
+
+
+def train_forecasts(session_factory: Optional[Callable] = None, keys: Optional[Iterable[Tuple[str, str]]] = None,
+                    workers: Optional[int] = None, today: Optional[date] = None) -> int:
+    """Пакетное обучение моделей по всем регионам (см. tasks.py).
+
+    Ряды всех регионов строятся одним запросом на каждый шаг ряда, модели обучаются
+    параллельно в пуле процессов (по умолчанию — по числу ядер), а результаты записываются
+    по мере готовности, каждая модель — своей транзакцией.
+
+    Args:
+        keys: Пары (тип модели, регион); по умолчанию — все типы по всем регионам и стране.
+        workers: Размер пула процессов.
+
+    Returns:
+        int: Количество обученных моделей.
+    """
+    if session_factory is None:
+        from database import SessionLocal
+        session_factory = SessionLocal
+    today = today or date.today()
+    freqs = {model_type: MODEL_TYPES[model_type]().freq for model_type in MODEL_TYPES}
+    with session_factory() as db:
+        counts = fires_counts(db)
+        series = {freq: load_all_series(db, freq, today) for freq in set(freqs.values())}
+    if keys is None:
+        keys = [(model_type, region) for model_type in MODEL_TYPES for region in sorted(series[freqs[model_type]])]
+    jobs = {}
+    for model_type, region in keys:
+        values = series[freqs[model_type]].get(region)
+        if values is not None and trainable(model_type, values):
+            jobs[(model_type, region)] = values
+        else:
+            logger.info(f"Недостаточно данных для модели {model_type}/{region}")
+    if not jobs:
+        return 0
+
+    trained = 0
+    with ProcessPoolExecutor(max_workers=min(workers or os.cpu_count() or 1, len(jobs))) as pool:
+        futures = {
+            pool.submit(fit_model, model_type, values.to_numpy()): (model_type, region)
+            for (model_type, region), values in jobs.items()
+        }
+        for future in as_completed(futures):
+            model_type, region = futures[future]
+            with session_factory() as db:
+                try:
+                    save_model(db, model_type, region, jobs[(model_type, region)], future.result(), counts.get(region, 0))
+                    db.commit()
+                    trained += 1
+                except Exception as e:
+                    db.rollback()
+                    logger.error(f"Ошибка обучения модели {model_type}/{region}: {str(e)}")
+    logger.info(f"Обучено моделей прогноза: {trained} из {len(jobs)}")
+    return trained
+
+
+def retrain_changed_forecasts(session_factory: Optional[Callable] = None) -> int:
+    """Переобучает модели, данные которых существенно изменились (см. tasks.py)."""
+    if session_factory is None:
+        from database import SessionLocal
+        session_factory = SessionLocal
+    with session_factory() as db:
+        keys = changed_models(db)
+    return train_forecasts(session_factory, keys) if keys else 0
+
+
+_registry: Optional[ForecastRegistry] = None
+
+
+def get_registry() -> ForecastRegistry:
+    """Общий для процесса ForecastRegistry приложения (создается при первом обращении)."""
+    global _registry
+    if _registry is None:
+        from database import SessionLocal
+        _registry = ForecastRegistry(SessionLocal)
+    return _registry
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    train_forecasts()
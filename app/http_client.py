@@ -0,0 +1,166 @@
+# http_client.py
+import logging
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Callable, Optional
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+POOL_SIZE = 20            # Соединений keep-alive на хост
+MAX_PER_HOST = 8          # Одновременных запросов к одному хосту
+TIMEOUT = (3.05, 5)       # Таймауты соединения и чтения (секунды)
+FAILURE_THRESHOLD = 3     # Ошибок подряд, после которых цепь размыкается
+RESET_TIMEOUT = 30        # Секунд до пробного запроса к отказавшему хосту
+STALE_ENTRIES = 1024      # Последних удачных ответов, хранимых на случай отказа
+
+
+class UpstreamError(Exception):
+    """Внешний сервис недоступен, и сохраненного ответа для запроса нет, или сервис отклонил запрос (4xx)."""
+
+
+def is_client_error(status: int) -> bool:
+    """Ошибка запроса (4xx, кроме 429), а не отказ сервиса: цепь не размыкается, резервный ответ не отдается."""
+    return 400 <= status < 500 and status != 429
+
+
+class CircuitBreaker:
+    """Автомат отключения запросов к отказавшему хосту.
+
+    После FAILURE_THRESHOLD ошибок подряд цепь размыкается на reset_timeout секунд, и
+    запросы сразу получают отказ, не занимая рабочий поток. Затем пропускается один
+    пробный запрос: успех замыкает цепь, ошибка снова размыкает ее.
+    """
+
+    def __init__(self, failure_threshold: int = FAILURE_THRESHOLD, reset_timeout: float = RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if not self.probing and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.probing = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.probing or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self.probing = False
+
+
+class HttpClient:
+    """Общий для процесса клиент внешних API (погода, FIRMS).
+
+    Одна requests.Session с пулом keep-alive соединений, ограничение одновременных
+    запросов к хосту, таймауты и по одному CircuitBreaker на хост. Удачные ответы
+    запоминаются: при ошибке или разомкнутой цепи возвращается последний удачный ответ
+    на тот же запрос. Вызовы с fallback=False вместо него получают UpstreamError —
+    для тех, кто сам хранит последние данные (WeatherPrefetcher).
+    """
+
+    def __init__(self, pool_size: int = POOL_SIZE, max_per_host: int = MAX_PER_HOST, timeout=TIMEOUT,
+                 failure_threshold: int = FAILURE_THRESHOLD, reset_timeout: float = RESET_TIMEOUT,
+                 stale_entries: int = STALE_ENTRIES):
+        self.timeout = timeout
+        self.session = requests.Session()
+        # Один быстрый повтор только на ошибки соединения и 502/503/504, без пауз в секунды
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=Retry(
+            total=1, backoff_factor=0.1, status_forcelist=(502, 503, 504), allowed_methods=('GET',)
+        ))
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._slots = defaultdict(lambda: threading.BoundedSemaphore(max_per_host))
+        self._breakers = defaultdict(lambda: CircuitBreaker(failure_threshold, reset_timeout))
+        self._stale = OrderedDict()
+        self.stale_entries = stale_entries
+        self._lock = threading.Lock()
+
+    def breaker(self, url: str) -> CircuitBreaker:
+        with self._lock:
+            return self._breakers[urlsplit(url).netloc]
+
+    def _remember(self, key: tuple, payload: Any) -> None:
+        with self._lock:
+            self._stale[key] = payload
+            self._stale.move_to_end(key)
+            while len(self._stale) > self.stale_entries:
+                self._stale.popitem(last=False)
+
+    def _fallback(self, key: tuple, url: str, reason: str, fallback: bool) -> Any:
+        with self._lock:
+            if fallback and key in self._stale:
+                logger.warning(f"{url}: {reason}, возвращен последний удачный ответ")
+                return self._stale[key]
+        raise UpstreamError(f"{url}: {reason}")
+
+    def get(self, url: str, params: Optional[dict] = None, parse: Callable[[requests.Response], Any] = None,
+            fallback: bool = True) -> Any:
+        """GET с пулом соединений, таймаутом и резервным ответом.
+
+        Args:
+            url (str): Адрес запроса.
+            params (Optional[dict]): Параметры строки запроса.
+            parse (Callable): Преобразование ответа (по умолчанию response.json()).
+            fallback (bool): Возвращать последний удачный ответ, если сервис недоступен.
+
+        Returns:
+            Any: Результат parse для свежего ответа или последний удачный результат.
+
+        Raises:
+            UpstreamError: Если сервис недоступен и сохраненного ответа нет (или fallback=False)
+                либо сервис ответил 4xx.
+        """
+        parse = parse or (lambda response: response.json())
+        key = (url, tuple(sorted((params or {}).items())))
+        host = urlsplit(url).netloc
+        breaker = self.breaker(url)
+        if not breaker.allow():
+            return self._fallback(key, url, "цепь разомкнута", fallback)
+        with self._lock:
+            slot = self._slots[host]
+        if not slot.acquire(timeout=self.timeout[0]):
+            return self._fallback(key, url, "превышен лимит одновременных запросов", fallback)
+        try:
+            response = self.session.get(url, params=params, timeout=self.timeout)
+            if not is_client_error(response.status_code):
+                response.raise_for_status()
+                payload = parse(response)
+        except (requests.RequestException, ValueError) as e:
+            # Отказом хоста считаются ошибки соединения, таймауты, 5xx и 429
+            breaker.record_failure()
+            return self._fallback(key, url, str(e), fallback)
+        finally:
+            slot.release()
+        breaker.record_success()
+        if is_client_error(response.status_code):
+            raise UpstreamError(f"{url}: {response.status_code} {response.reason}")
+        self._remember(key, payload)
+        return payload
+
+    def get_json(self, url: str, params: Optional[dict] = None, fallback: bool = True) -> Any:
+        return self.get(url, params, fallback=fallback)
+
+    def get_text(self, url: str, params: Optional[dict] = None, fallback: bool = True) -> str:
+        return self.get(url, params, parse=lambda response: response.text, fallback=fallback)
+
+
+http_client = HttpClient()
@@ -1,10 +1,10 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, Boolean, UniqueConstraint, Index, LargeBinary
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from pydantic import BaseModel, validator
 from typing import Optional, List
-import bcrypt
 from .database import Base
+from .passwords import hasher
 
 from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey
 from database import Base
@@ -52,6 +52,7 @@ class KGUOOPT(Base):
 class Fire(Base):
     """Модель для учета лесных пожаров с полной поддержкой всех полей из дампа базы."""
     __tablename__ = "fires"
+    __table_args__ = (Index("idx_region_date", "region", "fire_date"),)
 
     id = Column(Integer, primary_key=True, index=True)
     fire_date = Column(DateTime, default=func.now(), nullable=False, index=True, comment="Дата и время пожара")
@@ -104,11 +105,11 @@ class User(Base):
 
     def set_password(self, password: str) -> None:
         """Устанавливает хэшированный пароль."""
-        self.password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        self.password_hash = hasher.bcrypt_hash(password)
 
     def check_password(self, password: str) -> bool:
         """Проверяет соответствие пароля хэшу."""
-        return bcrypt.checkpw(password.encode('utf-8'), self.password_hash.encode('utf-8'))
+        return hasher.bcrypt_check(password, self.password_hash)
 
 class AuditLog(Base):
     """Модель журнала событий с полной детализацией."""
@@ -125,14 +126,129 @@ class AuditLog(Base):
     user = relationship("User", back_populates="audit_logs")
 
 class ReportCache(Base):
-    """Модель для кэширования отчетов."""
+    """Модель для кэширования отчетов (задания и готовые файлы модуля reports)."""
     __tablename__ = "report_cache"
+    __table_args__ = (UniqueConstraint("report_type", "format", "filters", name="uq_report_cache"),)
 
     id = Column(Integer, primary_key=True, index=True)
-    report_type = Column(String(50), nullable=False, comment="Тип отчета: summary, analytics")
+    report_type = Column(String(50), nullable=False, comment="Тип отчета: summary, analytics, fires")
+    format = Column(String(10), nullable=False, default="pdf", comment="Формат файла: pdf, csv, xlsx")
     filters = Column(String(255), nullable=False, comment="Фильтры в формате JSON")
-    data = Column(String(10000), nullable=False, comment="Данные отчета в формате JSON")
+    region = Column(String(255), nullable=True, comment="Фильтр по региону (NULL — все регионы)")
+    year = Column(Integer, nullable=True, comment="Фильтр по году (NULL — все годы)")
+    month = Column(Integer, nullable=True, comment="Фильтр по месяцу (NULL — все месяцы)")
+    status = Column(String(20), nullable=False, default="pending", comment="Статус: pending, running, done, failed, stale")
+    data = Column(String(10000), nullable=False, default="{}", comment="Данные отчета в формате JSON")
+    file_path = Column(String(255), nullable=True, comment="Путь к готовому файлу отчета")
+    error = Column(String(1000), nullable=True, comment="Ошибка построения отчета")
+    requested_by = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True, comment="ID пользователя, запросившего отчет")
     created_at = Column(DateTime, default=func.now(), nullable=False, comment="Дата создания")
+    finished_at = Column(DateTime, nullable=True, comment="Время готовности отчета")
+
+class FireStatsMonthly(Base):
+    """Предагрегированная статистика пожаров по региону и месяцу (поддерживается модулем rollup)."""
+    __tablename__ = "fire_stats_monthly"
+    __table_args__ = (UniqueConstraint("region", "year", "month", name="uq_fire_stats_monthly"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    region = Column(String(255), nullable=False, comment="Регион")
+    year = Column(Integer, nullable=False, comment="Год")
+    month = Column(Integer, nullable=False, comment="Месяц")
+    fires_count = Column(Integer, nullable=False, default=0, comment="Количество пожаров")
+    total_area = Column(Float, nullable=False, default=0.0, comment="Суммарная площадь (га)")
+    total_damage = Column(Float, nullable=False, default=0.0, comment="Суммарный ущерб (тенге)")
+    users_count = Column(Integer, nullable=False, default=0, comment="Количество различных авторов записей")
+
+class FireForceStatsMonthly(Base):
+    """Предагрегированные силы по региону, месяцу и типу сил."""
+    __tablename__ = "fire_stats_monthly_forces"
+    __table_args__ = (UniqueConstraint("region", "year", "month", "force_type", name="uq_fire_stats_monthly_forces"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    region = Column(String(255), nullable=False, comment="Регион")
+    year = Column(Integer, nullable=False, comment="Год")
+    month = Column(Integer, nullable=False, comment="Месяц")
+    force_type = Column(String(50), nullable=False, comment="Тип сил: APS, KPS, MIO, LO, Other")
+    people_count = Column(Integer, nullable=False, default=0, comment="Количество людей")
+    tecnic_count = Column(Integer, nullable=False, default=0, comment="Количество техники")
+    aircraft_count = Column(Integer, nullable=False, default=0, comment="Количество авиации")
+
+class FireCreatorMonthly(Base):
+    """Авторы записей о пожарах по региону и месяцу (для точного подсчета уникальных пользователей за период)."""
+    __tablename__ = "fire_stats_monthly_creators"
+    __table_args__ = (UniqueConstraint("region", "year", "month", "user_id", name="uq_fire_stats_monthly_creators"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    region = Column(String(255), nullable=False, comment="Регион")
+    year = Column(Integer, nullable=False, comment="Год")
+    month = Column(Integer, nullable=False, comment="Месяц")
+    user_id = Column(Integer, nullable=False, comment="ID пользователя, создавшего запись")
+
+class FirmsHotspot(Base):
+    """Термоточка NASA FIRMS (загружается модулем firms)."""
+    __tablename__ = "firms_hotspots"
+    __table_args__ = (
+        UniqueConstraint("latitude", "longitude", "acq_date", "acq_time", "satellite", name="uq_firms_hotspot"),
+        Index("idx_firms_date_lat", "acq_date", "latitude"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    # Float(53) — DOUBLE в MySQL: координаты ключа uq_firms_hotspot хранятся без округления до FLOAT
+    latitude = Column(Float(53), nullable=False, comment="Широта")
+    longitude = Column(Float(53), nullable=False, comment="Долгота")
+    acq_date = Column(Date, nullable=False, comment="Дата съемки (UTC)")
+    acq_time = Column(String(4), nullable=False, comment="Время съемки HHMM (UTC)")
+    satellite = Column(String(10), nullable=False, comment="Спутник: N, 1 (NOAA-20), T, A")
+    instrument = Column(String(10), nullable=True, comment="Прибор: VIIRS, MODIS")
+    confidence = Column(String(10), nullable=True, comment="Достоверность: l/n/h или процент")
+    frp = Column(Float, nullable=True, comment="Мощность излучения пожара (МВт)")
+    daynight = Column(String(1), nullable=True, comment="D — день, N — ночь")
+    region = Column(String(255), nullable=True, index=True, comment="Регион по координатам")
+    created_at = Column(DateTime, default=func.now(), nullable=False, comment="Дата загрузки")
+
+class WeatherReading(Base):
+    """Снимок погоды по региону (обновляется фоновым заданием модуля weather)."""
+    __tablename__ = "weather_readings"
+    __table_args__ = (Index("idx_weather_region_fetched", "region", "fetched_at"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    region = Column(String(255), nullable=False, comment="Регион")
+    observed_at = Column(DateTime, nullable=True, comment="Время наблюдения по данным OpenWeather (UTC)")
+    fetched_at = Column(DateTime, nullable=False, comment="Время загрузки (UTC)")
+    temp = Column(Float, nullable=True, comment="Температура (°C)")
+    humidity = Column(Float, nullable=True, comment="Влажность (%)")
+    wind_speed = Column(Float, nullable=True, comment="Скорость ветра (м/с)")
+    description = Column(String(255), nullable=True, comment="Описание погоды")
+
+class ForecastModel(Base):
+    """Обученная модель прогноза площади пожаров по типу модели и региону (реестр модуля forecasting)."""
+    __tablename__ = "forecast_models"
+    __table_args__ = (UniqueConstraint("model_type", "region", name="uq_forecast_model"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    model_type = Column(String(20), nullable=False, comment="Тип модели: linear, arima, sarima")
+    region = Column(String(255), nullable=False, comment="Регион или all для всей страны")
+    freq = Column(String(1), nullable=False, comment="Шаг ряда: D — день, M — месяц")
+    train_start = Column(Date, nullable=False, comment="Начало обучающего окна")
+    train_end = Column(Date, nullable=False, comment="Конец обучающего окна (включительно)")
+    observations = Column(Integer, nullable=False, comment="Количество точек обучающего ряда")
+    fires_count = Column(Integer, nullable=False, comment="Количество пожаров региона на момент обучения")
+    fitted_at = Column(DateTime, nullable=False, comment="Время обучения (UTC)")
+    fit_seconds = Column(Float, nullable=False, comment="Длительность обучения (секунды)")
+    mae = Column(Float, nullable=True, comment="Средняя абсолютная ошибка на отложенном периоде (га)")
+    rmse = Column(Float, nullable=True, comment="Среднеквадратичная ошибка на отложенном периоде (га)")
+    payload = Column(LargeBinary(length=16 * 1024 * 1024), nullable=False, comment="Сериализованная модель (pickle)")
+
+class Forecast(Base):
+    """Точка рассчитанного прогноза модели реестра (заполняется пакетным обучением модуля forecasting)."""
+    __tablename__ = "forecasts"
+    __table_args__ = (UniqueConstraint("model_id", "period_start", name="uq_forecast_period"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    model_id = Column(Integer, ForeignKey("forecast_models.id", ondelete="CASCADE"), nullable=False, comment="ID модели реестра")
+    period_start = Column(Date, nullable=False, comment="Начало периода прогноза")
+    period_end = Column(Date, nullable=False, comment="Конец периода прогноза (включительно)")
+    predicted_area = Column(Float, nullable=False, comment="Прогноз суммарной площади за период (га)")
 
 # Pydantic модели для валидации
 class FireForceData(BaseModel):
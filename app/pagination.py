@@ -0,0 +1,82 @@
+# pagination.py
+import base64
+import hashlib
+import json
+from datetime import datetime
+from typing import List, Optional, Tuple
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Query
+
+COUNT_CACHE_TIMEOUT = 300  # Итоговое количество строк для курсорной пагинации кэшируется на 5 минут
+
+
+def encode_cursor(value: datetime, record_id: int) -> str:
+    """Кодирует позицию (значение сортировки, id) в непрозрачную строку для клиента."""
+    raw = json.dumps([value.isoformat(), record_id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Раскодирует курсор, выданный encode_cursor.
+
+    Raises:
+        ValueError: Если курсор поврежден или подделан.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        value, record_id = json.loads(raw)
+        return datetime.fromisoformat(value), int(record_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def keyset_page(query: Query, sort_column, id_column, after: Optional[str], limit: int) -> Tuple[List, Optional[str]]:
+    """Возвращает страницу по убыванию (sort_column, id_column), начиная после курсора.
+
+    В отличие от OFFSET, стоимость страницы не зависит от ее номера: условие
+    (sort, id) < (курсор) обслуживается индексом по sort_column.
+
+    Args:
+        query (Query): Запрос с уже примененными фильтрами.
+        sort_column: Колонка сортировки (fire_date, timestamp).
+        id_column: Первичный ключ для однозначного порядка при равных значениях.
+        after (Optional[str]): Курсор предыдущей страницы; пустое значение — первая страница.
+        limit (int): Размер страницы.
+
+    Returns:
+        Tuple[List, Optional[str]]: Строки страницы и курсор следующей страницы (None, если это последняя).
+
+    Raises:
+        ValueError: Если курсор некорректен.
+    """
+    if after:
+        value, record_id = decode_cursor(after)
+        query = query.filter(or_(sort_column < value, and_(sort_column == value, id_column < record_id)))
+    rows = query.order_by(sort_column.desc(), id_column.desc()).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, sort_column.key), getattr(last, id_column.key))
+
+
+def cached_count(cache, name: str, query: Query, params: dict, timeout: int = COUNT_CACHE_TIMEOUT) -> int:
+    """Количество строк запроса из кэша; COUNT(*) выполняется не чаще раза в timeout секунд.
+
+    Args:
+        cache: Объект Flask-Caching.
+        name (str): Имя счетчика (таблица).
+        query (Query): Запрос, количество строк которого считается.
+        params (dict): Параметры фильтрации, от которых зависит результат.
+        timeout (int): Время жизни значения в секундах.
+
+    Returns:
+        int: Приблизительное (не старше timeout) количество строк.
+    """
+    digest = hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+    key = f"count:{name}:{digest}"
+    total = cache.get(key)
+    if total is None:
+        total = query.order_by(None).count()
+        cache.set(key, total, timeout=timeout)
+    return total
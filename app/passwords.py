@@ -0,0 +1,70 @@
+# passwords.py
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, TypeVar
+import bcrypt
+import greenlet
+from eventlet import tpool
+from eventlet.semaphore import Semaphore
+from werkzeug.security import check_password_hash, generate_password_hash
+
+HASH_WORKERS = int(os.getenv('HASH_WORKERS', 4))  # Одновременных хэширований пароля в процессе
+
+T = TypeVar('T')
+
+
+class PasswordHasher:
+    """Выполняет хэширование и проверку паролей вне цикла событий eventlet.
+
+    bcrypt и PBKDF2 занимают сотни миллисекунд процессора и отпускают GIL, но под
+    eventlet вызов в обработчике блокирует все зеленые потоки воркера. Поэтому в зеленом
+    потоке функция уходит в нативный пул eventlet.tpool, а остальные зеленые потоки
+    продолжают работу. Вне eventlet используется собственный пул потоков. В обоих
+    случаях одновременно выполняется не больше workers хэширований, чтобы всплеск
+    входов не занял все ядра.
+    """
+
+    def __init__(self, workers: int = HASH_WORKERS):
+        self.workers = workers
+        self._slots: Optional[Semaphore] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self) -> None:
+        # Пул создается лениво и заново после fork (воркеры gunicorn)
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._slots = Semaphore(self.workers)
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+                self._pid = os.getpid()
+
+    def run(self, func: Callable[..., T], *args) -> T:
+        """Вызывает func(*args) в нативном потоке и возвращает результат."""
+        self._ensure_started()
+        if greenlet.getcurrent().parent is not None:
+            with self._slots:
+                return tpool.execute(func, *args)
+        return self._executor.submit(func, *args).result()
+
+    def bcrypt_hash(self, password: str) -> str:
+        """Хэш bcrypt пароля."""
+        return self.run(bcrypt.hashpw, password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+
+    def bcrypt_check(self, password: str, hashed: str) -> bool:
+        """Проверяет пароль по хэшу bcrypt."""
+        return self.run(bcrypt.checkpw, password.encode('utf-8'), hashed.encode('utf-8'))
+
+    def generate(self, password: str) -> str:
+        """Хэш пароля в формате werkzeug."""
+        return self.run(generate_password_hash, password)
+
+    def check(self, hashed: str, password: str) -> bool:
+        """Проверяет пароль по хэшу в формате werkzeug."""
+        return self.run(check_password_hash, hashed, password)
+
+
+hasher = PasswordHasher()
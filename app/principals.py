@@ -0,0 +1,88 @@
+# principals.py
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+from models import User
+import cache_tags
+from cache_tags import TagStore, user_tag
+
+PRINCIPAL_TTL = 30           # Запись перечитывается из БД не реже чем раз в 30 секунд
+PRINCIPAL_MAX_ITEMS = 10000  # Пользователей в кэше процесса
+
+USER_COLUMNS = [column.key for column in inspect(User).column_attrs]
+
+
+class PrincipalCache:
+    """Кэш процесса для пользователей, от имени которых выполняются запросы.
+
+    Хранит значения колонок users по id, поэтому аутентифицированный запрос стоит
+    проверки JWT и поиска в словаре, а не запроса к БД. Каждое обращение получает
+    собственный экземпляр User: отсоединенный (load) или присоединенный к сессии
+    запроса без SELECT (attach).
+
+    Запись хранит версии тегов пользователя (cache_tags.user_tag) на момент чтения и
+    отдается, только пока они не изменились. Версии меняет коммит записи в users в любом
+    процессе (Flask, FastAPI, tasks.py) и invalidate(), а рассылаются они через pub/sub
+    Redis, поэтому смена роли, региона или удаление пользователя действуют во всех
+    воркерах сразу, а не через ttl.
+    """
+
+    def __init__(self, ttl: float = PRINCIPAL_TTL, max_items: int = PRINCIPAL_MAX_ITEMS,
+                 tag_store: Optional[TagStore] = None):
+        self.ttl = ttl
+        self.max_items = max_items
+        self._tag_store = tag_store
+        self._items: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def tag_store(self) -> TagStore:
+        return self._tag_store or cache_tags.get_store()
+
+    def _values(self, user_id: int, load: Callable[[], Optional[User]]) -> Optional[Dict]:
+        # Версии читаются до загрузки: сброс во время чтения из БД не потеряется
+        versions = self.tag_store.versions([user_tag(user_id), user_tag()])
+        with self._lock:
+            item = self._items.get(user_id)
+        if item is not None and item[0] > time.monotonic() and item[2] == versions:
+            return item[1]
+        user = load()
+        if user is None:
+            self.invalidate(user_id)
+            return None
+        values = {key: getattr(user, key) for key in USER_COLUMNS}
+        with self._lock:
+            self._items.pop(user_id, None)
+            self._items[user_id] = (time.monotonic() + self.ttl, values, versions)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+        return values
+
+    def load(self, db: Session, user_id: int) -> Optional[User]:
+        """Отсоединенный пользователь user_id (для Flask-Login); None — если его нет."""
+        values = self._values(user_id, lambda: db.get(User, user_id))
+        if values is None:
+            return None
+        user = User(**values)
+        make_transient_to_detached(user)
+        return user
+
+    def attach(self, db: Session, user_id: int) -> Optional[User]:
+        """Пользователь user_id в сессии db; его изменения сохраняются db.commit()."""
+        user = self.load(db, user_id)
+        return db.merge(user, load=False) if user is not None else None
+
+    def invalidate(self, user_id: Optional[int] = None) -> None:
+        """Сбрасывает пользователя user_id (None — всех) во всех процессах; вызывается после коммита изменений."""
+        with self._lock:
+            if user_id is None:
+                self._items.clear()
+            else:
+                self._items.pop(user_id, None)
+        self.tag_store.bump([user_tag(user_id)])
+
+
+principal_cache = PrincipalCache()
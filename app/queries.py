@@ -0,0 +1,225 @@
+# queries.py
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+from sqlalchemy import and_, or_, distinct, extract
+from sqlalchemy.orm import Query, Session
+from sqlalchemy.sql import func as sql_func
+from models import Fire, FireStatsMonthly, FireForceStatsMonthly, FireCreatorMonthly
+
+DateLike = Union[str, date, datetime, None]
+
+
+def _to_datetime(value: DateLike) -> Optional[datetime]:
+    """Приводит 'YYYY-MM-DD', 'YYYY-MM-DD HH:MM:SS', date или datetime к datetime."""
+    if value is None or value == '':
+        return None
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    return datetime.fromisoformat(str(value).strip())
+
+
+def fire_date_filters(year: Optional[int] = None, month: Optional[int] = None,
+                      date_from: DateLike = None, date_to: DateLike = None, region: Optional[str] = None) -> list:
+    """Строит условия по fires в виде полуоткрытых диапазонов fire_date.
+
+    В отличие от extract('year', fire_date) == year такие условия используют индексы
+    fire_date и (region, fire_date). Месяц без года диапазоном не выражается и остается
+    условием extract() поверх остальных ограничений.
+
+    Args:
+        year (Optional[int]): Год.
+        month (Optional[int]): Месяц (1-12).
+        date_from (DateLike): Начало периода включительно.
+        date_to (DateLike): Конец периода включительно; дата без времени означает весь день.
+        region (Optional[str]): Регион.
+
+    Returns:
+        list: Условия для Query.filter() / select().where().
+
+    Raises:
+        ValueError: Если год, месяц или даты заданы некорректно.
+    """
+    filters = [Fire.region == region] if region else []
+    if year:
+        year = int(year)
+        if month:
+            month = int(month)
+            if not 1 <= month <= 12:
+                raise ValueError(f"Invalid month: {month}")
+            start = datetime(year, month, 1)
+            end = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+        else:
+            start, end = datetime(year, 1, 1), datetime(year + 1, 1, 1)
+        filters += [Fire.fire_date >= start, Fire.fire_date < end]
+    elif month:
+        filters.append(extract('month', Fire.fire_date) == int(month))
+    start = _to_datetime(date_from)
+    if start:
+        filters.append(Fire.fire_date >= start)
+    end = _to_datetime(date_to)
+    if end:
+        if isinstance(date_to, datetime) or (isinstance(date_to, str) and len(date_to.strip()) > 10):
+            filters.append(Fire.fire_date <= end)
+        else:
+            filters.append(Fire.fire_date < end + timedelta(days=1))
+    return filters
+
+
+def rollup_filters(model, region: Optional[str] = None, year: Optional[int] = None, month: Optional[int] = None) -> list:
+    """Строит условия по таблицам сводки fire_stats_monthly*.
+
+    Args:
+        model: Модель сводки (у всех есть колонки region, year, month).
+        region (Optional[str]): Регион.
+        year (Optional[int]): Год.
+        month (Optional[int]): Месяц.
+
+    Returns:
+        list: Условия для Query.filter().
+    """
+    filters = []
+    if region:
+        filters.append(model.region == region)
+    if year:
+        filters.append(model.year == int(year))
+    if month:
+        filters.append(model.month == int(month))
+    return filters
+
+
+def region_month_stats(db: Session, criteria: dict) -> Query:
+    """Запрос статистики по (регион, месяц) из сводки; годы внутри фильтра суммируются.
+
+    Args:
+        db (Session): Сессия базы данных.
+        criteria (dict): Фильтры region/year/month (см. rollup_filters).
+
+    Returns:
+        Query: Строки (region, month, count, total_area, total_damage), упорядоченные по региону и месяцу.
+    """
+    stats = FireStatsMonthly
+    return (
+        db.query(
+            stats.region,
+            stats.month,
+            sql_func.sum(stats.fires_count).label('count'),
+            sql_func.sum(stats.total_area).label('total_area'),
+            sql_func.sum(stats.total_damage).label('total_damage')
+        )
+        .filter(*rollup_filters(stats, **criteria))
+        .group_by(stats.region, stats.month)
+        .order_by(stats.region, stats.month)
+    )
+
+
+def forces_by_region_month(db: Session, criteria: dict, keys: Optional[Iterable[Tuple[str, int]]] = None) -> Dict[Tuple[str, int], List[dict]]:
+    """Считает задействованные силы по (регион, месяц, тип сил) одним агрегирующим запросом.
+
+    Args:
+        db (Session): Сессия базы данных.
+        criteria (dict): Фильтры region/year/month (те же, что и у основного запроса статистики).
+        keys (Optional[Iterable[Tuple[str, int]]]): Пары (регион, месяц) текущей страницы ответа.
+            None означает все пары, попадающие под criteria.
+
+    Returns:
+        Dict[Tuple[str, int], List[dict]]: Суммы людей, техники и авиации по каждому типу сил.
+    """
+    forces = FireForceStatsMonthly
+    query = (
+        db.query(
+            forces.region,
+            forces.month,
+            forces.force_type,
+            sql_func.sum(forces.people_count),
+            sql_func.sum(forces.tecnic_count),
+            sql_func.sum(forces.aircraft_count)
+        )
+        .filter(*rollup_filters(forces, **criteria))
+        .group_by(forces.region, forces.month, forces.force_type)
+        .order_by(forces.region, forces.month, forces.force_type)
+    )
+    if keys is not None:
+        keys = {(region, int(m)) for region, m in keys}
+        if not keys:
+            return {}
+        query = query.filter(or_(*(and_(forces.region == region, forces.month == m) for region, m in keys)))
+    result = {}
+    for region, m, force_type, people, tecnic, aircraft in query.all():
+        result.setdefault((region, int(m)), []).append({
+            'force_type': force_type,
+            'people_count': int(people or 0),
+            'tecnic_count': int(tecnic or 0),
+            'aircraft_count': int(aircraft or 0)
+        })
+    return result
+
+
+def analytics_by_region_month(db: Session, criteria: dict) -> List[dict]:
+    """Статистика пожаров по (регион, месяц) вместе с разбивкой сил.
+
+    Выполняет не более двух запросов к сводке независимо от размера таблиц fires и fire_forces.
+
+    Args:
+        db (Session): Сессия базы данных.
+        criteria (dict): Фильтры region/year/month.
+
+    Returns:
+        List[dict]: Строки статистики с количеством, площадью, ущербом и силами.
+    """
+    rows = region_month_stats(db, criteria).all()
+    forces = forces_by_region_month(db, criteria) if rows else {}
+    return [
+        {
+            "region": row.region,
+            "month": int(row.month),
+            "count": int(row.count),
+            "total_area": float(row.total_area or 0),
+            "total_damage": float(row.total_damage or 0),
+            "forces": forces.get((row.region, int(row.month)), [])
+        }
+        for row in rows
+    ]
+
+
+def region_summary(db: Session, criteria: dict) -> List[tuple]:
+    """Итоги по регионам за период из сводки.
+
+    Количество пользователей считается по таблице авторов, поэтому автор, работавший
+    в нескольких месяцах периода, учитывается один раз.
+
+    Returns:
+        List[tuple]: Строки (region, count, total_area, total_damage, users_count).
+    """
+    stats, creators = FireStatsMonthly, FireCreatorMonthly
+    totals = (
+        db.query(
+            stats.region,
+            sql_func.sum(stats.fires_count),
+            sql_func.sum(stats.total_area),
+            sql_func.sum(stats.total_damage)
+        )
+        .filter(*rollup_filters(stats, **criteria))
+        .group_by(stats.region)
+        .order_by(stats.region)
+        .all()
+    )
+    users = dict(
+        db.query(creators.region, sql_func.count(distinct(creators.user_id)))
+        .filter(*rollup_filters(creators, **criteria))
+        .group_by(creators.region)
+        .all()
+    )
+    return [(region, int(count), area or 0.0, damage or 0.0, users.get(region, 0)) for region, count, area, damage in totals]
+
+
+def creators_count(db: Session, criteria: dict) -> int:
+    """Количество различных авторов записей о пожарах за период."""
+    creators = FireCreatorMonthly
+    return db.query(sql_func.count(distinct(creators.user_id))).filter(*rollup_filters(creators, **criteria)).scalar() or 0
+
+
+def stat_years(db: Session) -> List[int]:
+    """Годы, за которые в сводке есть пожары, по возрастанию."""
+    return [year for (year,) in db.query(distinct(FireStatsMonthly.year)).order_by(FireStatsMonthly.year).all()]
@@ -0,0 +1,203 @@
+# region_index.py
+import threading
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+from tiles import region_tiles
+
+BANDS = 256          # Количество горизонтальных полос в индексе ребер одного кольца
+CHUNK_SIZE = 65536   # Точек за один векторизованный проход (ограничивает память матрицы точка × ребро)
+CELL_SIZE = 0.05     # Шаг сетки верхнего уровня в градусах (~5 км)
+BOUNDARY = -2        # Ячейка сетки, через которую проходит граница региона
+MAX_LOOKUP_POINTS = 100000  # Предел точек в одном запросе /api/regions/lookup
+
+
+class PreparedRing:
+    """Кольцо полигона, подготовленное к пакетной проверке точек.
+
+    Ребра раскладываются по BANDS горизонтальным полосам, поэтому для точки
+    проверяются только ребра ее полосы, а не все вершины кольца.
+    """
+
+    def __init__(self, ring: np.ndarray, bands: int = BANDS):
+        x1, y1 = ring[:-1, 0], ring[:-1, 1]
+        x2, y2 = ring[1:, 0], ring[1:, 1]
+        self.edges = (x1, y1, x2, y2)
+        sloped = y1 != y2  # Горизонтальные ребра не пересекают луч
+        x1, y1, x2, y2 = x1[sloped], y1[sloped], x2[sloped], y2[sloped]
+        self.bbox = (ring[:, 0].min(), ring[:, 1].min(), ring[:, 0].max(), ring[:, 1].max())
+        self.bands = bands
+        self.height = (self.bbox[3] - self.bbox[1]) / bands or 1.0
+
+        low = np.clip(((np.minimum(y1, y2) - self.bbox[1]) // self.height).astype(int), 0, bands - 1)
+        high = np.clip(((np.maximum(y1, y2) - self.bbox[1]) // self.height).astype(int), 0, bands - 1)
+        counts = high - low + 1
+        edges = np.repeat(np.arange(len(x1)), counts)
+        band = np.repeat(low, counts) + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        order = np.argsort(band, kind='stable')
+        edges = edges[order]
+        self.offsets = np.searchsorted(band[order], np.arange(bands + 1))
+        self.x1, self.y1 = x1[edges], y1[edges]
+        self.slope = ((x2 - x1) / (y2 - y1))[edges]
+        self.y2 = y2[edges]
+
+    def contains(self, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+        """Проверка четности пересечений горизонтального луча для массива точек."""
+        result = np.zeros(len(xs), dtype=bool)
+        west, south, east, north = self.bbox
+        candidates = np.flatnonzero((xs >= west) & (xs <= east) & (ys >= south) & (ys <= north))
+        if not len(candidates):
+            return result
+        band = np.clip(((ys[candidates] - south) // self.height).astype(int), 0, self.bands - 1)
+        order = np.argsort(band, kind='stable')
+        candidates, band = candidates[order], band[order]
+        bounds = np.searchsorted(band, np.arange(self.bands + 1))
+        for b in np.flatnonzero(np.diff(bounds)):
+            start, end = self.offsets[b], self.offsets[b + 1]
+            if start == end:
+                continue
+            points = candidates[bounds[b]:bounds[b + 1]]
+            px, py = xs[points, None], ys[points, None]
+            y1, y2 = self.y1[start:end], self.y2[start:end]
+            crosses = ((y1 > py) != (y2 > py)) & (px < self.x1[start:end] + (py - y1) * self.slope[start:end])
+            result[points] = np.count_nonzero(crosses, axis=1) % 2 == 1
+        return result
+
+
+class RegionIndex:
+    """Определение региона по координатам по полигонам regions.geojson.
+
+    Полигоны загружаются и подготавливаются один раз. Поверх них строится сетка с шагом
+    CELL_SIZE: ячейка, не пересекаемая ни одной границей, целиком лежит в одном регионе
+    (или вне всех), и точки в ней классифицируются одним обращением к массиву. Точная
+    проверка подготовленными кольцами нужна только для точек в пограничных ячейках.
+    """
+
+    def __init__(self, features: Optional[List[dict]] = None, cell_size: float = CELL_SIZE):
+        self._features = features
+        self.cell_size = cell_size
+        self._regions = None
+        self._grid = None
+        self._lock = threading.Lock()
+
+    @property
+    def regions(self) -> list:
+        if self._regions is None:
+            with self._lock:
+                if self._regions is None:
+                    features = self._features if self._features is not None else region_tiles.features
+                    self._regions = [
+                        (
+                            feature['name'],
+                            [[PreparedRing(ring) for ring in polygon] for polygon in feature['polygons']]
+                        )
+                        for feature in features
+                    ]
+        return self._regions
+
+    @property
+    def names(self) -> List[str]:
+        return [name for name, _ in self.regions]
+
+    @property
+    def grid(self) -> Tuple[float, float, np.ndarray]:
+        """Сетка верхнего уровня: (west, south, коды ячеек)."""
+        if self._grid is None:
+            regions = self.regions
+            with self._lock:
+                if self._grid is None:
+                    self._grid = self._build_grid(regions)
+        return self._grid
+
+    def _build_grid(self, regions: list) -> Tuple[float, float, np.ndarray]:
+        rings = [ring for _, polygons in regions for polygon in polygons for ring in polygon]
+        west = min(ring.bbox[0] for ring in rings)
+        south = min(ring.bbox[1] for ring in rings)
+        east = max(ring.bbox[2] for ring in rings)
+        north = max(ring.bbox[3] for ring in rings)
+        cols = int((east - west) // self.cell_size) + 1
+        rows = int((north - south) // self.cell_size) + 1
+        codes = np.full((rows, cols), -1, dtype=np.int16)
+
+        # Ребра уплотняются до шага в пол-ячейки, чтобы отметить все ячейки, которые они пересекают
+        for ring in rings:
+            x1, y1, x2, y2 = ring.edges
+            steps = np.ceil(np.hypot(x2 - x1, y2 - y1) / (self.cell_size / 2)).astype(int) + 1
+            t = np.arange(steps.sum()) - np.repeat(np.cumsum(steps) - steps, steps)
+            t = t / np.repeat(np.maximum(steps - 1, 1), steps)
+            xs = np.repeat(x1, steps) + t * np.repeat(x2 - x1, steps)
+            ys = np.repeat(y1, steps) + t * np.repeat(y2 - y1, steps)
+            codes[((ys - south) // self.cell_size).astype(int), ((xs - west) // self.cell_size).astype(int)] = BOUNDARY
+        # Ребро может задеть угол ячейки между двумя отсчетами — такая ячейка соседствует с отмеченной
+        boundary = codes == BOUNDARY
+        dilated = boundary.copy()
+        dilated[1:, :] |= boundary[:-1, :]
+        dilated[:-1, :] |= boundary[1:, :]
+        dilated[:, 1:] |= boundary[:, :-1]
+        dilated[:, :-1] |= boundary[:, 1:]
+        dilated[1:, 1:] |= boundary[:-1, :-1]
+        dilated[1:, :-1] |= boundary[:-1, 1:]
+        dilated[:-1, 1:] |= boundary[1:, :-1]
+        dilated[:-1, :-1] |= boundary[1:, 1:]
+        codes[dilated] = BOUNDARY
+
+        interior = np.flatnonzero(codes.ravel() != BOUNDARY)
+        row, col = np.divmod(interior, cols)
+        codes.ravel()[interior] = self._exact_codes(south + (row + 0.5) * self.cell_size,
+                                                    west + (col + 0.5) * self.cell_size, regions)
+        return west, south, codes
+
+    def _exact_codes(self, lats: np.ndarray, lons: np.ndarray, regions: list) -> np.ndarray:
+        codes = np.full(len(lats), -1, dtype=np.int16)
+        for start in range(0, len(lats), CHUNK_SIZE):
+            xs, ys = lons[start:start + CHUNK_SIZE], lats[start:start + CHUNK_SIZE]
+            chunk = codes[start:start + CHUNK_SIZE]
+            for code, (_, polygons) in enumerate(regions):
+                pending = np.flatnonzero(chunk < 0)
+                if not len(pending):
+                    break
+                px, py = xs[pending], ys[pending]
+                inside = np.zeros(len(pending), dtype=bool)
+                for outer, *holes in polygons:
+                    hit = outer.contains(px, py)
+                    for hole in holes:
+                        hit &= ~hole.contains(px, py)
+                    inside |= hit
+                chunk[pending[inside]] = code
+        return codes
+
+    def lookup_codes(self, lats: Sequence[float], lons: Sequence[float]) -> np.ndarray:
+        """Номера регионов (индекс в names) для массивов координат; -1 — вне всех регионов.
+
+        Raises:
+            ValueError: Если массивы разной длины или содержат не числа.
+        """
+        lats = np.asarray(lats, dtype=float)
+        lons = np.asarray(lons, dtype=float)
+        if lats.ndim != 1 or lats.shape != lons.shape:
+            raise ValueError("lats and lons must be flat arrays of the same length")
+        west, south, grid = self.grid
+        rows = np.floor((lats - south) / self.cell_size)
+        cols = np.floor((lons - west) / self.cell_size)
+        on_grid = (rows >= 0) & (rows < grid.shape[0]) & (cols >= 0) & (cols < grid.shape[1])
+        codes = np.full(len(lats), -1, dtype=np.int16)
+        codes[on_grid] = grid[rows[on_grid].astype(int), cols[on_grid].astype(int)]
+        boundary = np.flatnonzero(codes == BOUNDARY)
+        if len(boundary):
+            codes[boundary] = self._exact_codes(lats[boundary], lons[boundary], self.regions)
+        return codes
+
+    def lookup(self, lats: Sequence[float], lons: Sequence[float]) -> List[Optional[str]]:
+        """Названия регионов для массивов координат; None — точка вне всех регионов.
+
+        Raises:
+            ValueError: Если массивы разной длины или содержат не числа.
+        """
+        names = self.names
+        return [names[code] if code >= 0 else None for code in self.lookup_codes(lats, lons)]
+
+    def region_at(self, lat: float, lon: float) -> Optional[str]:
+        """Название региона для одной точки."""
+        return self.lookup([lat], [lon])[0]
+
+
+region_index = RegionIndex()
@@ -0,0 +1,407 @@
+# reports.py
+import csv
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from openpyxl import Workbook
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+from sqlalchemy import and_, event, inspect, or_, true, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from models import Fire, FireForce, ReportCache
+from exporters import iter_fires, forces_summary
+import queries
+
+logger = logging.getLogger(__name__)
+
+REPORT_WORKERS = 2     # Процессы, в которых строятся файлы отчетов
+JOB_TIMEOUT = 600      # Задание без результата дольше 10 минут считается потерянным и запускается заново
+WAIT_TIMEOUT = 5       # Сколько синхронный экспорт ждет готовности отчета; дольше — 202 с заданием (секунды)
+POLL_INTERVAL = 0.5    # Опрос статуса задания, запущенного другим процессом (секунды)
+
+PENDING, RUNNING, DONE, FAILED, STALE = 'pending', 'running', 'done', 'failed', 'stale'
+
+FORMATS = {
+    'pdf': 'application/pdf',
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+}
+
+LABELS = {
+    'ru': {
+        'summary': 'Сводка по регионам', 'analytics': 'Аналитика пожаров', 'fires': 'Пожары',
+        'region': 'Регион', 'month': 'Месяц', 'count': 'Количество', 'total_area': 'Площадь (га)',
+        'total_damage': 'Ущерб (тенге)', 'users_count': 'Пользователи',
+        'months': ['Янв', 'Фев', 'Мар', 'Апр', 'Май', 'Июн', 'Июл', 'Авг', 'Сен', 'Окт', 'Ноя', 'Дек'],
+        'fire_headers': ["ID", "Дата", "Регион", "Площадь (га)", "Ущерб (тенге)", "Силы", "Квартал", "Выдел",
+                         "Ущерб лесу (га)", "Ущерб лесопокрытым (га)", "Ущерб верхним (га)", "Ущерб нелесным (га)",
+                         "Затраты (тенге)"]
+    },
+    'kz': {
+        'summary': 'Өңірлер бойынша жиынтық', 'analytics': 'Өрт аналитикасы', 'fires': 'Өрттер',
+        'region': 'Өңір', 'month': 'Ай', 'count': 'Саны', 'total_area': 'Ауданы (га)',
+        'total_damage': 'Залал (теңге)', 'users_count': 'Пайдаланушылар',
+        'months': ['Қаң', 'Ақп', 'Нау', 'Сәу', 'Мам', 'Мау', 'Шіл', 'Там', 'Қыр', 'Қаз', 'Қар', 'Жел'],
+        'fire_headers': ["ID", "Күні", "Өңір", "Ауданы (га)", "Залал (теңге)", "Күштер", "Орам", "Бөлік",
+                         "Орманға залал (га)", "Орман жабылған (га)", "Жоғарғы (га)", "Орман емес (га)",
+                         "Шығындар (теңге)"]
+    }
+}
+
+ReportTable = Tuple[str, List[str], List[list]]
+
+
+# Построение таблиц отчетов (в процессе приложения, читает БД)
+
+def summary_table(db: Session, filters: dict) -> ReportTable:
+    labels = LABELS[filters['lang']]
+    rows = [
+        [region, count, float(area or 0), float(damage or 0), users]
+        for region, count, area, damage, users in queries.region_summary(db, _criteria(filters))
+    ]
+    headers = [labels['region'], labels['count'], labels['total_area'], labels['total_damage'], labels['users_count']]
+    return labels['summary'], headers, rows
+
+
+def analytics_table(db: Session, filters: dict) -> ReportTable:
+    labels = LABELS[filters['lang']]
+    rows = [
+        [region, labels['months'][int(month) - 1], count, float(area or 0), float(damage or 0)]
+        for region, month, count, area, damage in queries.region_month_stats(db, _criteria(filters))
+    ]
+    headers = [labels['region'], labels['month'], labels['count'], labels['total_area'], labels['total_damage']]
+    return labels['analytics'], headers, rows
+
+
+def fires_table(db: Session, filters: dict) -> ReportTable:
+    labels = LABELS[filters['lang']]
+    fire_filters = queries.fire_date_filters(year=filters.get('year'), month=filters.get('month'), region=filters.get('region'))
+    rows = [
+        [fire.id, fire.fire_date.strftime("%Y-%m-%d %H:%M:%S"), fire.region, fire.area, fire.damage_tenge or 0,
+         forces_summary(fire), fire.quarter or '', fire.allotment or '', fire.damage_les or 0,
+         fire.damage_les_lesopokryt or 0, fire.damage_les_verh or 0, fire.damage_not_les or 0, fire.firefighting_costs or 0]
+        for fire in iter_fires(db, fire_filters, with_forces=True)
+    ]
+    return labels['fires'], list(labels['fire_headers']), rows
+
+
+REPORT_TYPES: Dict[str, Callable[[Session, dict], ReportTable]] = {
+    'summary': summary_table,
+    'analytics': analytics_table,
+    'fires': fires_table
+}
+
+
+def _criteria(filters: dict) -> dict:
+    return {key: filters.get(key) for key in ('region', 'year', 'month')}
+
+
+# Рендеринг файлов (выполняется в процессах пула, не обращается к БД)
+
+def _cell(value) -> str:
+    return f"{value:.2f}" if isinstance(value, float) else str(value)
+
+
+def render_pdf(path: str, title: str, headers: Sequence, rows: List[list]) -> None:
+    table = Table([list(headers)] + [[_cell(value) for value in row] for row in rows], repeatRows=1)
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+    ]))
+    styles = getSampleStyleSheet()
+    SimpleDocTemplate(path, pagesize=letter).build([Paragraph(title, styles['Title']), Spacer(1, 12), table])
+
+
+def render_csv(path: str, title: str, headers: Sequence, rows: List[list]) -> None:
+    with open(path, 'w', newline='', encoding='utf-8-sig') as file:
+        writer = csv.writer(file)
+        writer.writerow(headers)
+        writer.writerows(rows)
+
+
+def render_xlsx(path: str, title: str, headers: Sequence, rows: List[list]) -> None:
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title[:31])
+    sheet.append(list(headers))
+    for row in rows:
+        sheet.append(row)
+    workbook.save(path)
+
+
+RENDERERS = {'pdf': render_pdf, 'csv': render_csv, 'xlsx': render_xlsx}
+
+
+def render(fmt: str, path: str, title: str, headers: Sequence, rows: List[list]) -> int:
+    """Строит файл отчета во временном файле и атомарно заменяет им path.
+
+    Returns:
+        int: Размер файла (байт).
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    os.close(fd)
+    try:
+        RENDERERS[fmt](tmp_path, title, headers, rows)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return os.path.getsize(path)
+
+
+# Задания
+
+def normalize_filters(year=None, month=None, region=None, lang='ru') -> dict:
+    """Приводит фильтры отчета к каноническому виду (он же — ключ кэша)."""
+    if month is not None and not 1 <= int(month) <= 12:
+        raise ValueError('Месяц должен быть от 1 до 12')
+    return {
+        'year': int(year) if year else None,
+        'month': int(month) if month else None,
+        'region': region or None,
+        'lang': lang if lang in LABELS else 'ru'
+    }
+
+
+def job_to_dict(job: ReportCache) -> dict:
+    return {
+        'id': job.id,
+        'report_type': job.report_type,
+        'format': job.format,
+        'filters': json.loads(job.filters),
+        'status': job.status,
+        'error': job.error,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        'file_path': job.file_path,
+        **json.loads(job.data or '{}')
+    }
+
+
+class ReportService:
+    """Асинхронное построение отчетов с кэшем готовых файлов в report_cache.
+
+    Запрос отчета находит или создает задание по ключу (тип, формат, фильтры): готовый
+    файл отдается сразу, выполняющееся задание переиспользуется. Данные читаются в потоке
+    заданий, а PDF/CSV/XLSX строятся в пуле процессов и не занимают поток обработки
+    запросов. Запись пожаров помечает затронутые отчеты устаревшими (см. _invalidate_reports).
+    """
+
+    def __init__(self, session_factory: Callable, folder: str = 'reports', workers: int = REPORT_WORKERS,
+                 job_timeout: float = JOB_TIMEOUT):
+        self.session_factory = session_factory
+        self.folder = folder
+        self.workers = workers
+        self.job_timeout = job_timeout
+        self._futures: Dict[int, Future] = {}
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self._jobs: Optional[ThreadPoolExecutor] = None
+        self._renderers: Optional[ProcessPoolExecutor] = None
+
+    def _ensure_started(self) -> None:
+        # Пулы создаются лениво и заново после fork (воркеры gunicorn)
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                os.makedirs(self.folder, exist_ok=True)
+                self._jobs = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='report')
+                self._renderers = ProcessPoolExecutor(max_workers=self.workers)
+                self._futures = {}
+                self._pid = os.getpid()
+
+    def _reusable(self, job: ReportCache) -> bool:
+        if job.status == DONE:
+            return bool(job.file_path) and os.path.exists(job.file_path)
+        if job.status in (PENDING, RUNNING):
+            return job.created_at > datetime.utcnow() - timedelta(seconds=self.job_timeout)
+        return False
+
+    def request(self, report_type: str, fmt: str, filters: dict, user_id: Optional[int] = None) -> dict:
+        """Возвращает задание отчета, при необходимости ставя его в очередь.
+
+        Args:
+            filters (dict): Фильтры, приведенные normalize_filters.
+        """
+        if report_type not in REPORT_TYPES:
+            raise ValueError(f"Неизвестный тип отчета: {report_type}")
+        if fmt not in FORMATS:
+            raise ValueError(f"Неподдерживаемый формат отчета: {fmt}")
+        key = json.dumps(filters, sort_keys=True, ensure_ascii=False)
+        with self.session_factory() as db:
+            query = db.query(ReportCache).filter_by(report_type=report_type, format=fmt, filters=key)
+            job = query.one_or_none()
+            if job is not None and self._reusable(job):
+                return job_to_dict(job)
+            values = {'status': PENDING, 'error': None, 'created_at': datetime.utcnow(), 'finished_at': None,
+                      'requested_by': user_id}
+            try:
+                if job is None:
+                    job = ReportCache(report_type=report_type, format=fmt, filters=key, region=filters['region'],
+                                      year=filters['year'], month=filters['month'], data='{}', **values)
+                    db.add(job)
+                    db.commit()
+                else:
+                    # Условное обновление: задание перезапускает только один из одновременных запросов
+                    claimed = db.query(ReportCache).filter(
+                        ReportCache.id == job.id, ReportCache.status == job.status, ReportCache.created_at == job.created_at
+                    ).update(values, synchronize_session=False)
+                    db.commit()
+                    if not claimed:
+                        return job_to_dict(query.one())
+            except IntegrityError:
+                db.rollback()
+                return job_to_dict(query.one())
+            db.refresh(job)
+            result = job_to_dict(job)
+        self._submit(result['id'])
+        return result
+
+    def _submit(self, job_id: int) -> None:
+        self._ensure_started()
+        future = self._jobs.submit(self._run, job_id)
+        with self._lock:
+            self._futures[job_id] = future
+        future.add_done_callback(lambda _: self._futures.pop(job_id, None))
+
+    def _finish(self, db: Session, job_id: int, values: dict) -> bool:
+        finished = db.query(ReportCache).filter(ReportCache.id == job_id, ReportCache.status == RUNNING).update(
+            {**values, 'finished_at': datetime.utcnow()}, synchronize_session=False
+        )
+        db.commit()
+        return bool(finished)
+
+    def _run(self, job_id: int) -> None:
+        with self.session_factory() as db:
+            if not db.query(ReportCache).filter(ReportCache.id == job_id, ReportCache.status == PENDING).update(
+                    {'status': RUNNING}, synchronize_session=False):
+                db.rollback()
+                return
+            db.commit()
+            job = db.get(ReportCache, job_id)
+            try:
+                title, headers, rows = REPORT_TYPES[job.report_type](db, json.loads(job.filters))
+                db.commit()  # Завершаем читающую транзакцию до построения файла
+                path = os.path.join(self.folder, f"{job.report_type}_{job.id}.{job.format}")
+                size = self._renderers.submit(render, job.format, path, title, headers, rows).result()
+                if not self._finish(db, job_id, {'status': DONE, 'file_path': path,
+                                                 'data': json.dumps({'rows': len(rows), 'size': size})}):
+                    logger.info(f"Отчет {job_id} устарел во время построения")
+            except Exception as e:
+                db.rollback()
+                logger.error(f"Ошибка построения отчета {job_id}: {str(e)}")
+                self._finish(db, job_id, {'status': FAILED, 'error': str(e)[:1000]})
+
+    def close(self) -> None:
+        """Останавливает пулы заданий и рендеринга (ожидая текущие задания)."""
+        with self._lock:
+            if self._pid == os.getpid():
+                self._jobs.shutdown()
+                self._renderers.shutdown()
+            self._pid = None
+
+    def job(self, job_id: int) -> Optional[dict]:
+        with self.session_factory() as db:
+            job = db.get(ReportCache, job_id)
+            return job_to_dict(job) if job else None
+
+    def wait(self, job_id: int, timeout: float = WAIT_TIMEOUT) -> Optional[dict]:
+        """Ждет завершения задания не дольше timeout секунд и возвращает его состояние."""
+        future = self._futures.get(job_id)
+        if future is not None:
+            try:
+                future.result(timeout)
+            except FutureTimeout:
+                pass
+            return self.job(job_id)
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.job(job_id)
+            if job is None or job['status'] not in (PENDING, RUNNING) or time.monotonic() >= deadline:
+                return job
+            time.sleep(POLL_INTERVAL)
+
+
+# Инвалидация: запись пожара помечает устаревшими отчеты, в окно фильтров которых он попадает
+
+def _fire_windows(fire: Fire) -> set:
+    """Окна (регион, год, месяц) пожара до и после изменения."""
+    state = inspect(fire)
+    regions = set(state.attrs.region.history.deleted or ()) | {fire.region}
+    dates = set(state.attrs.fire_date.history.deleted or ()) | {fire.fire_date}
+    return {(region, date.year, date.month) for region in regions for date in dates if date is not None}
+
+
+def _track_fire_write(mapper, connection, target: Fire) -> None:
+    db = Session.object_session(target)
+    if db is not None:
+        db.info.setdefault('report_windows', set()).update(_fire_windows(target))
+
+
+def _track_force_write(mapper, connection, target: FireForce) -> None:
+    db = Session.object_session(target)
+    if db is not None:
+        fire = inspect(target).attrs.fire.loaded_value
+        # Если пожар не загружен, окно неизвестно — устаревают все отчеты
+        windows = _fire_windows(fire) if isinstance(fire, Fire) else {(None, None, None)}
+        db.info.setdefault('report_windows', set()).update(windows)
+
+
+def _window_condition(region, year, month):
+    if region is None:
+        return true()
+    return and_(
+        or_(ReportCache.region.is_(None), ReportCache.region == region),
+        or_(ReportCache.year.is_(None), ReportCache.year == year),
+        or_(ReportCache.month.is_(None), ReportCache.month == month)
+    )
+
+
+def invalidate(db: Session, windows: set) -> None:
+    """Помечает устаревшими отчеты, фильтры которых покрывают окна (регион, год, месяц).
+
+    Выполняется в транзакции вызывающего кода, поэтому откат записи отменяет и инвалидацию.
+    Окно (None, None, None) затрагивает все отчеты.
+    """
+    db.connection().execute(
+        update(ReportCache)
+        .where(ReportCache.status.in_((RUNNING, DONE)), or_(*[_window_condition(*window) for window in windows]))
+        .values(status=STALE)
+    )
+
+
+@event.listens_for(Session, 'after_flush')
+def _invalidate_reports(db: Session, flush_context) -> None:
+    windows = db.info.pop('report_windows', None)
+    if windows:
+        invalidate(db, windows)
+
+
+for _event in ('after_insert', 'after_update', 'after_delete'):
+    event.listen(Fire, _event, _track_fire_write)
+    event.listen(FireForce, _event, _track_force_write)
+
+
+_service: Optional[ReportService] = None
+
+
+def get_service() -> ReportService:
+    """Общий для процесса ReportService приложения (создается при первом обращении)."""
+    global _service
+    if _service is None:
+        from config import Config
+        from database import SessionLocal
+        _service = ReportService(SessionLocal, Config.REPORTS_FOLDER, Config.REPORT_WORKERS)
+    return _service
@@ -0,0 +1,258 @@
+# response_cache.py
+import hashlib
+import json
+import threading
+import time
+import uuid
+import zlib
+from collections import Counter, OrderedDict
+from datetime import datetime
+from functools import wraps
+from typing import Any, Callable, Dict, Iterable, List, Optional
+import msgpack
+from flask import Response, make_response, request
+import cache_tags
+from cache_tags import ANY, TagStore, fire_tags
+
+SCOPED_ROLES = ('operator', 'engineer')  # Роли, которым видны только данные своего региона
+STALE_TTL = 300        # Сколько после истечения ответ еще может отдаваться, пока другой воркер его пересчитывает
+LOCK_TIMEOUT = 60      # Блокировка пересчета ключа снимается сама, если воркер завис или упал (секунды)
+WAIT_TIMEOUT = 15      # Сколько запрос ждет чужого пересчета, прежде чем считать сам (секунды)
+POLL_INTERVAL = 0.05   # Опрос готовности чужого пересчета (секунды)
+
+LOCAL_MAX_ITEMS = 2048              # Записей в кэше процесса (L1)
+LOCAL_MAX_BYTES = 64 * 1024 * 1024  # Байт закодированных ответов в L1
+LOCAL_TTL = 60         # Время жизни записи L1 (секунды)
+COMPRESS_MIN = 1024    # Ответы от 1 КБ сжимаются
+
+
+def request_year(year: Optional[int], date_from: Optional[str], date_to: Optional[str]) -> Optional[int]:
+    """Год, которым ограничен период запроса, или None, если период шире года или не распознан."""
+    if year:
+        return year
+    try:
+        years = {datetime.fromisoformat(str(value)[:10]).year for value in (date_from, date_to)}
+    except (TypeError, ValueError):
+        return None
+    return years.pop() if len(years) == 1 else None
+
+
+def encode_entry(entry: tuple) -> bytes:
+    """Кодирует ответ (тело, mimetype, свежий до) в msgpack; большие ответы сжимаются zlib."""
+    packed = msgpack.packb(list(entry), use_bin_type=True)
+    if len(packed) >= COMPRESS_MIN:
+        return b'z' + zlib.compress(packed, 1)
+    return b'm' + packed
+
+
+def decode_entry(raw: Optional[bytes]) -> Optional[tuple]:
+    """Раскодирует значение, записанное encode_entry; None — если значения нет."""
+    if raw is None:
+        return None
+    packed = zlib.decompress(raw[1:]) if raw[:1] == b'z' else raw[1:]
+    return tuple(msgpack.unpackb(packed, raw=False))
+
+
+class LocalCache:
+    """LRU-кэш процесса, ограниченный числом записей и суммарным размером значений.
+
+    Значения — bytes или str (закодированные ответы), поэтому их размер известен точно. У каждой записи свое время жизни.
+    """
+
+    def __init__(self, max_items: int = LOCAL_MAX_ITEMS, max_bytes: int = LOCAL_MAX_BYTES):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._items: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = Counter()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None or item[0] <= time.monotonic():
+                if item is not None:
+                    self._remove(key)
+                self._stats['misses'] += 1
+                return None
+            self._items.move_to_end(key)
+            self._stats['hits'] += 1
+            return item[1]
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        size = len(key) + len(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._items:
+                self._remove(key)
+            self._items[key] = (time.monotonic() + ttl, value, size)
+            self.size += size
+            while len(self._items) > self.max_items or self.size > self.max_bytes:
+                self._remove(next(iter(self._items)))
+                self._stats['evictions'] += 1
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            if key in self._items:
+                self._remove(key)
+
+    def clear(self, prefix: str = '') -> None:
+        """Удаляет все записи, ключ которых начинается с prefix."""
+        with self._lock:
+            for key in [key for key in self._items if key.startswith(prefix)]:
+                self._remove(key)
+
+    def _remove(self, key: str) -> None:
+        self.size -= self._items.pop(key)[2]
+
+    def stats(self) -> Dict[str, int]:
+        """Счетчики hits, misses, evictions и текущие items, bytes."""
+        with self._lock:
+            return {'hits': self._stats['hits'], 'misses': self._stats['misses'],
+                    'evictions': self._stats['evictions'], 'items': len(self._items), 'bytes': self.size}
+
+
+class ResponseCache:
+    """Кэш JSON-ответов API с учетом роли и региона пользователя и сбросом по тегам.
+
+    Ключ включает маршрут, параметры запроса, роль и (для operator/engineer) регион
+    из токена, поэтому ответ одного региона не отдается другому. Каждый ответ помечается
+    тегами (таблица, регион и год); версия тега (cache_tags.TagStore) входит в ключ.
+    Коммит записи пожара, пользователя, журнала или модели прогноза в любом процессе —
+    Flask, FastAPI или фоновой задаче — меняет версии затронутых тегов, и старые ответы
+    больше не находятся, поэтому время жизни ответов может быть долгим.
+
+    Пересчет ключа выполняет только один запрос во всех процессах: он берет блокировку
+    в общем кэше (SET NX с истечением). Остальные в это время получают истекший ответ,
+    если он еще хранится, или ждут результата, а не пересчитывают то же самое.
+
+    Кэш двухуровневый: перед общим кэшем (L2, Redis) стоит LocalCache процесса (L1) с
+    закодированными ответами, так что попадание в L1 не обращается к Redis. Версии
+    тегов процесс тоже держит в памяти и обновляет по pub/sub.
+    """
+
+    def __init__(self, backend, tag_store: Optional[TagStore] = None, local: Optional[LocalCache] = None,
+                 local_ttl: float = LOCAL_TTL, stale_ttl: int = STALE_TTL, lock_timeout: int = LOCK_TIMEOUT,
+                 wait_timeout: float = WAIT_TIMEOUT, poll_interval: float = POLL_INTERVAL):
+        self.backend = backend
+        self._tag_store = tag_store
+        self.local = local or LocalCache()
+        self.local_ttl = local_ttl
+        self.stale_ttl = stale_ttl
+        self.lock_timeout = lock_timeout
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self._stats = Counter()
+        self._stats_lock = threading.Lock()
+
+    @property
+    def tag_store(self) -> TagStore:
+        """Хранилище версий тегов; по умолчанию — общее для процесса (cache_tags.configure)."""
+        return self._tag_store or cache_tags.get_store()
+
+    def versions(self, tags: Iterable[str]) -> Dict[str, str]:
+        """Текущие версии тегов."""
+        return self.tag_store.versions(tags)
+
+    def invalidate(self, tags: Iterable[str]) -> None:
+        """Сбрасывает все ответы, помеченные любым из тегов, во всех процессах."""
+        self.tag_store.bump(tags)
+
+    def key(self, tags: Iterable[str]) -> str:
+        """Ключ ответа на текущий запрос."""
+        role = request.user['role']
+        region = request.user['region'] if role in SCOPED_ROLES else None
+        params = sorted(request.args.items(multi=True))
+        raw = json.dumps([params, self.versions(tags)], sort_keys=True, separators=(',', ':'))
+        digest = hashlib.sha1(raw.encode('utf-8')).hexdigest()
+        return f"view:{request.endpoint}:{role}:{region or ANY}:{digest}"
+
+    def stats(self) -> Dict[str, Any]:
+        """Счетчики процесса: hits, stale, misses, coalesced, fallbacks и по уровням l1, l2."""
+        with self._stats_lock:
+            stats = {name: self._stats[name] for name in ('hits', 'stale', 'misses', 'coalesced', 'fallbacks')}
+            stats['l2'] = {'hits': self._stats['l2_hits'], 'misses': self._stats['l2_misses']}
+        stats['l1'] = self.local.stats()
+        return stats
+
+    def _count(self, name: str) -> None:
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def _get(self, key: str) -> Optional[tuple]:
+        """Ответ из L1, а если там его нет или он истек — из L2 (с записью в L1)."""
+        raw = self.local.get(key)
+        entry = decode_entry(raw)
+        if entry is not None and entry[2] > time.time():
+            return entry
+        raw = self.backend.get(key)
+        self._count('l2_hits' if raw is not None else 'l2_misses')
+        if raw is None:
+            return entry
+        self.local.set(key, raw, self.local_ttl)
+        return decode_entry(raw)
+
+    def _fill(self, key: str, timeout: int, view: Callable, args, kwargs) -> Response:
+        response = make_response(view(*args, **kwargs))
+        if response.status_code == 200 and not response.is_streamed:
+            raw = encode_entry((response.get_data(), response.mimetype, time.time() + timeout))
+            self.backend.set(key, raw, timeout=timeout + self.stale_ttl)
+            self.local.set(key, raw, min(self.local_ttl, timeout))
+        return response
+
+    def _wait(self, key: str, lock: str) -> Optional[tuple]:
+        """Ждет ответ, который пересчитывает владелец блокировки; None — если не дождались."""
+        deadline = time.monotonic() + self.wait_timeout
+        while time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+            raw, owner = self.backend.get_many(key, lock)
+            if raw is not None:
+                self.local.set(key, raw, self.local_ttl)
+                return decode_entry(raw)
+            if owner is None:
+                return None  # Владелец закончил, но ответ не кэшируется (ошибка)
+        return None
+
+    def cached(self, timeout: int, tags: Callable[[], List[str]]):
+        """Декоратор маршрута; применяется после token_required.
+
+        Args:
+            timeout (int): Время жизни ответа в секундах.
+            tags (Callable[[], List[str]]): Теги текущего запроса.
+
+        Кэшируются только успешные ответы (200).
+        """
+        def decorator(f):
+            @wraps(f)
+            def decorated(*args, **kwargs):
+                key = self.key(tags())
+                entry = self._get(key)
+                if entry is not None and entry[2] > time.time():
+                    self._count('hits')
+                    return _entry_response(entry)
+                lock, token = f"lock:{key}", uuid.uuid4().hex
+                if self.backend.add(lock, token, timeout=self.lock_timeout):
+                    self._count('misses')
+                    try:
+                        return self._fill(key, timeout, f, args, kwargs)
+                    finally:
+                        if self.backend.get(lock) == token:
+                            self.backend.delete(lock)
+                if entry is not None:
+                    self._count('stale')
+                    return _entry_response(entry)
+                entry = self._wait(key, lock)
+                if entry is not None:
+                    self._count('coalesced')
+                    return _entry_response(entry)
+                self._count('fallbacks')
+                return self._fill(key, timeout, f, args, kwargs)
+            return decorated
+        return decorator
+
+
+def _entry_response(entry: tuple) -> Response:
+    body, mimetype, _ = entry
+    return Response(body, status=200, mimetype=mimetype)
+
@@ -0,0 +1,183 @@
+# rollup.py
+import logging
+from datetime import datetime
+from typing import Iterable, Set, Tuple
+from sqlalchemy import distinct, extract
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Query, Session
+from sqlalchemy.sql import func as sql_func
+from models import Fire, FireForce, FireStatsMonthly, FireForceStatsMonthly, FireCreatorMonthly
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_MODELS = (FireStatsMonthly, FireForceStatsMonthly, FireCreatorMonthly)
+
+
+def month_bounds(year: int, month: int) -> Tuple[datetime, datetime]:
+    """Возвращает полуоткрытый интервал [начало месяца, начало следующего месяца)."""
+    start = datetime(year, month, 1)
+    end = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+    return start, end
+
+
+def lock_month(db: Session, region: str, year: int, month: int) -> None:
+    """Блокирует строку fire_stats_monthly ячейки до конца транзакции, создавая ее при необходимости.
+
+    Upsert берет блокировку строки и для новой, и для существующей ячейки, поэтому
+    конкурирующие пересчеты одной ячейки выполняются по очереди, а не затирают друг друга.
+    """
+    values = dict(region=region, year=year, month=month, fires_count=0, total_area=0.0, total_damage=0.0, users_count=0)
+    dialect = db.get_bind().dialect.name
+    if dialect == 'mysql':
+        stmt = mysql_insert(FireStatsMonthly).values(**values).on_duplicate_key_update(
+            fires_count=FireStatsMonthly.fires_count)
+    elif dialect == 'postgresql':
+        stmt = postgresql_insert(FireStatsMonthly).values(**values).on_conflict_do_update(
+            constraint='uq_fire_stats_monthly', set_={'fires_count': FireStatsMonthly.fires_count})
+    else:
+        # SQLite блокирует всю базу на запись — достаточно создать строку
+        stmt = sqlite_insert(FireStatsMonthly).values(**values).on_conflict_do_nothing()
+    db.execute(stmt)
+
+
+def _locking(db: Session, query: Query) -> Query:
+    """Чтение последних закоммиченных строк ячейки.
+
+    Обычное чтение InnoDB под REPEATABLE READ видит снимок начала транзакции и не заметило бы
+    пожар писателя, коммита которого ждал lock_month; блокирующее чтение (FOR SHARE) видит
+    его. PostgreSQL в READ COMMITTED и SQLite и так читают последние данные.
+    """
+    return query.with_for_update(read=True) if db.get_bind().dialect.name == 'mysql' else query
+
+
+def refresh_month(db: Session, region: str, year: int, month: int) -> None:
+    """Пересчитывает одну ячейку (регион, год, месяц) по таблице fires.
+
+    Использует диапазон по fire_date, поэтому читает только строки этой ячейки через индекс
+    (region, fire_date). Коммит не выполняется — вызывающий код фиксирует пересчет в той же
+    транзакции, что и изменение пожара.
+
+    Сначала ячейка блокируется (lock_month): второй писатель ждет коммита первого и затем
+    считает агрегат заново блокирующим чтением, которое видит пожар первого писателя.
+    """
+    lock_month(db, region, year, month)
+    start, end = month_bounds(year, month)
+    bucket = [Fire.region == region, Fire.fire_date >= start, Fire.fire_date < end]
+    cell = [FireStatsMonthly.region == region, FireStatsMonthly.year == year, FireStatsMonthly.month == month]
+    for model in (FireForceStatsMonthly, FireCreatorMonthly):
+        db.query(model).filter(model.region == region, model.year == year, model.month == month).delete(synchronize_session=False)
+
+    count, area, damage, users = _locking(db, db.query(
+        sql_func.count(Fire.id),
+        sql_func.sum(Fire.area),
+        sql_func.sum(Fire.damage_tenge),
+        sql_func.count(distinct(Fire.created_by))
+    ).filter(*bucket)).one()
+    if not count:
+        db.query(FireStatsMonthly).filter(*cell).delete()
+        return
+    db.query(FireStatsMonthly).filter(*cell).update({
+        'fires_count': count, 'total_area': area or 0.0, 'total_damage': damage or 0.0, 'users_count': users
+    })
+
+    forces = _locking(db, db.query(
+        FireForce.force_type,
+        sql_func.sum(FireForce.people_count),
+        sql_func.sum(FireForce.tecnic_count),
+        sql_func.sum(FireForce.aircraft_count)
+    ).join(Fire, FireForce.fire_id == Fire.id).filter(*bucket).group_by(FireForce.force_type)).all()
+    db.add_all([
+        FireForceStatsMonthly(region=region, year=year, month=month, force_type=force_type,
+                              people_count=people or 0, tecnic_count=tecnic or 0, aircraft_count=aircraft or 0)
+        for force_type, people, tecnic, aircraft in forces
+    ])
+
+    creators = _locking(db, db.query(distinct(Fire.created_by)).filter(*bucket, Fire.created_by.isnot(None))).all()
+    db.add_all([FireCreatorMonthly(region=region, year=year, month=month, user_id=user_id) for (user_id,) in creators])
+
+
+def lock(db: Session, keys: Iterable[Tuple[str, datetime]]) -> Set[Tuple[str, int, int]]:
+    """Блокирует ячейки сводки пар (регион, дата) до конца транзакции, по порядку ячеек.
+
+    Вызывается до записи пожаров, если они отправляются в БД раньше refresh (например, flush
+    ради id): тогда пожар блокируется после ячейки, и блокирующее чтение в refresh_month
+    одного писателя не ждет незакоммиченный пожар другого, пока тот ждет эту же ячейку.
+
+    Returns:
+        Set[Tuple[str, int, int]]: Ячейки (регион, год, месяц).
+    """
+    buckets = {(region, date.year, date.month) for region, date in keys if region and date}
+    with db.no_autoflush:  # Пожары сессии отправляются только после блокировки
+        for region, year, month in sorted(buckets):
+            lock_month(db, region, year, month)
+    return buckets
+
+
+def refresh(db: Session, keys: Iterable[Tuple[str, datetime]]) -> None:
+    """Обновляет сводку для затронутых пожаров.
+
+    Сначала блокирует ячейки (lock), затем отправляет изменения сессии (flush) и пересчитывает
+    ячейки, поэтому вызывающему коду не нужен flush перед вызовом.
+
+    Args:
+        db (Session): Сессия, в которой изменены пожары.
+        keys (Iterable[Tuple[str, datetime]]): Пары (регион, дата пожара) до и после изменения.
+    """
+    buckets = lock(db, keys)
+    db.flush()
+    for region, year, month in sorted(buckets):
+        refresh_month(db, region, year, month)
+
+
+def rebuild(db: Session) -> int:
+    """Полностью пересобирает сводку по всей таблице fires.
+
+    Returns:
+        int: Количество ячеек (регион, год, месяц) в новой сводке.
+    """
+    year = extract('year', Fire.fire_date)
+    month = extract('month', Fire.fire_date)
+    for model in ROLLUP_MODELS:
+        db.query(model).delete(synchronize_session=False)
+
+    stats = db.query(
+        Fire.region, year, month,
+        sql_func.count(Fire.id),
+        sql_func.sum(Fire.area),
+        sql_func.sum(Fire.damage_tenge),
+        sql_func.count(distinct(Fire.created_by))
+    ).group_by(Fire.region, year, month).all()
+    db.bulk_insert_mappings(FireStatsMonthly, [
+        {'region': r, 'year': int(y), 'month': int(m), 'fires_count': c, 'total_area': a or 0.0,
+         'total_damage': d or 0.0, 'users_count': u}
+        for r, y, m, c, a, d, u in stats
+    ])
+
+    forces = db.query(
+        Fire.region, year, month, FireForce.force_type,
+        sql_func.sum(FireForce.people_count),
+        sql_func.sum(FireForce.tecnic_count),
+        sql_func.sum(FireForce.aircraft_count)
+    ).join(Fire, FireForce.fire_id == Fire.id).group_by(Fire.region, year, month, FireForce.force_type).all()
+    db.bulk_insert_mappings(FireForceStatsMonthly, [
+        {'region': r, 'year': int(y), 'month': int(m), 'force_type': t, 'people_count': p or 0,
+         'tecnic_count': tc or 0, 'aircraft_count': ac or 0}
+        for r, y, m, t, p, tc, ac in forces
+    ])
+
+    creators = db.query(Fire.region, year, month, Fire.created_by).filter(Fire.created_by.isnot(None)).distinct().all()
+    db.bulk_insert_mappings(FireCreatorMonthly, [
+        {'region': r, 'year': int(y), 'month': int(m), 'user_id': u} for r, y, m, u in creators
+    ])
+    return len(stats)
+
+
+if __name__ == "__main__":
+    from database import SessionLocal
+    logging.basicConfig(level=logging.INFO)
+    with SessionLocal() as db:
+        buckets = rebuild(db)
+        db.commit()
+    logger.info(f"Сводка fire_stats_monthly пересобрана: {buckets} ячеек")
@@ -3,25 +3,15 @@ import os
 import jwt
 import logging
 import csv
-from io import StringIO, BytesIO
+from io import StringIO
 from datetime import datetime, timedelta
 import pyotp
-import aiohttp
-from tenacity import retry, stop_after_attempt, wait_fixed
-from flask import Flask, request, jsonify, render_template, redirect, url_for, send_file, flash, abort
-from flask_socketio import SocketIO, emit
+from flask import Flask, Response, request, jsonify, render_template, redirect, url_for, send_file, flash, abort, stream_with_context
+from flask_socketio import SocketIO, emit, join_room
 from flask_wtf.csrf import CSRFProtect
 from flask_login import LoginManager, login_user, login_required, logout_user, current_user
-from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
-from sqlalchemy import func, extract
-from sqlalchemy.sql import func as sql_func
-from sklearn.linear_model import LinearRegression
 import numpy as np
-from statsmodels.tsa.arima.model import ARIMA
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table
-from reportlab.lib.styles import getSampleStyleSheet
 from markupsafe import escape
 from minio import Minio
 from minio.error import S3Error
@@ -33,7 +23,22 @@ from utils import allowed_file, check_access
 from regions import REGIONS_AND_LOCATIONS
 from extensions import cache
 from dashboard import create_dash_app
-import pandas as pd
+import queries
+import rollup
+import pagination
+import audit
+import exporters
+import tiles
+import region_index
+import firms
+import weather
+import forecasting
+import reports
+import response_cache
+import principals
+import fire_events
+import fire_import
+from passwords import hasher
 
 # Инициализация приложения
 app = Flask(__name__)
@@ -84,14 +89,59 @@ def register_routes(app, socketio, cache, csrf):
         decorated.__name__ = f.__name__
         return decorated
 
+    # Версии тегов — общие для процессов (cache_tags, настраиваются в database.py)
+    api_cache = response_cache.ResponseCache(cache)
+    fire_notifier = fire_events.FireEventBatcher(socketio)
+
+    def fire_cache_tags(region_arg=None, dates=True):
+        """Теги кэша ответа по пожарам: область видимости пользователя и год периода запроса."""
+        def tags():
+            role, region = request.user['role'], request.user['region']
+            scope = region if role in response_cache.SCOPED_ROLES else None
+            if region_arg and role in ['admin', 'analyst']:
+                scope = request.args.get(region_arg) or scope
+            year = request.args.get('year', type=int)
+            if dates:
+                year = response_cache.request_year(year, request.args.get('date_from'), request.args.get('date_to'))
+            return response_cache.fire_tags(scope, year)
+        return tags
+
+    def request_date_filters(region=None):
+        """Фильтры по fire_date из параметров запроса year/month/date_from/date_to (диапазоны по индексу)."""
+        return queries.fire_date_filters(
+            year=request.args.get('year', type=int),
+            month=request.args.get('month', type=int),
+            date_from=request.args.get('date_from'),
+            date_to=request.args.get('date_to'),
+            region=region
+        )
+
+    def columnar_export(filters, fmt, filename):
+        """Отдает выгрузку пожаров в типизированном формате Parquet или Arrow."""
+        mimetype, extension = exporters.COLUMNAR_FORMATS[fmt]
+        download_name = f'{filename}.{extension}'
+        if fmt == 'arrow':
+            return Response(
+                stream_with_context(exporters.stream_fires_arrow(SessionLocal, filters)),
+                mimetype=mimetype,
+                headers={'Content-Disposition': f'attachment; filename={download_name}'}
+            )
+        return send_file(
+            exporters.write_fires_parquet(SessionLocal, filters),
+            mimetype=mimetype,
+            as_attachment=True,
+            download_name=download_name
+        )
+
     @app.errorhandler(413)
     def request_entity_too_large(error):
         return jsonify({'success': False, 'message': 'Размер файла превышает 16 МБ'}), 413
 
     @login_manager.user_loader
     def load_user(user_id):
+        # Пользователь берется из кэша процесса; БД читается только при промахе
         with SessionLocal() as db:
-            return db.query(User).get(int(user_id))
+            return principals.principal_cache.load(db, int(user_id))
 
     @app.route('/')
     def login_page():
@@ -109,7 +159,7 @@ def register_routes(app, socketio, cache, csrf):
             totp_code = form.totp.data if hasattr(form, 'totp') else request.form.get('totp')
             with SessionLocal() as db:
                 user = db.query(User).filter(User.username == username).first()
-                if user and check_password_hash(user.password, password):
+                if user and hasher.check(user.password, password):
                     if user.totp_secret:
                         totp = pyotp.TOTP(user.totp_secret)
                         if not totp_code or not totp.verify(totp_code):
@@ -157,14 +207,15 @@ def register_routes(app, socketio, cache, csrf):
         with SessionLocal() as db:
             user = db.query(User).filter(User.id == request.user['user_id']).first()
             if 'password' in data and data['password']:
-                user.password = generate_password_hash(data['password'])
+                user.password = hasher.generate(data['password'])
             user.region = data.get('region') or None
             if 'totp_enable' in data and data['totp_enable'] == 'on' and not user.totp_secret:
                 user.totp_secret = pyotp.random_base32()
             elif 'totp_disable' in data and data['totp_disable'] == 'on':
                 user.totp_secret = None
             db.commit()
-            log_event(user.username, 'UPDATE', 'users', user.id, str({k: v for k, v in data.items() if k != 'password'}))
+            principals.principal_cache.invalidate(user.id)
+            log_event(user.id, 'UPDATE', 'users', user.id, str({k: v for k, v in data.items() if k != 'password'}))
         flash('Профиль обновлен.', 'success')
         return jsonify({'success': True, 'totp_secret': user.totp_secret if 'totp_enable' in data else None})
 
@@ -242,40 +293,50 @@ def register_routes(app, socketio, cache, csrf):
                     created_by=current_user.id
                 )
                 db.add(new_fire)
+                rollup.refresh(db, [(new_fire.region, new_fire.fire_date)])
                 db.commit()
-                log_event(current_user.username, 'INSERT', 'fires', new_fire.id, str(form.data))
+                log_event(current_user.id, 'INSERT', 'fires', new_fire.id, str(form.data))
                 flash('Данные успешно добавлены!', 'success')
-                socketio.emit('new_fire', {'message': f"Новый пожар в {new_fire.region}", 'region': new_fire.region})
+                fire_notifier.publish(new_fire.id, new_fire.region)
                 return redirect(url_for('dashboard'))
         return render_template('form.html', form=form, regions_and_locations=REGIONS_AND_LOCATIONS)
 
     @app.route('/api/fires', methods=['GET'])
     @token_required
-    @cache.cached(timeout=60, query_string=True)
+    @api_cache.cached(timeout=3600, tags=fire_cache_tags())
     def get_fires_api():
         role = request.user['role']
         region = request.user['region']
         page = int(request.args.get('page', 1))
         per_page = int(request.args.get('per_page', 10))
-        date_from = request.args.get('date_from')
-        date_to = request.args.get('date_to')
         search = request.args.get('search', '').strip()
+        try:
+            filters = request_date_filters(region if role in ['operator', 'engineer'] else None)
+        except ValueError:
+            return jsonify({'success': False, 'message': 'Некорректный период'}), 400
         with SessionLocal() as db:
-            query = db.query(Fire)
-            if role in ['operator', 'engineer'] and region:
-                query = query.filter(Fire.region == region)
-            if date_from:
-                query = query.filter(Fire.date >= date_from)
-            if date_to:
-                query = query.filter(Fire.date <= date_to)
+            query = db.query(Fire).filter(*filters)
             if search:
                 query = query.filter(
                     (Fire.region.ilike(f'%{search}%')) |
                     (Fire.description.ilike(f'%{search}%')) |
                     (Fire.file_path.ilike(f'%{search}%'))
                 )
-            total = query.count()
-            fires = query.order_by(Fire.date.desc()).offset((page - 1) * per_page).limit(per_page).all()
+            next_cursor = None
+            after = request.args.get('after')
+            if after is not None:
+                # Курсорный режим: страница N стоит столько же, сколько первая, итог — из кэша
+                try:
+                    fires, next_cursor = pagination.keyset_page(query, Fire.fire_date, Fire.id, after, per_page)
+                except ValueError:
+                    return jsonify({'success': False, 'message': 'Некорректный курсор'}), 400
+                total = pagination.cached_count(cache, 'fires', query, {
+                    'region': region if role in ['operator', 'engineer'] else None,
+                    'args': {k: v for k, v in request.args.items() if k not in ('after', 'page', 'per_page')}
+                })
+            else:
+                total = query.count()
+                fires = query.order_by(Fire.fire_date.desc()).offset((page - 1) * per_page).limit(per_page).all()
             return jsonify({
                 'fires': [{
                     'id': f.id,
@@ -287,7 +348,8 @@ def register_routes(app, socketio, cache, csrf):
                     'file_path': f.file_path,
                     'created_by': f.created_by
                 } for f in fires],
-                'total': total
+                'total': total,
+                'next_cursor': next_cursor
             })
 
     @app.route('/api/fires', methods=['POST'])
@@ -317,14 +379,45 @@ def register_routes(app, socketio, cache, csrf):
                     created_by=request.user['user_id']
                 )
                 db.add(fire)
+                rollup.refresh(db, [(fire.region, fire.fire_date)])
                 db.commit()
                 log_event(request.user['user_id'], 'INSERT', 'fires', fire.id, str(data.dict()))
-            socketio.emit('new_fire', {'message': f"Новый пожар в {data.region}", 'region': data.region})
+            fire_notifier.publish(fire.id, fire.region)
             return jsonify({'success': True, 'fire_id': fire.id})
         except Exception as e:
             logger.error(f"Ошибка добавления пожара: {str(e)}")
             return jsonify({'success': False, 'message': 'Ошибка сервера'}), 500
 
+    @app.route('/api/fires/import', methods=['POST'])
+    @csrf.exempt
+    @token_required
+    def import_fires_api():
+        error, status = check_access(request.user['role'], ['admin', 'engineer', 'operator'])
+        if error:
+            return error, status
+        file = request.files.get('file')
+        if not file or not fire_import.allowed_import(file.filename):
+            return jsonify({'success': False, 'message': 'Нужен файл CSV или XLSX'}), 400
+        try:
+            # Все строки файла вставляются одной транзакцией; строки с ошибками возвращаются в отчете
+            with SessionLocal() as db:
+                result = fire_import.import_fires(db, file.stream, file.filename, request.user)
+        except fire_import.ImportFileError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        except Exception as e:
+            logger.error(f"Ошибка импорта пожаров: {str(e)}")
+            return jsonify({'success': False, 'message': 'Ошибка сервера'}), 500
+        log_event(request.user['user_id'], 'IMPORT', 'fires', None,
+                  f"{secure_filename(file.filename)}: импортировано {result['imported']}, отклонено {result['rejected']}")
+        for fire_id, region in result['fires']:
+            fire_notifier.publish(fire_id, region)
+        return jsonify({
+            'success': True,
+            'imported': result['imported'],
+            'rejected': result['rejected'],
+            'errors': result['errors']
+        })
+
     @app.route('/edit/<int:fire_id>', methods=['GET', 'POST'])
     @login_required
     def edit_fire(fire_id):
@@ -349,10 +442,11 @@ def register_routes(app, socketio, cache, csrf):
                     filename = secure_filename(file.filename)
                     minio_client.put_object(BUCKET_NAME, filename, file, file.content_length)
                     fire.file_path = filename
+                rollup.refresh(db, [(old_data['region'], old_data['fire_date']), (fire.region, fire.fire_date)])
                 db.commit()
                 changes = [f"{k}: {old_data[k]} -> {getattr(fire, k)}" for k in old_data if old_data[k] != getattr(fire, k)]
                 if changes:
-                    log_event(current_user.username, 'UPDATE', 'fires', fire.id, '; '.join(changes))
+                    log_event(current_user.id, 'UPDATE', 'fires', fire.id, '; '.join(changes))
                 flash('Данные успешно обновлены!', 'success')
                 return redirect(url_for('admin_dashboard'))
         return render_template('edit_fire.html', form=form, fire=fire)
@@ -379,6 +473,7 @@ def register_routes(app, socketio, cache, csrf):
                     return jsonify({'success': False, 'message': 'Пожар не найден'}), 404
                 if fire.created_by != request.user['user_id'] and request.user['role'] != 'admin':
                     return jsonify({'success': False, 'message': 'Нет прав для редактирования'}), 403
+                old_key = (fire.region, fire.fire_date)
                 fire.date = data.fire_date
                 fire.region = data.region
                 fire.kgu_oopt_id = data.kgu_oopt_id
@@ -386,6 +481,7 @@ def register_routes(app, socketio, cache, csrf):
                 fire.description = data.description
                 if file_path:
                     fire.file_path = file_path
+                rollup.refresh(db, [old_key, (fire.region, fire.fire_date)])
                 db.commit()
                 log_event(request.user['user_id'], 'UPDATE', 'fires', fire.id, str(data.dict()))
             return jsonify({'success': True})
@@ -400,9 +496,11 @@ def register_routes(app, socketio, cache, csrf):
             return abort(403)
         with SessionLocal() as db:
             fire = db.query(Fire).get_or_404(fire_id)
+            key = (fire.region, fire.fire_date)
             db.delete(fire)
+            rollup.refresh(db, [key])
             db.commit()
-            log_event(current_user.username, 'DELETE', 'fires', fire_id, f"Удалена запись о пожаре с ID {fire_id}")
+            log_event(current_user.id, 'DELETE', 'fires', fire_id, f"Удалена запись о пожаре с ID {fire_id}")
             flash(f"Запись о пожаре с ID {fire_id} успешно удалена.", 'success')
         return redirect(url_for('admin_dashboard'))
 
@@ -416,7 +514,9 @@ def register_routes(app, socketio, cache, csrf):
             fire = db.query(Fire).filter(Fire.id == fire_id).first()
             if not fire:
                 return jsonify({'success': False, 'message': 'Пожар не найден'}), 404
+            key = (fire.region, fire.fire_date)
             db.delete(fire)
+            rollup.refresh(db, [key])
             db.commit()
             log_event(request.user['user_id'], 'DELETE', 'fires', fire_id)
         return jsonify({'success': True})
@@ -431,20 +531,31 @@ def register_routes(app, socketio, cache, csrf):
 
     @app.route('/api/logs', methods=['GET'])
     @token_required
-    @cache.cached(timeout=60, query_string=True)
+    @api_cache.cached(timeout=600, tags=lambda: ['logs'])
     def get_logs():
         error, status = check_access(request.user['role'], ['admin'])
         if error:
             return error, status
         page = int(request.args.get('page', 1))
         per_page = int(request.args.get('per_page', 10))
+        after = request.args.get('after')
+        next_cursor = None
         with SessionLocal() as db:
-            total = db.query(AuditLog).count()
-            logs = db.query(AuditLog).order_by(AuditLog.timestamp.desc()).offset((page - 1) * per_page).limit(per_page).all()
+            query = db.query(AuditLog)
+            if after is not None:
+                try:
+                    logs, next_cursor = pagination.keyset_page(query, AuditLog.timestamp, AuditLog.id, after, per_page)
+                except ValueError:
+                    return jsonify({'success': False, 'message': 'Некорректный курсор'}), 400
+                total = pagination.cached_count(cache, 'audit_logs', query, {})
+            else:
+                total = query.count()
+                logs = query.order_by(AuditLog.timestamp.desc()).offset((page - 1) * per_page).limit(per_page).all()
         return jsonify({
             'logs': [{'time': str(l.timestamp), 'user_id': l.user_id, 'action': l.action, 'table': l.table_name,
                       'record_id': l.record_id, 'changes': escape(l.changes)} for l in logs],
-            'total': total
+            'total': total,
+            'next_cursor': next_cursor
         })
 
     @app.route('/api/logs/export', methods=['GET'])
@@ -500,18 +611,16 @@ def register_routes(app, socketio, cache, csrf):
     def export():
         form = ExportForm()
         if form.validate_on_submit():
-            with SessionLocal() as db:
-                query = db.query(Fire)
-                if form.start_date.data:
-                    query = query.filter(Fire.date >= form.start_date.data)
-                if form.end_date.data:
-                    query = query.filter(Fire.date <= form.end_date.data)
-                fires = query.all()
-                fire_data = [{k: getattr(f, k) for k in Fire.__table__.columns.keys()} for f in fires]
-                df = pd.DataFrame(fire_data)
-                csv_file = "/tmp/fire_data_export.csv"
-                df.to_csv(csv_file, index=False, encoding='utf-8-sig')
-                return send_file(csv_file, as_attachment=True, mimetype='text/csv')
+            filters = queries.fire_date_filters(date_from=form.start_date.data, date_to=form.end_date.data)
+            columns = Fire.__table__.columns.keys()
+            chunks = exporters.stream_fires_csv(
+                SessionLocal, filters, columns, lambda f: [getattr(f, k) for k in columns], bom=True
+            )
+            return Response(
+                stream_with_context(chunks),
+                mimetype='text/csv',
+                headers={'Content-Disposition': 'attachment; filename=fire_data_export.csv'}
+            )
         return render_template('export.html', form=form)
 
     @app.route('/api/export', methods=['GET'])
@@ -522,27 +631,26 @@ def register_routes(app, socketio, cache, csrf):
             return error, status
         role = request.user['role']
         region = request.user['region']
-        year = request.args.get('year')
-        month = request.args.get('month')
-        with SessionLocal() as db:
-            query = db.query(Fire)
-            if role in ['operator', 'engineer'] and region:
-                query = query.filter(Fire.region == region)
-            if year:
-                query = query.filter(extract('year', Fire.date) == year)
-            if month:
-                query = query.filter(extract('month', Fire.date) == month)
-            fires = query.all()
-        output = StringIO()
-        writer = csv.writer(output)
-        writer.writerow(['ID', 'Дата', 'Регион', 'КГУ/ООПТ', 'Площадь', 'Описание', 'Файл', 'Создал'])
-        writer.writerows([(f.id, f.date, f.region, f.kgu_oopt_id, f.area, f.description, f.file_path, f.created_by) for f in fires])
-        output.seek(0)
-        return send_file(
-            output,
+        year = request.args.get('year', type=int)
+        month = request.args.get('month', type=int)
+        try:
+            filters = request_date_filters(region if role in ['operator', 'engineer'] else None)
+        except ValueError:
+            return jsonify({'success': False, 'message': 'Некорректный период'}), 400
+        fmt = request.args.get('format', 'csv')
+        if fmt in exporters.COLUMNAR_FORMATS:
+            return columnar_export(filters, fmt, f'fires_export_{year or "all"}_{month or "all"}')
+        if fmt != 'csv':
+            return jsonify({'success': False, 'message': 'Неподдерживаемый формат выгрузки'}), 400
+        chunks = exporters.stream_fires_csv(
+            SessionLocal, filters,
+            ['ID', 'Дата', 'Регион', 'КГУ/ООПТ', 'Площадь', 'Описание', 'Файл', 'Создал'],
+            lambda f: (f.id, f.fire_date, f.region, f.kgu_oopt_id, f.area, f.description, f.file_path, f.created_by)
+        )
+        return Response(
+            stream_with_context(chunks),
             mimetype='text/csv',
-            as_attachment=True,
-            download_name=f'fires_export_{year or "all"}_{month or "all"}.csv'
+            headers={'Content-Disposition': f'attachment; filename=fires_export_{year or "all"}_{month or "all"}.csv'}
         )
 
     @app.route('/analytics')
@@ -553,77 +661,54 @@ def register_routes(app, socketio, cache, csrf):
             return redirect(url_for('fires_page'))
         lang = request.args.get('lang', 'ru')
         with SessionLocal() as db:
-            years = db.query(extract('year', Fire.date)).distinct().order_by(extract('year', Fire.date)).all()
-            years = [str(int(year[0])) for year in years if year[0]]
+            years = [str(year) for year in queries.stat_years(db)]
         return render_template('analytics.html', regions=REGIONS, years=years, lang=LANGUAGES[lang])
 
     @app.route('/api/analytics', methods=['GET'])
     @token_required
-    @cache.cached(timeout=60, query_string=True)
+    @api_cache.cached(timeout=3600, tags=fire_cache_tags('region_filter', dates=False))
     def get_analytics():
         error, status = check_access(request.user['role'], ['admin', 'analyst', 'engineer', 'operator'])
         if error:
             return error, status
         role = request.user['role']
         region = request.user['region']
-        year = request.args.get('year')
-        month = request.args.get('month')
+        year = request.args.get('year', type=int)
+        month = request.args.get('month', type=int)
         region_filter = request.args.get('region_filter')
         page = int(request.args.get('page', 1))
         per_page = int(request.args.get('per_page', 10))
+        scope = region if role in ['operator', 'engineer'] and region else None
+        if region_filter and role in ['admin', 'analyst']:
+            scope = region_filter
+        criteria = {'region': scope, 'year': year, 'month': month}
+        # Статистика берется из помесячной сводки, поэтому период задается только годом и месяцем:
+        # с date_from/date_to карта и статистика описывали бы разные окна
+        if request.args.get('date_from') or request.args.get('date_to'):
+            return jsonify({'success': False, 'message': 'Период аналитики задается параметрами year и month'}), 400
+        try:
+            filters = queries.fire_date_filters(year=year, month=month, region=scope)
+        except ValueError:
+            return jsonify({'success': False, 'message': 'Некорректный период'}), 400
         with SessionLocal() as db:
-            stats_query = db.query(
-                Fire.region,
-                sql_func.month(Fire.date).label('month'),
-                sql_func.count(Fire.id).label('count'),
-                sql_func.sum(Fire.area).label('total_area'),
-                sql_func.sum(Fire.damage_tenge).label('total_damage')
-            )
-            map_query = db.query(Fire).filter(Fire.latitude.isnot(None), Fire.longitude.isnot(None))
-            forces_query = db.query(FireForce).join(Fire, FireForce.fire_id == Fire.id)
-
-            if role in ['operator', 'engineer'] and region:
-                stats_query = stats_query.filter(Fire.region == region)
-                map_query = map_query.filter(Fire.region == region)
-                forces_query = forces_query.filter(Fire.region == region)
-            if region_filter and role in ['admin', 'analyst']:
-                stats_query = stats_query.filter(Fire.region == region_filter)
-                map_query = map_query.filter(Fire.region == region_filter)
-                forces_query = forces_query.filter(Fire.region == region_filter)
-            if year:
-                stats_query = stats_query.filter(extract('year', Fire.date) == year)
-                map_query = map_query.filter(extract('year', Fire.date) == year)
-                forces_query = forces_query.filter(extract('year', Fire.date) == year)
-            if month:
-                stats_query = stats_query.filter(extract('month', Fire.date) == month)
-                map_query = map_query.filter(extract('month', Fire.date) == month)
-                forces_query = forces_query.filter(extract('month', Fire.date) == month)
-
-            stats_query = stats_query.group_by(Fire.region, sql_func.month(Fire.date))
+            # Статистика и силы читаются из сводки fire_stats_monthly, карта — из fires
+            stats_query = queries.region_month_stats(db, criteria)
+            map_query = db.query(Fire).filter(Fire.latitude.isnot(None), Fire.longitude.isnot(None)).filter(*filters)
+
             total = stats_query.count()
             stats_data = stats_query.offset((page - 1) * per_page).limit(per_page).all()
             map_data = map_query.all()
-            forces_data = forces_query.all()
-
-            forces_by_region_month = {}
-            for force in forces_data:
-                fire = db.query(Fire).filter(Fire.id == force.fire_id).first()
-                key = (fire.region, fire.date.month)
-                if key not in forces_by_region_month:
-                    forces_by_region_month[key] = []
-                forces_by_region_month[key].append({
-                    'force_type': force.force_type,
-                    'people_count': force.people_count
-                })
+            # Силы считаются одним GROUP BY только для пар (регион, месяц) текущей страницы
+            forces_by_region_month = queries.forces_by_region_month(db, criteria, [(d[0], d[1]) for d in stats_data])
 
         return jsonify({
             'data': [{
                 'region': escape(d[0]),
-                'month': d[1],
-                'count': d[2],
+                'month': int(d[1]),
+                'count': int(d[2]),
                 'total_area': float(d[3]),
                 'total_damage': float(d[4]) if d[4] else 0,
-                'forces': forces_by_region_month.get((d[0], d[1]), [])
+                'forces': forces_by_region_month.get((d[0], int(d[1])), [])
             } for d in stats_data],
             'map_data': [{
                 'id': f.id,
@@ -638,35 +723,33 @@ def register_routes(app, socketio, cache, csrf):
 
     @app.route('/api/analytics/predict', methods=['GET'])
     @token_required
-    @cache.cached(timeout=60, query_string=True)
+    @api_cache.cached(timeout=3600, tags=lambda: ['forecasts'])
     def predict_fires():
         error, status = check_access(request.user['role'], ['admin', 'analyst'])
         if error:
             return error, status
-        days_ahead = int(request.args.get('days_ahead', 30))
+        days_ahead = request.args.get('days_ahead', 30, type=int)
         model_type = request.args.get('model', 'linear')
-        with SessionLocal() as db:
-            data = db.query(Fire.date, Fire.area).order_by(Fire.date).all()
-            if len(data) < 2:
-                return jsonify({'success': False, 'message': 'Недостаточно данных для прогноза'}), 400
-            dates = [d[0] for d in data]
-            areas = [d[1] for d in data]
-            if model_type == 'linear':
-                X = np.array([d.toordinal() for d in dates]).reshape(-1, 1)
-                y = np.array(areas)
-                model = LinearRegression().fit(X, y)
-                future_date = (datetime.now() + timedelta(days=days_ahead)).toordinal()
-                prediction = model.predict([[future_date]])
-            elif model_type == 'arima':
-                model = ARIMA(areas, order=(5, 1, 0)).fit()
-                prediction = model.forecast(steps=days_ahead)[-1]
-            else:
-                return jsonify({'success': False, 'message': 'Неподдерживаемый тип модели'}), 400
-        return jsonify({
-            'success': True,
-            'predicted_area': float(prediction[0] if model_type == 'linear' else prediction),
-            'date': (datetime.now() + timedelta(days=days_ahead)).strftime('%Y-%m-%d')
-        })
+        region = request.args.get('region', forecasting.ALL_REGIONS)
+        if model_type not in forecasting.MODEL_TYPES:
+            return jsonify({'success': False, 'message': 'Неподдерживаемый тип модели'}), 400
+        if not 1 <= days_ahead <= forecasting.MAX_DAYS_AHEAD:
+            return jsonify({'success': False, 'message': f'Горизонт прогноза должен быть от 1 до {forecasting.MAX_DAYS_AHEAD} дней'}), 400
+        # Модели обучаются заданием forecasting (см. tasks.py); здесь только чтение готового прогноза
+        prediction = forecasting.get_registry().predict(model_type, region, days_ahead)
+        if prediction is None:
+            # Как и в FastAPI (/analytics/predict): обученной модели нет — ресурс не найден
+            return jsonify({'success': False, 'message': f'Нет обученной модели {model_type} для региона {region}'}), 404
+        return jsonify({'success': True, **prediction})
+
+    @app.route('/api/analytics/models', methods=['GET'])
+    @token_required
+    def forecast_models():
+        error, status = check_access(request.user['role'], ['admin', 'analyst'])
+        if error:
+            return error, status
+        metadata = forecasting.get_registry().models(request.args.get('model'), request.args.get('region'))
+        return jsonify({'success': True, 'models': metadata})
 
     @app.route('/api/analytics/pdf', methods=['GET'])
     @token_required
@@ -674,63 +757,76 @@ def register_routes(app, socketio, cache, csrf):
         error, status = check_access(request.user['role'], ['admin', 'analyst'])
         if error:
             return error, status
-        lang = request.args.get('lang', 'ru')
-        year = request.args.get('year')
-        month = request.args.get('month')
+        year = request.args.get('year', type=int)
+        month = request.args.get('month', type=int)
         is_summary = request.args.get('summary', 'false').lower() == 'true'
-        with SessionLocal() as db:
-            if is_summary:
-                query = db.query(
-                    Fire.region,
-                    sql_func.count(Fire.id).label('count'),
-                    sql_func.sum(Fire.area).label('total_area'),
-                    sql_func.sum(Fire.damage_tenge).label('total_damage'),
-                    sql_func.count(sql_func.distinct(Fire.created_by)).label('users_count')
-                )
-                if year:
-                    query = query.filter(extract('year', Fire.date) == year)
-                if month:
-                    query = query.filter(extract('month', Fire.date) == month)
-                data = query.group_by(Fire.region).all()
-                title = LANGUAGES[lang]['summary']
-                headers = [LANGUAGES[lang]['region'], LANGUAGES[lang]['count'], LANGUAGES[lang]['total_area'], 
-                           LANGUAGES[lang]['total_damage'], LANGUAGES[lang]['users_count']]
-                table_data = [headers] + [
-                    [escape(d[0]), d[1], f"{float(d[2]):.2f}", f"{float(d[3]):.2f}" if d[3] else '0.00', d[4]] for d in data
-                ]
-            else:
-                query = db.query(
-                    Fire.region,
-                    sql_func.month(Fire.date).label('month'),
-                    sql_func.count(Fire.id).label('count'),
-                    sql_func.sum(Fire.area).label('total_area'),
-                    sql_func.sum(Fire.damage_tenge).label('total_damage')
-                )
-                if year:
-                    query = query.filter(extract('year', Fire.date) == year)
-                if month:
-                    query = query.filter(extract('month', Fire.date) == month)
-                data = query.group_by(Fire.region, sql_func.month(Fire.date)).all()
-                title = LANGUAGES[lang]['analytics_title']
-                headers = [LANGUAGES[lang]['region'], LANGUAGES[lang]['month'], LANGUAGES[lang]['count'], 
-                           LANGUAGES[lang]['total_area'], LANGUAGES[lang]['total_damage']]
-                month_names = ['Янв', 'Фев', 'Мар', 'Апр', 'Май', 'Июн', 'Июл', 'Авг', 'Сен', 'Окт', 'Ноя', 'Дек'] if lang == 'ru' else ['Қаң', 'Ақп', 'Нау', 'Сәу', 'Мам', 'Мау', 'Шіл', 'Там', 'Қыр', 'Қаз', 'Қар', 'Жел']
-                table_data = [headers] + [
-                    [escape(d[0]), month_names[d[1] - 1], d[2], f"{float(d[3]):.2f}", f"{float(d[4]):.2f}" if d[4] else '0.00'] for d in data
-                ]
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=letter)
-        styles = getSampleStyleSheet()
-        elements = [Paragraph(title, styles['Title']), Spacer(1, 12), Table(table_data)]
-        doc.build(elements)
-        buffer.seek(0)
+        try:
+            filters = reports.normalize_filters(
+                year=year, month=month, region=request.args.get('region') or request.args.get('region_filter'),
+                lang=request.args.get('lang', 'ru')
+            )
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        # Отчет строится в пуле процессов отчетов; готовый файл отдается из кэша report_cache
+        service = reports.get_service()
+        job = service.request('summary' if is_summary else 'analytics', 'pdf', filters, request.user['user_id'])
+        if job['status'] in (reports.PENDING, reports.RUNNING):
+            job = service.wait(job['id'])
+        if job['status'] in (reports.PENDING, reports.RUNNING):
+            return jsonify({'success': False, 'message': 'Отчет еще строится', 'job': job}), 202
+        if job['status'] != reports.DONE:
+            return jsonify({'success': False, 'message': 'Ошибка построения отчета', 'job': job}), 500
         return send_file(
-            buffer,
+            job['file_path'],
             mimetype='application/pdf',
             as_attachment=True,
             download_name=f"{'summary' if is_summary else 'analytics'}_{year or 'all'}_{month or 'all'}.pdf"
         )
 
+    @app.route('/api/reports', methods=['POST'])
+    @csrf.exempt
+    @token_required
+    def create_report():
+        error, status = check_access(request.user['role'], ['admin', 'analyst'])
+        if error:
+            return error, status
+        payload = request.get_json(silent=True) or {}
+        try:
+            filters = reports.normalize_filters(payload.get('year'), payload.get('month'), payload.get('region'), payload.get('lang', 'ru'))
+            job = reports.get_service().request(payload.get('type', 'analytics'), payload.get('format', 'pdf'), filters, request.user['user_id'])
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        return jsonify({'success': True, 'job': job}), 200 if job['status'] == reports.DONE else 202
+
+    @app.route('/api/reports/<int:job_id>', methods=['GET'])
+    @token_required
+    def get_report(job_id):
+        error, status = check_access(request.user['role'], ['admin', 'analyst'])
+        if error:
+            return error, status
+        job = reports.get_service().job(job_id)
+        if job is None:
+            return jsonify({'success': False, 'message': 'Отчет не найден'}), 404
+        return jsonify({'success': True, 'job': job})
+
+    @app.route('/api/reports/<int:job_id>/download', methods=['GET'])
+    @token_required
+    def download_report_file(job_id):
+        error, status = check_access(request.user['role'], ['admin', 'analyst'])
+        if error:
+            return error, status
+        job = reports.get_service().job(job_id)
+        if job is None:
+            return jsonify({'success': False, 'message': 'Отчет не найден'}), 404
+        if job['status'] != reports.DONE:
+            return jsonify({'success': False, 'message': 'Отчет еще не готов', 'job': job}), 409
+        return send_file(
+            job['file_path'],
+            mimetype=reports.FORMATS[job['format']],
+            as_attachment=True,
+            download_name=f"{job['report_type']}_{job['id']}.{job['format']}"
+        )
+
     @app.route('/summary')
     @login_required
     def summary_page():
@@ -742,34 +838,19 @@ def register_routes(app, socketio, cache, csrf):
 
     @app.route('/api/summary', methods=['GET'])
     @token_required
-    @cache.cached(timeout=60, query_string=True)
+    @api_cache.cached(timeout=3600, tags=fire_cache_tags(dates=False))
     def get_summary():
         error, status = check_access(request.user['role'], ['admin', 'analyst', 'engineer', 'operator'])
         if error:
             return error, status
         role = request.user['role']
         region = request.user['region']
-        year = request.args.get('year')
-        month = request.args.get('month')
+        year = request.args.get('year', type=int)
+        month = request.args.get('month', type=int)
+        scope = region if role in ['operator', 'engineer'] and region else None
         with SessionLocal() as db:
-            query = db.query(
-                Fire.region,
-                sql_func.count(Fire.id).label('count'),
-                sql_func.sum(Fire.area).label('total_area'),
-                sql_func.sum(Fire.damage_tenge).label('total_damage'),
-                sql_func.count(sql_func.distinct(Fire.created_by)).label('users_count')
-            )
-            if role in ['operator', 'engineer'] and region:
-                query = query.filter(Fire.region == region)
-            if year:
-                query = query.filter(extract('year', Fire.date) == year)
-            if month:
-                query = query.filter(extract('month', Fire.date) == month)
-            region_data = query.group_by(Fire.region).all()
-            users_query = db.query(sql_func.count(sql_func.distinct(Fire.created_by)))
-            if role in ['operator', 'engineer'] and region:
-                users_query = users_query.filter(Fire.region == region)
-            users_count = users_query.scalar()
+            region_data = queries.region_summary(db, {'region': scope, 'year': year, 'month': month})
+            users_count = queries.creators_count(db, {'region': scope})
         return jsonify({
             'regions': [{'region': escape(d[0]), 'count': d[1], 'total_area': float(d[2]), 
                          'total_damage': float(d[3]) if d[3] else 0, 'users_count': d[4]} for d in region_data],
@@ -786,7 +867,7 @@ def register_routes(app, socketio, cache, csrf):
 
     @app.route('/api/users', methods=['GET'])
     @token_required
-    @cache.cached(timeout=60, query_string=True)
+    @api_cache.cached(timeout=3600, tags=lambda: ['users'])
     def get_users():
         error, status = check_access(request.user['role'], ['admin'])
         if error:
@@ -816,7 +897,7 @@ def register_routes(app, socketio, cache, csrf):
                 role=data['role'],
                 region=data['region'] if data['region'] else None
             )
-            user.password = generate_password_hash(data['password'])
+            user.password = hasher.generate(data['password'])
             db.add(user)
             db.commit()
             log_event(request.user['user_id'], 'INSERT', 'users', user.id, str({k: v for k, v in data.items() if k != 'password'}))
@@ -835,10 +916,11 @@ def register_routes(app, socketio, cache, csrf):
                 return jsonify({'success': False, 'message': 'Пользователь не найден'}), 404
             user.username = data['username']
             if 'password' in data and data['password']:
-                user.password = generate_password_hash(data['password'])
+                user.password = hasher.generate(data['password'])
             user.role = data['role']
             user.region = data['region'] if data['region'] else None
             db.commit()
+            principals.principal_cache.invalidate(user_id)
             log_event(request.user['user_id'], 'UPDATE', 'users', user.id, str({k: v for k, v in data.items() if k != 'password'}))
         return jsonify({'success': True})
 
@@ -856,57 +938,84 @@ def register_routes(app, socketio, cache, csrf):
                 return jsonify({'success': False, 'message': 'Пользователь не найден'}), 404
             db.delete(user)
             db.commit()
+            principals.principal_cache.invalidate(user_id)
             log_event(request.user['user_id'], 'DELETE', 'users', user_id)
         return jsonify({'success': True})
 
+    @app.route('/api/cache/stats', methods=['GET'])
+    @token_required
+    def cache_stats():
+        error, status = check_access(request.user['role'], ['admin'])
+        if error:
+            return error, status
+        return jsonify({'success': True, 'stats': api_cache.stats()})
+
     @app.route('/api/weather', methods=['GET'])
     @token_required
-    @cache.cached(timeout=300, query_string=True)
-    async def get_weather():
+    def get_weather():
         region = request.args.get('region')
         if not region:
             return jsonify({'error': 'Укажите регион'}), 400
-        url = f"http://api.openweathermap.org/data/2.5/weather?q={region},KZ&appid={Config.OPENWEATHERMAP_API_KEY}&units=metric"
-        @retry(stop=stop_after_attempt(3), wait=wait_fixed(2))
-        async def fetch():
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, timeout=aiohttp.ClientTimeout(total=5)) as response:
-                    return await response.json()
-        try:
-            data = await fetch()
-            return jsonify({
-                'temp': data['main']['temp'],
-                'description': escape(data['weather'][0]['description'])
-            })
-        except Exception as e:
-            logger.error(f"Ошибка API погоды: {str(e)}")
+        if region not in weather.REGION_COORDINATES:
+            return jsonify({'error': 'Неизвестный регион'}), 400
+        readings = weather.get_prefetcher().readings([region])
+        if not readings:
             return jsonify({'error': 'Данные о погоде недоступны'}), 503
+        reading = readings[0]
+        reading['description'] = escape(reading['description'] or '')
+        return jsonify(reading)
+
+    @app.route('/api/weather/regions', methods=['GET'])
+    @token_required
+    def get_weather_regions():
+        # ?regions=Akmola,Astana; без параметра — все регионы
+        regions = [r for r in request.args.get('regions', '').split(',') if r] or list(weather.REGION_COORDINATES)
+        unknown = [r for r in regions if r not in weather.REGION_COORDINATES]
+        if unknown:
+            return jsonify({'error': f"Неизвестные регионы: {', '.join(unknown)}"}), 400
+        readings = weather.get_prefetcher().readings(regions)
+        for reading in readings:
+            reading['description'] = escape(reading['description'] or '')
+        return jsonify({reading['region']: reading for reading in readings})
 
     @app.route('/api/firms', methods=['GET'])
     @token_required
     @cache.cached(timeout=300, query_string=True)
-    async def get_firms_data():
-        lat_min = request.args.get('lat_min', 40)
-        lat_max = request.args.get('lat_max', 55)
-        lon_min = request.args.get('lon_min', 51)
-        lon_max = request.args.get('lon_max', 80)
-        url = f"https://firms.modaps.eosdis.nasa.gov/api/area/csv/{Config.NASA_FIRMS_API_KEY}/VIIRS_SNPP_NRT/{lon_min},{lat_min},{lon_max},{lat_max}/1"
-        @retry(stop=stop_after_attempt(3), wait=wait_fixed(2))
-        async def fetch():
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, timeout=aiohttp.ClientTimeout(total=5)) as response:
-                    return await response.text()
+    def get_firms_data():
+        # Термоточки загружаются заданием firms.fetch_nasa_fires; здесь только выборка по области
         try:
-            text = await fetch()
-            lines = text.splitlines()
-            reader = csv.DictReader(lines)
-            fires = [{'latitude': float(row['latitude']), 'longitude': float(row['longitude']),
-                      'acq_date': row['acq_date'], 'confidence': row['confidence']} for row in reader]
-            return jsonify(fires)
+            bbox = (
+                request.args.get('lon_min', 51, type=float),
+                request.args.get('lat_min', 40, type=float),
+                request.args.get('lon_max', 80, type=float),
+                request.args.get('lat_max', 55, type=float)
+            )
+            days = min(max(request.args.get('days', 1, type=int), 1), 10)
+            since = datetime.utcnow().date() - timedelta(days=days - 1)
+            with SessionLocal() as db:
+                hotspots = firms.hotspots_in_bbox(db, bbox, since).all()
+            return jsonify([{'latitude': h.latitude, 'longitude': h.longitude, 'acq_date': h.acq_date.isoformat(),
+                             'acq_time': h.acq_time, 'confidence': h.confidence, 'frp': h.frp, 'region': h.region}
+                            for h in hotspots])
         except Exception as e:
-            logger.error(f"Ошибка API FIRMS: {str(e)}")
+            logger.error(f"Ошибка выборки FIRMS: {str(e)}")
             return jsonify({'error': 'Данные FIRMS недоступны'}), 503
 
+    @app.route('/api/regions/lookup', methods=['POST'])
+    @csrf.exempt
+    @token_required
+    def lookup_regions():
+        """Определяет регионы для массива точек {"points": [[lat, lon], ...]}."""
+        points = (request.get_json(silent=True) or {}).get('points')
+        if not isinstance(points, list) or len(points) > region_index.MAX_LOOKUP_POINTS:
+            return jsonify({'success': False, 'message': f'Ожидается список points не длиннее {region_index.MAX_LOOKUP_POINTS} точек'}), 400
+        try:
+            coords = np.asarray(points, dtype=float).reshape(len(points), 2)
+            regions = region_index.region_index.lookup(coords[:, 0], coords[:, 1])
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'message': 'Точки должны быть парами чисел [lat, lon]'}), 400
+        return jsonify({'success': True, 'regions': regions})
+
     @app.route('/analytics/export/csv', methods=['GET'])
     @token_required
     def export_analytics_csv():
@@ -915,27 +1024,26 @@ def register_routes(app, socketio, cache, csrf):
             return error, status
         role = request.user['role']
         region = request.user['region']
-        year = request.args.get('year')
-        month = request.args.get('month')
-        with SessionLocal() as db:
-            query = db.query(Fire)
-            if role in ['operator', 'engineer'] and region:
-                query = query.filter(Fire.region == region)
-            if year:
-                query = query.filter(extract('year', Fire.date) == year)
-            if month:
-                query = query.filter(extract('month', Fire.date) == month)
-            fires = query.all()
-        output = StringIO()
-        writer = csv.writer(output)
-        writer.writerow(['ID', 'Дата', 'Регион', 'КГУ/ООПТ', 'Площадь', 'Описание', 'Файл', 'Создал'])
-        writer.writerows([(f.id, f.date, escape(f.region), f.kgu_oopt_id, f.area, escape(f.description), f.file_path, f.created_by) for f in fires])
-        output.seek(0)
-        return send_file(
-            output,
+        year = request.args.get('year', type=int)
+        month = request.args.get('month', type=int)
+        try:
+            filters = request_date_filters(region if role in ['operator', 'engineer'] else None)
+        except ValueError:
+            return jsonify({'success': False, 'message': 'Некорректный период'}), 400
+        fmt = request.args.get('format', 'csv')
+        if fmt in exporters.COLUMNAR_FORMATS:
+            return columnar_export(filters, fmt, f'fires_export_{year or "all"}_{month or "all"}')
+        if fmt != 'csv':
+            return jsonify({'success': False, 'message': 'Неподдерживаемый формат выгрузки'}), 400
+        chunks = exporters.stream_fires_csv(
+            SessionLocal, filters,
+            ['ID', 'Дата', 'Регион', 'КГУ/ООПТ', 'Площадь', 'Описание', 'Файл', 'Создал'],
+            lambda f: (f.id, f.fire_date, escape(f.region), f.kgu_oopt_id, f.area, escape(f.description), f.file_path, f.created_by)
+        )
+        return Response(
+            stream_with_context(chunks),
             mimetype='text/csv',
-            as_attachment=True,
-            download_name=f'fires_export_{year or "all"}_{month or "all"}.csv'
+            headers={'Content-Disposition': f'attachment; filename=fires_export_{year or "all"}_{month or "all"}.csv'}
         )
 
     @app.route('/manifest.json')
@@ -953,22 +1061,24 @@ def register_routes(app, socketio, cache, csrf):
             ]
         }
 
+    @app.route('/tiles/regions/<int:z>/<int:x>/<int:y>')
+    def region_tile(z, x, y):
+        if not tiles.MIN_ZOOM <= z <= tiles.MAX_ZOOM or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+            return jsonify({'error': 'Tile not found'}), 404
+        body, etag = tiles.region_tiles.tile(z, x, y)
+        response = Response(body, mimetype='application/geo+json')
+        response.set_etag(etag)
+        response.cache_control.public = True
+        response.cache_control.max_age = 86400
+        return response.make_conditional(request)
+
     @app.route('/service-worker.js')
     def service_worker():
         return app.send_static_file('service-worker.js')
 
-    def log_event(username, action, table_name, record_id, changes=None):
-        with SessionLocal() as db:
-            log = AuditLog(
-                timestamp=datetime.utcnow(),
-                username=username,
-                action=action,
-                table_name=table_name,
-                record_id=record_id,
-                changes=changes
-            )
-            db.add(log)
-            db.commit()
+    def log_event(user_id, action, table_name, record_id, changes=None):
+        # Запись в audit_logs выполняется пачками в фоновом потоке
+        audit.audit_queue.put(user_id, action, table_name, record_id, changes)
 
     def translate_changes(changes):
         if not changes:
@@ -1000,8 +1110,19 @@ def register_routes(app, socketio, cache, csrf):
         return dict(translate_value=translate_value, translate_changes=translate_changes)
 
     @socketio.on('connect')
-    def handle_connect():
-        logger.info('Клиент подключен')
+    def handle_connect(auth=None):
+        # Клиент попадает в комнату своего региона (или всех регионов) по JWT из cookie или auth
+        token = (auth or {}).get('token') or request.cookies.get('token') or request.headers.get('Authorization')
+        if not token:
+            return False
+        try:
+            user = jwt.decode(token.split()[-1], Config.SECRET_KEY, algorithms=["HS256"])
+        except Exception as e:
+            logger.warning(f"Подключение Socket.IO с неверным токеном: {str(e)}")
+            return False
+        for name in fire_events.user_rooms(user):
+            join_room(name)
+        logger.info(f"Клиент подключен: пользователь {user['user_id']}")
 
 if __name__ == '__main__':
     register_routes(app, socketio, cache, csrf)
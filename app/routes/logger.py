@@ -1,7 +1,9 @@
+import atexit
 import logging 
 import os
 import sqlite3
 from datetime import datetime
+from batching import BatchWriter
 
 # Папка для логов
 LOG_DIR = "logs"
@@ -16,24 +18,67 @@ logging.basicConfig(
     format="%(asctime)s - %(levelname)s - %(message)s"
 )
 
+SCHEMA_SQL = '''
+    CREATE TABLE IF NOT EXISTS audit_logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TEXT,
+        user TEXT,
+        action TEXT,
+        details TEXT
+    )
+'''
+# Текст запроса не меняется, поэтому sqlite3 подготавливает его один раз и берет из кэша соединения
+INSERT_SQL = "INSERT INTO audit_logs (timestamp, user, action, details) VALUES (?, ?, ?, ?)"
+
+
+class LogWriter(BatchWriter):
+    """Долгоживущий писатель журнала в SQLite.
+
+    Единственное соединение принадлежит фоновому потоку: схема создается один раз,
+    база работает в режиме WAL, а записи из очереди вставляются пачками (до batch_size
+    строк или раз в flush_interval секунд) в одной транзакции. Потоки запросов только
+    кладут запись в очередь и не конкурируют за блокировку файла.
+    """
+
+    def __init__(self, db_file=DB_FILE, batch_size=500, flush_interval=0.5, max_size=10000):
+        super().__init__("log-writer", batch_size, flush_interval, max_size)
+        self.db_file = db_file
+        self._conn = None
+
+    def _open(self):
+        directory = os.path.dirname(self.db_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.db_file)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(SCHEMA_SQL)
+        conn.commit()
+        self._conn = conn
+
+    def write(self, user, action, details=""):
+        """Ставит запись в очередь; при заполненной очереди ждет освобождения места."""
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self._enqueue((timestamp, user, action, details))
+
+    def _write(self, batch):
+        try:
+            with self._conn:
+                self._conn.executemany(INSERT_SQL, batch)
+        except sqlite3.Error as e:
+            logging.error(f"Ошибка записи {len(batch)} записей журнала в БД: {e}")
+
+    def _close(self):
+        self._conn.close()
+        self._conn = None
+
+
+writer = LogWriter()
+atexit.register(writer.close)
+
 def log_to_db(user, action, details=""):
     """Записывает лог в базу данных"""
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS audit_logs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp TEXT,
-            user TEXT,
-            action TEXT,
-            details TEXT
-        )
-    ''')
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    cursor.execute("INSERT INTO audit_logs (timestamp, user, action, details) VALUES (?, ?, ?, ?)",
-                   (timestamp, user, action, details))
-    conn.commit()
-    conn.close()
+    writer.write(user, action, details)
 
 def log_action(user, action, details=""):
     """Записывает действие в файл и базу данных"""
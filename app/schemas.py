@@ -159,4 +159,14 @@ class AuditLogResponse(AuditLogBase):
     id: int = Field(..., description="Unique identifier of the audit log")
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+# --- Схемы для отчетов ---
+class ReportRequest(BaseModel):
+    """Схема запроса на построение отчета."""
+    type: str = Field("analytics", description="Report type: summary, analytics, fires")
+    format: str = Field("pdf", description="File format: pdf, csv, xlsx")
+    year: Optional[int] = Field(None, description="Filter by year")
+    month: Optional[int] = Field(None, ge=1, le=12, description="Filter by month")
+    region: Optional[str] = Field(None, max_length=255, description="Filter by region")
+    lang: str = Field("ru", description="Report language: ru, kz")
@@ -0,0 +1,171 @@
+# tiles.py
+import hashlib
+import json
+import logging
+import math
+import os
+import threading
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+GEOJSON_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'geojson', 'regions.geojson')
+TILE_SIZE = 256   # Размер тайла в пикселях, по нему выбирается допуск упрощения
+MIN_ZOOM = 3
+MAX_ZOOM = 12     # Глубже упрощение уже не сокращает геометрию заметно
+TILE_BUFFER = 0.05  # Доля тайла, на которую расширяется его рамка при отборе регионов
+
+Bounds = Tuple[float, float, float, float]
+
+
+def tile_bounds(z: int, x: int, y: int) -> Bounds:
+    """Границы тайла (west, south, east, north) в градусах для схемы XYZ (Web Mercator)."""
+    n = 2 ** z
+
+    def lat(row: int) -> float:
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+    return x / n * 360.0 - 180.0, lat(y + 1), (x + 1) / n * 360.0 - 180.0, lat(y)
+
+
+def pixel_tolerance(z: int) -> float:
+    """Размер пикселя по долготе в градусах на уровне z — допуск Douglas–Peucker."""
+    return 360.0 / (TILE_SIZE * 2 ** z)
+
+
+def precision(z: int) -> int:
+    """Число знаков после запятой, достаточное для четверти пикселя на уровне z."""
+    return max(0, math.ceil(-math.log10(pixel_tolerance(z) / 4)))
+
+
+def simplify(points: np.ndarray, tolerance: float) -> np.ndarray:
+    """Упрощает ломаную алгоритмом Douglas–Peucker.
+
+    Args:
+        points (np.ndarray): Массив вершин формы (N, 2).
+        tolerance (float): Максимальное отклонение от исходной линии в единицах координат.
+
+    Returns:
+        np.ndarray: Оставшиеся вершины; первая и последняя сохраняются всегда.
+    """
+    if len(points) < 3:
+        return points
+    keep = np.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        segment = points[start + 1:end]
+        a, b = points[start], points[end]
+        dx, dy = b - a
+        length = math.hypot(dx, dy)
+        if length == 0:
+            distances = np.hypot(segment[:, 0] - a[0], segment[:, 1] - a[1])
+        else:
+            distances = np.abs(dy * (segment[:, 0] - a[0]) - dx * (segment[:, 1] - a[1])) / length
+        index = int(np.argmax(distances))
+        if distances[index] > tolerance:
+            split = start + 1 + index
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+    return points[keep]
+
+
+def _intersects(a: Bounds, b: Bounds) -> bool:
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+class RegionTiles:
+    """Тайлы границ регионов из regions.geojson.
+
+    Для каждого уровня масштаба геометрия один раз упрощается с допуском в один пиксель
+    и округляется до четверти пикселя; тайл содержит регионы, пересекающие его рамку,
+    и кэшируется в памяти вместе с ETag. Регионы не обрезаются по рамке тайла, чтобы
+    клиент мог рисовать каждый регион целиком и один раз.
+    """
+
+    def __init__(self, path: str = GEOJSON_PATH):
+        self.path = path
+        self._features: Optional[List[dict]] = None
+        self._lock = threading.Lock()
+        self._level = lru_cache(maxsize=None)(self._build_level)
+        self.tile = lru_cache(maxsize=4096)(self._build_tile)
+
+    @property
+    def features(self) -> List[dict]:
+        """Исходные регионы: имя, кольца полигонов в виде массивов numpy и рамка."""
+        if self._features is None:
+            with self._lock:
+                if self._features is None:
+                    with open(self.path, encoding='utf-8') as f:
+                        collection = json.load(f)
+                    self._features = [self._load_feature(feature) for feature in collection['features']]
+        return self._features
+
+    @staticmethod
+    def _load_feature(feature: dict) -> dict:
+        geometry = feature['geometry']
+        polygons = geometry['coordinates'] if geometry['type'] == 'MultiPolygon' else [geometry['coordinates']]
+        polygons = [[np.asarray(ring, dtype=float) for ring in polygon] for polygon in polygons]
+        points = np.vstack([polygon[0] for polygon in polygons])
+        return {
+            'name': feature['properties'].get('region'),
+            'polygons': polygons,
+            'bbox': (*points.min(axis=0), *points.max(axis=0))
+        }
+
+    def _build_level(self, z: int) -> List[dict]:
+        tolerance, digits = pixel_tolerance(z), precision(z)
+        level = []
+        for feature in self.features:
+            polygons = []
+            for polygon in feature['polygons']:
+                rings = [np.round(simplify(ring, tolerance), digits) for ring in polygon]
+                # Кольцо меньше 4 вершин вырождается: такой полигон или такая дырка не рисуются
+                if len(rings[0]) >= 4:
+                    polygons.append([ring.tolist() for ring in rings if len(ring) >= 4])
+            if polygons:
+                level.append({
+                    'bbox': feature['bbox'],
+                    'feature': {
+                        'type': 'Feature',
+                        'id': feature['name'],
+                        'properties': {'name': feature['name']},
+                        'geometry': {'type': 'MultiPolygon', 'coordinates': polygons}
+                    }
+                })
+        return level
+
+    def _build_tile(self, z: int, x: int, y: int) -> Tuple[bytes, str]:
+        west, south, east, north = tile_bounds(z, x, y)
+        pad_x, pad_y = (east - west) * TILE_BUFFER, (north - south) * TILE_BUFFER
+        bounds = (west - pad_x, south - pad_y, east + pad_x, north + pad_y)
+        features = [item['feature'] for item in self._level(z) if _intersects(item['bbox'], bounds)]
+        body = json.dumps({'type': 'FeatureCollection', 'features': features},
+                          ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        return body, hashlib.sha1(body).hexdigest()
+
+    def build(self) -> Dict[int, int]:
+        """Заранее упрощает геометрию для всех уровней.
+
+        Returns:
+            Dict[int, int]: Размер всех регионов уровня в байтах GeoJSON.
+        """
+        return {
+            z: len(json.dumps([item['feature'] for item in self._level(z)], separators=(',', ':')).encode('utf-8'))
+            for z in range(MIN_ZOOM, MAX_ZOOM + 1)
+        }
+
+
+region_tiles = RegionTiles()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    source = os.path.getsize(GEOJSON_PATH)
+    for z, size in region_tiles.build().items():
+        logger.info(f"z={z}: {size / 1024:.1f} КБ (исходный файл {source / 1024:.1f} КБ)")
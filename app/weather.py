@@ -0,0 +1,221 @@
+# weather.py
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional
+import redis
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func as sql_func
+from models import WeatherReading
+from http_client import HttpClient, UpstreamError, http_client, MAX_PER_HOST
+
+logger = logging.getLogger(__name__)
+
+OPENWEATHER_URL = "https://api.openweathermap.org/data/2.5/weather"
+REFRESH_INTERVAL = 600    # Плановое обновление всех регионов (секунды)
+MIN_REVALIDATE = 60       # Внеплановое обновление по устаревшим данным — не чаще раза в минуту
+RETENTION_DAYS = 30       # Сколько дней хранится история снимков weather_readings
+LOCK_KEY = "weather:refresh"  # Блокировка прохода обновления в Redis (один проход на кластер за период)
+
+# Административные центры регионов (REGIONS в models.py): погода запрашивается по координатам
+REGION_COORDINATES = {
+    'Akmola': (53.28, 69.39),
+    'Aktobe': (50.28, 57.17),
+    'Almaty': (43.87, 77.07),
+    'Atyrau': (47.10, 51.92),
+    'East Kazakhstan': (49.95, 82.61),
+    'Zhambyl': (42.90, 71.37),
+    'West Kazakhstan': (51.23, 51.37),
+    'Karaganda': (49.80, 73.10),
+    'Kostanay': (53.21, 63.63),
+    'Kyzylorda': (44.85, 65.51),
+    'Mangystau': (43.65, 51.17),
+    'Pavlodar': (52.29, 76.97),
+    'North Kazakhstan': (54.87, 69.15),
+    'Turkistan': (43.30, 68.25),
+    'Astana': (51.17, 71.45),
+    'Almaty City': (43.24, 76.89),
+    'Shymkent': (42.32, 69.59),
+    'Abai': (50.41, 80.23),
+    'Zhetysu': (45.02, 78.37),
+    'Ulytau': (47.78, 67.71)
+}
+
+
+def latest_readings(db: Session, regions: Iterable[str]) -> Dict[str, WeatherReading]:
+    """Последний снимок погоды по каждому из регионов одним запросом."""
+    regions = list(regions)
+    last_ids = (
+        db.query(sql_func.max(WeatherReading.id))
+        .filter(WeatherReading.region.in_(regions))
+        .group_by(WeatherReading.region)
+    )
+    return {reading.region: reading for reading in db.query(WeatherReading).filter(WeatherReading.id.in_(last_ids))}
+
+
+def reading_to_dict(reading: WeatherReading, fresh_for: float = REFRESH_INTERVAL) -> dict:
+    return {
+        'region': reading.region,
+        'temp': reading.temp,
+        'humidity': reading.humidity,
+        'wind_speed': reading.wind_speed,
+        'description': reading.description,
+        'observed_at': reading.observed_at.isoformat() if reading.observed_at else None,
+        'fetched_at': reading.fetched_at.isoformat(),
+        'stale': datetime.utcnow() - reading.fetched_at > timedelta(seconds=fresh_for)
+    }
+
+
+class WeatherPrefetcher:
+    """Фоновое обновление погоды по всем регионам.
+
+    Раз в refresh_interval секунд все регионы запрашиваются одним проходом (параллельно,
+    через общий пул соединений), и снимки записываются в weather_readings одной
+    транзакцией. /api/weather читает только эту таблицу: устаревший снимок отдается
+    сразу, а обновление запускается в фоне (stale-while-revalidate).
+
+    Поток есть в каждом воркере, но проход выполняет только тот, кто взял блокировку
+    LOCK_KEY в Redis (SET NX на период), поэтому запросы к OpenWeather и строки истории
+    не умножаются на число воркеров. Снимки старше retention_days удаляются при записи.
+    """
+
+    def __init__(self, session_factory: Callable, api_key: Optional[str], client: HttpClient = http_client,
+                 url: str = OPENWEATHER_URL, refresh_interval: float = REFRESH_INTERVAL,
+                 min_revalidate: float = MIN_REVALIDATE, redis_client: Optional[redis.Redis] = None,
+                 retention_days: int = RETENTION_DAYS):
+        self.session_factory = session_factory
+        self.api_key = api_key
+        self.client = client
+        self.url = url
+        self.refresh_interval = refresh_interval
+        self.min_revalidate = min_revalidate
+        self.redis = redis_client
+        self.retention_days = retention_days
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._last_refresh = 0.0
+
+    def fetch(self, region: str) -> Optional[dict]:
+        lat, lon = REGION_COORDINATES[region]
+        try:
+            # Без резервного ответа клиента: иначе старые данные сохранились бы с новым fetched_at.
+            # Последнее удачное показание уже лежит в БД и отдается как устаревшее
+            data = self.client.get_json(self.url, params={'lat': lat, 'lon': lon, 'appid': self.api_key, 'units': 'metric'},
+                                        fallback=False)
+            return {
+                'region': region,
+                'observed_at': datetime.utcfromtimestamp(data['dt']) if data.get('dt') else None,
+                'temp': data['main']['temp'],
+                'humidity': data['main'].get('humidity'),
+                'wind_speed': data.get('wind', {}).get('speed'),
+                'description': data['weather'][0]['description']
+            }
+        except (UpstreamError, KeyError, IndexError, TypeError) as e:
+            logger.error(f"Ошибка API погоды для {region}: {str(e)}")
+            return None
+
+    def refresh(self, regions: Optional[Iterable[str]] = None) -> int:
+        """Загружает погоду по регионам и сохраняет снимки.
+
+        Returns:
+            int: Количество сохраненных снимков.
+        """
+        self._last_refresh = time.monotonic()
+        regions = list(regions or REGION_COORDINATES)
+        with ThreadPoolExecutor(max_workers=MAX_PER_HOST) as pool:
+            rows = [row for row in pool.map(self.fetch, regions) if row]
+        if not rows:
+            return 0
+        fetched_at = datetime.utcnow()
+        for row in rows:
+            row['fetched_at'] = fetched_at
+        with self.session_factory() as db:
+            db.execute(insert(WeatherReading), rows)
+            db.query(WeatherReading).filter(
+                WeatherReading.fetched_at < fetched_at - timedelta(days=self.retention_days)
+            ).delete(synchronize_session=False)
+            db.commit()
+        return len(rows)
+
+    def _claim(self, ttl: float) -> bool:
+        if self.redis is None:
+            return True
+        try:
+            return bool(self.redis.set(LOCK_KEY, os.getpid(), nx=True, ex=max(1, int(ttl))))
+        except redis.RedisError as e:
+            # Без Redis лучше лишний проход, чем устаревшая погода
+            logger.warning(f"Блокировка обновления погоды недоступна: {str(e)}")
+            return True
+
+    def scheduled_refresh(self, ttl: float) -> int:
+        """Проход обновления, если за последние ttl секунд его не начал другой процесс.
+
+        Returns:
+            int: Количество сохраненных снимков (0, если проход выполняет другой процесс).
+        """
+        self._last_refresh = time.monotonic()
+        if not self._claim(ttl):
+            return 0
+        return self.refresh()
+
+    def _run(self) -> None:
+        ttl = self.refresh_interval
+        while True:
+            try:
+                self.scheduled_refresh(ttl)
+            except Exception as e:
+                logger.error(f"Ошибка обновления погоды: {str(e)}")
+            # Внеплановый проход (revalidate) блокирует остальных только на min_revalidate
+            ttl = self.min_revalidate if self._wake.wait(self.refresh_interval) else self.refresh_interval
+            self._wake.clear()
+
+    def ensure_started(self) -> None:
+        # Поток запускается лениво и заново после fork (воркеры gunicorn)
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name="weather-prefetcher", daemon=True)
+                self._thread.start()
+
+    def revalidate(self) -> None:
+        """Просит фоновый поток обновить данные раньше срока (не чаще min_revalidate)."""
+        self.ensure_started()
+        if time.monotonic() - self._last_refresh >= self.min_revalidate:
+            self._wake.set()
+
+    def readings(self, regions: Iterable[str]) -> List[dict]:
+        """Последние снимки по регионам; при устаревших или отсутствующих данных запускает обновление.
+
+        Returns:
+            List[dict]: Снимки в порядке regions; регионы без данных пропускаются.
+        """
+        regions = list(regions)
+        self.ensure_started()
+        with self.session_factory() as db:
+            latest = latest_readings(db, regions)
+        result = [reading_to_dict(latest[region], self.refresh_interval) for region in regions if region in latest]
+        if len(result) < len(regions) or any(reading['stale'] for reading in result):
+            self.revalidate()
+        return result
+
+
+_prefetcher: Optional[WeatherPrefetcher] = None
+
+
+def get_prefetcher() -> WeatherPrefetcher:
+    """Общий для процесса WeatherPrefetcher приложения (создается при первом обращении)."""
+    global _prefetcher
+    if _prefetcher is None:
+        from config import Config
+        from database import SessionLocal
+        redis_client = redis.Redis.from_url(Config.CACHE_REDIS_URL) if Config.CACHE_TYPE == 'redis' else None
+        _prefetcher = WeatherPrefetcher(SessionLocal, Config.OPENWEATHERMAP_API_KEY, redis_client=redis_client)
+    return _prefetcher
@@ -3,13 +3,12 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from flask import Flask, jsonify, send_file
-import requests
-from extensions import db
-from models.fire_model import Fire
+from http_client import http_client, UpstreamError
+from dashboard_data import get_dashboard_data
+from forecasting import get_registry, ALL_REGIONS
+from models import REGIONS
 from datetime import datetime, timedelta
 import numpy as np
-import statsmodels.api as sm
-from statsmodels.tsa.statespace.sarimax import SARIMAX
 from fbprophet import Prophet
 from io import BytesIO
 from reportlab.lib.pagesizes import letter
@@ -17,70 +16,68 @@ from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph,
 from reportlab.lib import colors
 from reportlab.lib.styles import getSampleStyleSheet
 import xlsxwriter
-import schedule
-import time
-import threading
 
 # Функция получения данных из MySQL и NASA FIRMS
 
 def fetch_fire_data(region=None, year=None):
-    query = db.session.query(Fire.date, Fire.region, Fire.damage_area, Fire.damage_tenge, Fire.latitude, Fire.longitude)
-    if region:
-        query = query.filter(Fire.region == region)
-    if year:
-        query = query.filter(Fire.date >= datetime(year, 1, 1), Fire.date <= datetime(year, 12, 31))
-    fire_data = query.all()
-    
-    fires = pd.DataFrame([
-        {"region": fire.region,
-         "year": fire.date.year if fire.date else None,
-         "month": fire.date.month if fire.date else None,
-         "damage_area": fire.damage_area or 0,
-         "damage_tenge": fire.damage_tenge or 0,
-         "latitude": fire.latitude,
-         "longitude": fire.longitude}
-        for fire in fire_data
-    ])
-    
-    response = requests.get("http://localhost:8080/api/firms")
-    if response.status_code == 200:
-        nasa_fires = pd.DataFrame(response.json())
-        if not nasa_fires.empty:
-            nasa_fires["region"] = "NASA_FIRMS"
-            nasa_fires["year"] = pd.to_datetime(nasa_fires["acq_date"]).dt.year
-            nasa_fires["month"] = pd.to_datetime(nasa_fires["acq_date"]).dt.month
-            nasa_fires["damage_area"] = nasa_fires["confidence"] * 0.1
-            nasa_fires["damage_tenge"] = nasa_fires["confidence"] * 5000
-            fires = pd.concat([fires, nasa_fires], ignore_index=True)
-    
+    # Кадры берутся из кэша процесса и сбрасываются при записи пожаров (см. dashboard_data)
+    data = get_dashboard_data()
+    fires = data.fires(region, year)
+    nasa_fires = data.hotspots()
+    if not nasa_fires.empty:
+        confidence = pd.to_numeric(nasa_fires["confidence"], errors="coerce").fillna(0)
+        nasa_fires = pd.DataFrame({
+            "region": "NASA_FIRMS",
+            "year": nasa_fires["acq_date"].dt.year,
+            "month": nasa_fires["acq_date"].dt.month,
+            "damage_area": confidence * 0.1,
+            "damage_tenge": confidence * 5000,
+            "latitude": nasa_fires["latitude"],
+            "longitude": nasa_fires["longitude"]
+        })
+        fires = pd.concat([fires, nasa_fires], ignore_index=True)
     return fires
 
 # Функция получения данных о погоде с OpenWeather (бесплатный API)
 
 def fetch_weather_data(lat, lon):
     API_KEY = "ВАШ_API_КЛЮЧ"
-    url = f"https://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lon}&appid={API_KEY}&units=metric"
-    response = requests.get(url)
-    if response.status_code == 200:
-        data = response.json()
-        return {
-            "temperature": data["main"]["temp"],
-            "humidity": data["main"]["humidity"],
-            "wind_speed": data["wind"]["speed"]
-        }
-    return None
+    url = "https://api.openweathermap.org/data/2.5/weather"
+    try:
+        data = http_client.get_json(url, params={"lat": lat, "lon": lon, "appid": API_KEY, "units": "metric"})
+    except UpstreamError:
+        return None
+    return {
+        "temperature": data["main"]["temp"],
+        "humidity": data["main"]["humidity"],
+        "wind_speed": data["wind"]["speed"]
+    }
 
-# SARIMA-прогнозирование пожаров
+# SARIMA-прогноз из реестра моделей (обучается заданием forecasting, см. tasks.py)
 
-def predict_fires_sarima(data):
-    if len(data) < 10:
+def predict_fires_sarima(region=None, years=5):
+    forecast = get_registry().forecast("sarima", region or ALL_REGIONS, 12 * (years + 1))
+    if forecast is None:
         return None
-    data = data.groupby("year")["damage_area"].sum().reset_index()
-    model = SARIMAX(data["damage_area"], order=(1, 1, 1), seasonal_order=(1, 1, 1, 12))
-    model_fit = model.fit()
-    future_years = [data["year"].max() + i for i in range(1, 6)]
-    predictions = model_fit.forecast(steps=5)
-    return pd.DataFrame({"year": future_years, "predicted_area": predictions})
+    # Текущий год в прогнозе неполный — берем только полные годы
+    yearly = forecast.groupby(forecast.index.year).agg(["sum", "size"])
+    yearly = yearly[yearly["size"] == 12].head(years)
+    return pd.DataFrame({"year": yearly.index, "predicted_area": yearly["sum"].values})
+
+# График прогноза из таблицы forecasts (рассчитывается пакетно, см. forecasting.train_forecasts)
+
+def predictions_figure(region=None):
+    region = region or ALL_REGIONS
+    registry = get_registry()
+    forecast = registry.forecast("sarima", region, 24)
+    title = f"Прогноз площади пожаров по месяцам: {region}"
+    if forecast is None:
+        forecast = registry.forecast("arima", region, 90)
+        title = f"Прогноз площади пожаров по дням: {region}"
+    if forecast is None:
+        return go.Figure(layout={"title": f"Нет обученной модели прогноза: {region}"})
+    return px.line(x=forecast.index.to_timestamp(), y=forecast.values, title=title,
+                   labels={"x": "Период", "y": "Площадь, га"})
 
 # Prophet-прогнозирование пожаров
 
@@ -95,30 +92,13 @@ def predict_fires_prophet(data):
     forecast = model.predict(future)
     return forecast[['ds', 'yhat']].rename(columns={"ds": "year", "yhat": "predicted_area"})
 
-# Автообновление данных
-
-def auto_update_data():
-    print("🔄 Обновление данных из NASA FIRMS и OpenWeather...")
-    fetch_fire_data()
-    print("✅ Данные успешно обновлены!")
-
-# Запуск фонового процесса для автообновления
-
-def start_scheduler():
-    schedule.every(30).minutes.do(auto_update_data)
-    while True:
-        schedule.run_pending()
-        time.sleep(60)
-
-threading.Thread(target=start_scheduler, daemon=True).start()
-
 # Подключаем Dash к Flask
 
 def create_dashboard(flask_app):
     dash_app = Dash(server=flask_app, name="Dashboard", url_base_pathname="/dashboard/")
     dash_app.layout = html.Div([
         html.H1("🔥 Полный Аналитический Дашборд по Лесным Пожарам", style={'textAlign': 'center', 'color': '#FF5733'}),
-        dcc.Dropdown(id="region-dropdown", placeholder="Выберите регион"),
+        dcc.Dropdown(id="region-dropdown", options=[{"label": region, "value": region} for region in REGIONS], placeholder="Выберите регион"),
         dcc.Dropdown(id="year-dropdown", placeholder="Выберите год"),
         dcc.Interval(id='interval-component', interval=300000, n_intervals=0),
         html.Button("📄 Скачать отчёт PDF", id="pdf-btn"),
@@ -127,6 +107,10 @@ def create_dashboard(flask_app):
         dcc.Graph(id="fire-predictions"),
     ])
     
+    @dash_app.callback(Output("fire-predictions", "figure"), [Input("region-dropdown", "value"), Input("interval-component", "n_intervals")])
+    def update_predictions(region, n_intervals):
+        return predictions_figure(region)
+    
     @flask_app.route("/download_report", methods=["GET"])
     def download_report():
         pdf = generate_pdf_report()
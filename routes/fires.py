@@ -1,16 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List
 from .. import schemas, crud, models
 from ..auth import get_current_user
-from ..app.database import get_db
+from ..app.database import get_db, SessionLocal
+from ..app.exporters import stream_fires_csv, forces_summary
 import logging
 import os
 import shutil
 from datetime import datetime
 from pathlib import Path
-import csv
-from io import StringIO
 
 # Настройка логирования
 logging.basicConfig(
@@ -233,7 +233,7 @@ def delete_fire(
     "/export",
     response_class=Response,
     summary="Export fires to CSV",
-    description="Exports all fire records to a CSV file. Accessible to admins and analysts."
+    description="Streams all fire records as a chunked CSV file. Accessible to admins and analysts."
 )
 def export_fires(
     db: Session = Depends(get_db),
@@ -243,39 +243,26 @@ def export_fires(
         logger.warning(f"Unauthorized attempt to export fires by user {current_user.id} with role {current_user.role}")
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only admins and analysts can export fires")
     
-    try:
-        fires = crud.get_fires(db, skip=0, limit=None, region=current_user.region if current_user.role == "engineer" else None)
-        output = StringIO()
-        writer = csv.writer(output)
-        
-        # Заголовки CSV
-        headers = [
-            "id", "fire_date", "region", "kgu_oopt_id", "area", "file_path", "created_by", "quarter", "allotment",
-            "damage_tenge", "damage_les", "damage_les_lesopokryt", "damage_les_verh", "damage_not_les",
-            "firefighting_costs", "description", "forces"
-        ]
-        writer.writerow(headers)
-        
-        # Данные
-        for fire in fires:
-            forces_str = "; ".join(
-                f"{force.force_type}: {force.people_count} people, {force.tecnic_count} tecnic, {force.aircraft_count} aircraft"
-                for force in fire.forces
-            )
-            writer.writerow([
-                fire.id, fire.fire_date.isoformat(), fire.region, fire.kgu_oopt_id, fire.area, fire.file_path,
-                fire.created_by, fire.quarter, fire.allotment, fire.damage_tenge, fire.damage_les,
-                fire.damage_les_lesopokryt, fire.damage_les_verh, fire.damage_not_les, fire.firefighting_costs,
-                fire.description, forces_str
-            ])
-        
-        crud.log_action(db, current_user.id, "EXPORT", "fires", None, "Exported all fire records to CSV")
-        logger.info(f"User {current_user.id} exported fires to CSV")
-        return Response(
-            content=output.getvalue(),
-            media_type="text/csv",
-            headers={"Content-Disposition": f"attachment; filename=fires_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"}
-        )
-    except Exception as e:
-        logger.error(f"Error exporting fires: {str(e)}")
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
\ No newline at end of file
+    headers = [
+        "id", "fire_date", "region", "kgu_oopt_id", "area", "file_path", "created_by", "quarter", "allotment",
+        "damage_tenge", "damage_les", "damage_les_lesopokryt", "damage_les_verh", "damage_not_les",
+        "firefighting_costs", "description", "forces"
+    ]
+    filters = [models.Fire.region == current_user.region] if current_user.role == "engineer" else []
+    chunks = stream_fires_csv(
+        SessionLocal, filters, headers,
+        lambda fire: [
+            fire.id, fire.fire_date.isoformat(), fire.region, fire.kgu_oopt_id, fire.area, fire.file_path,
+            fire.created_by, fire.quarter, fire.allotment, fire.damage_tenge, fire.damage_les,
+            fire.damage_les_lesopokryt, fire.damage_les_verh, fire.damage_not_les, fire.firefighting_costs,
+            fire.description, forces_summary(fire)
+        ],
+        with_forces=True
+    )
+    crud.log_action(db, current_user.id, "EXPORT", "fires", None, "Exported all fire records to CSV")
+    logger.info(f"User {current_user.id} exported fires to CSV")
+    return StreamingResponse(
+        chunks,
+        media_type="text/csv",
+        headers={"Content-Disposition": f"attachment; filename=fires_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"}
+    )
\ No newline at end of file
@@ -1,9 +1,24 @@
+import logging
 import schedule
 import time
-from nasa_firms import fetch_nasa_fires
+from firms import fetch_nasa_fires
+from forecasting import train_forecasts, retrain_changed_forecasts
+
+logger = logging.getLogger(__name__)
+
+def logged(job):
+    """Обертка задания: ошибка записывается в журнал и не останавливает остальные задания."""
+    def run():
+        try:
+            return job()
+        except Exception as e:
+            logger.error(f"Ошибка задания {job.__name__}: {str(e)}")
+    return run
 
 def run_scheduled_tasks():
-    schedule.every(6).hours.do(fetch_nasa_fires)
+    schedule.every(6).hours.do(logged(fetch_nasa_fires))
+    schedule.every().day.at("03:00").do(logged(train_forecasts))
+    schedule.every(30).minutes.do(logged(retrain_changed_forecasts))  # Переобучение при существенном изменении данных
     while True:
         schedule.run_pending()
         time.sleep(60)  # Проверка каждую минуту
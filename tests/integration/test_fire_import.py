@@ -0,0 +1,146 @@
+import csv
+import io
+import time
+import unittest
+from datetime import datetime
+from openpyxl import Workbook
+from sqlalchemy import create_engine, event, func
+from sqlalchemy.orm import sessionmaker
+from database import Base
+from models import Fire, FireForce, FireStatsMonthly, KGUOOPT
+import fire_import
+import rollup
+
+HEADER = ['ID пожара', 'Дата пожара', 'Область', 'КГУ/ООПТ', 'Филиал', 'Квартал', 'Выдел', 'Площадь пожара',
+          'Лесная площадь', 'АПС', 'Кол-во людей АПС', 'Кол-во техники АПС', 'Кол-во возд.судов АПС',
+          'Лесная охрана', 'Кол-во людей Лесной охраны', 'Описание', 'Ущерб (тенге)']
+ADMIN = {'user_id': 1, 'role': 'admin', 'region': None}
+
+
+def row(date='2024-11-18', region='Акмолинская область', location='Красноборское', area='0.50',
+        aps='Нет', aps_people='', lo='Нет', lo_people='', damage='50000.0'):
+    return ['6', date, region, location, location, '56', '21', area, '0.50', aps, aps_people, '', '',
+            lo, lo_people, 'загорание лесной подстилки', damage]
+
+
+def csv_file(rows, delimiter=','):
+    text = io.StringIO()
+    writer = csv.writer(text, delimiter=delimiter)
+    writer.writerow(HEADER)
+    writer.writerows(rows)
+    return io.BytesIO(text.getvalue().encode('utf-8-sig'))
+
+
+class TestFireImport(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        Base.metadata.create_all(bind=self.engine)
+        self.db = sessionmaker(bind=self.engine)()
+
+    def tearDown(self):
+        self.db.close()
+        Base.metadata.drop_all(bind=self.engine)
+
+    def run_import(self, stream, filename='report.csv', user=ADMIN, chunk_rows=fire_import.CHUNK_ROWS):
+        return fire_import.import_fires(self.db, stream, filename, user, chunk_rows=chunk_rows)
+
+    def test_valid_and_rejected_rows(self):
+        result = self.run_import(csv_file([
+            row(aps='Да', aps_people='4'),
+            row(date='18.11.2024', region='Akmola', lo='Нет', lo_people='2'),
+            row(date='не дата', area='-1'),
+            row(region='Марсианская область'),
+            row(location='Каскеленское'),
+            row(area=''),
+            row(date='2099-01-01')
+        ]))
+        self.assertEqual((result['imported'], result['rejected']), (2, 5))
+        report = {item['row']: item['errors'] for item in result['errors']}
+        self.assertEqual(sorted(report), [4, 5, 6, 7, 8])
+        self.assertEqual(len(report[4]), 2)
+        self.assertIn('Область: неизвестный регион', report[5])
+        self.assertIn('КГУ/ООПТ: не относится к указанной области', report[6])
+        self.assertIn('Площадь пожара: обязательное поле', report[7])
+        self.assertIn('Дата пожара: дата в будущем', report[8])
+
+        fires = self.db.query(Fire).order_by(Fire.id).all()
+        self.assertEqual([(f.region, f.fire_date, f.area, f.created_by) for f in fires],
+                         [('Akmola', datetime(2024, 11, 18), 0.5, 1)] * 2)
+        self.assertEqual({f.kgu_oopt.name for f in fires}, {'Красноборское'})
+        self.assertEqual([(f.fire_id, f.force_type, f.people_count) for f in self.db.query(FireForce).order_by(FireForce.fire_id)],
+                         [(fires[0].id, 'APS', 4), (fires[1].id, 'LO', 2)])
+        self.assertEqual([(s.region, s.year, s.month, s.fires_count) for s in self.db.query(FireStatsMonthly)],
+                         [('Akmola', 2024, 11, 2)])
+
+    def test_xlsx_and_semicolon_csv(self):
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(HEADER + [None])
+        values = row(area=1.5, aps='Да', aps_people=3)
+        values[1] = datetime(2024, 7, 1)
+        sheet.append(values)
+        sheet.append([])
+        sheet.append(row(area='abc'))
+        data = io.BytesIO()
+        workbook.save(data)
+        data.seek(0)
+        result = self.run_import(data, 'report.xlsx')
+        self.assertEqual((result['imported'], [item['row'] for item in result['errors']]), (1, [4]))
+        self.assertEqual(self.db.query(FireForce.people_count).scalar(), 3)
+
+        result = self.run_import(csv_file([row(), row()], delimiter=';'))
+        self.assertEqual(result['imported'], 2)
+        self.assertEqual(self.db.query(KGUOOPT).count(), 1)
+
+    def test_operator_limited_to_own_region(self):
+        operator = {'user_id': 2, 'role': 'operator', 'region': 'Almaty'}
+        result = self.run_import(csv_file([row(), row(region='Алматинская область', location='Каскеленское')]), user=operator)
+        self.assertEqual((result['imported'], result['errors'][0]['row']), (1, 2))
+        self.assertEqual(self.db.query(Fire.region).scalar(), 'Almaty')
+
+    def test_missing_columns_rejects_file(self):
+        stream = io.BytesIO('Область,Площадь пожара\nAkmola,1\n'.encode('utf-8'))
+        with self.assertRaises(fire_import.ImportFileError):
+            self.run_import(stream)
+        with self.assertRaises(fire_import.ImportFileError):
+            self.run_import(io.BytesIO(b'not a workbook'), 'report.xlsx')
+        self.assertEqual(self.db.query(Fire).count(), 0)
+
+    def test_large_file(self):
+        months = ['2024-0%d-15' % month for month in range(1, 10)]
+        rows = [row(date=months[i % 9], area=str(1 + i % 7), aps='Да', aps_people=str(i % 5))
+                for i in range(20000)]
+        rows[1234] = row(area='x')
+        start = time.perf_counter()
+        result = self.run_import(csv_file(rows), chunk_rows=5000)
+        elapsed = time.perf_counter() - start
+        self.assertEqual((result['imported'], result['rejected']), (19999, 1))
+        self.assertEqual(result['errors'][0]['row'], 1236)
+        self.assertEqual(self.db.query(func.count(FireForce.id)).scalar(), 19999)
+        self.assertEqual(self.db.query(func.sum(FireStatsMonthly.fires_count)).scalar(), 19999)
+        incremental = sorted((s.month, s.fires_count, s.total_area) for s in self.db.query(FireStatsMonthly))
+        rollup.rebuild(self.db)
+        self.db.flush()
+        self.assertEqual(incremental, sorted((s.month, s.fires_count, s.total_area) for s in self.db.query(FireStatsMonthly)))
+        self.assertLess(elapsed, 30)
+
+    def test_multirow_insert_without_returning(self):
+        # Как на MySQL: id пачки восстанавливаются по id вставки, а не из RETURNING
+        self.engine.dialect.insert_executemany_returning_sort_by_parameter_order = False
+        self.run_import(csv_file([row()]))
+        inserts = []
+        event.listen(self.engine, 'before_cursor_execute',
+                     lambda conn, cursor, statement, *args: inserts.append(statement)
+                     if statement.startswith('INSERT INTO fires') else None)
+        rows = [row(area=str(i + 1), aps='Да', aps_people=str(i % 5 + 1)) for i in range(2500)]
+        result = self.run_import(csv_file(rows), chunk_rows=1000)
+        self.assertEqual(result['imported'], 2500)
+        self.assertEqual(len(inserts), 3)
+        forces = self.db.query(Fire.area, FireForce.people_count).join(FireForce, FireForce.fire_id == Fire.id)
+        pairs = forces.filter(Fire.id > 1).all()
+        self.assertEqual(len(pairs), 2500)
+        self.assertEqual([(area, people) for area, people in pairs if people != (int(area) - 1) % 5 + 1], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import threading
+import unittest
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from database import Base
+from models import FirmsHotspot
+import firms
+
+HEADER = "latitude,longitude,bright_ti4,scan,track,acq_date,acq_time,satellite,instrument,confidence,version,bright_ti5,frp,daynight"
+# Термоточки фикстуры по дням; вторая строка 2024-07-02 — дубликат, пришедший повторно
+FIXTURE = {
+    date(2024, 7, 1): ["51.16,71.47,330.1,0.4,0.4,2024-07-01,936,N,VIIRS,n,2.0NRT,290.2,5.1,D"],
+    date(2024, 7, 2): [
+        "43.24,76.89,340.5,0.5,0.5,2024-07-02,1012,N,VIIRS,h,2.0NRT,295.0,12.3,D",
+        "43.24,76.89,340.5,0.5,0.5,2024-07-02,1012,N,VIIRS,h,2.0NRT,295.0,12.3,D",
+        "55.75,37.62,310.0,0.4,0.4,2024-07-02,2150,N,VIIRS,l,2.0NRT,280.0,1.0,N"
+    ],
+    date(2024, 7, 3): ["not,a,valid,row"]
+}
+
+
+class FirmsFixtureHandler(BaseHTTPRequestHandler):
+    """Имитация area API FIRMS: /api/area/csv/{key}/{source}/{area}/{days}/{date}."""
+    requests = []
+
+    def do_GET(self):
+        FirmsFixtureHandler.requests.append(self.path)
+        *_, days, start = self.path.split('/')
+        start = date.fromisoformat(start)
+        lines = [HEADER]
+        for day, rows in FIXTURE.items():
+            if 0 <= (day - start).days < int(days):
+                lines.extend(rows)
+        body = "\n".join(lines).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/csv')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestFirmsIngestion(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), FirmsFixtureHandler)
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        FirmsFixtureHandler.requests = []
+        self.engine = create_engine("sqlite://")
+        Base.metadata.create_all(bind=self.engine)
+        self.db = sessionmaker(bind=self.engine)()
+
+    def tearDown(self):
+        self.db.close()
+        Base.metadata.drop_all(bind=self.engine)
+
+    def ingest(self, **kwargs):
+        return firms.ingest(self.db, 'KEY', base_url=self.base_url, **kwargs)
+
+    def test_ingest_and_dedup(self):
+        inserted = self.ingest(start=date(2024, 7, 1), end=date(2024, 7, 3))
+        self.assertEqual(inserted, 3)
+        self.assertEqual(self.db.query(FirmsHotspot).count(), 3)
+        almaty = self.db.query(FirmsHotspot).filter_by(acq_date=date(2024, 7, 2), acq_time='1012').one()
+        self.assertEqual(almaty.region, 'Алматинская область')
+
+        # Повторная загрузка того же периода не создает дубликатов
+        self.assertEqual(self.ingest(start=date(2024, 7, 1), end=date(2024, 7, 3)), 0)
+        self.assertEqual(self.db.query(FirmsHotspot).count(), 3)
+
+    def test_incremental_window(self):
+        self.ingest(start=date(2024, 7, 1), end=date(2024, 7, 1))
+        FirmsFixtureHandler.requests = []
+        self.assertEqual(self.ingest(end=date(2024, 7, 3)), 2)
+        # Продолжение с последней загруженной даты включительно
+        self.assertEqual(len(FirmsFixtureHandler.requests), 1)
+        self.assertTrue(FirmsFixtureHandler.requests[0].endswith('/3/2024-07-01'))
+
+    def test_same_window_twice(self):
+        self.assertEqual(self.ingest(end=date(2024, 7, 2), start=date(2024, 7, 1)), 3)
+        statements = []
+        event.listen(self.engine, 'before_cursor_execute',
+                     lambda conn, cursor, statement, *args: statements.append(statement.split()[0]))
+        # Повтор окна с последней даты включительно: загруженные строки пропускает сама БД
+        self.assertEqual(self.ingest(end=date(2024, 7, 2)), 0)
+        self.assertEqual(self.ingest(end=date(2024, 7, 2)), 0)
+        self.assertEqual(statements, ['SELECT', 'INSERT'] * 2)  # last_acq_date и вставка, без чтения ключей
+        self.assertEqual(self.db.query(FirmsHotspot).count(), 3)
+
+    def test_long_period_split_into_windows(self):
+        self.ingest(start=date(2024, 6, 10), end=date(2024, 7, 3))
+        self.assertEqual([path.rsplit('/', 2)[1:] for path in FirmsFixtureHandler.requests],
+                         [['10', '2024-06-10'], ['10', '2024-06-20'], ['4', '2024-06-30']])
+        self.assertEqual(self.db.query(FirmsHotspot).count(), 3)
+
+    def test_bbox_query(self):
+        self.ingest(start=date(2024, 7, 1), end=date(2024, 7, 3))
+        hotspots = firms.hotspots_in_bbox(self.db, firms.KAZAKHSTAN_BBOX, date(2024, 7, 1)).all()
+        self.assertEqual([(h.acq_date, h.acq_time) for h in hotspots],
+                         [(date(2024, 7, 2), '1012'), (date(2024, 7, 1), '0936')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+import shutil
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from openpyxl import load_workbook
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from database import Base
+from models import Fire, FireForce, ReportCache
+import rollup
+import reports
+from reports import ReportService, normalize_filters
+
+
+class TestReportService(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        # Файловая БД: параллельные запросы идут через разные соединения, как в приложении
+        self.engine = create_engine(f"sqlite:///{self.folder}/reports.db", connect_args={"timeout": 30})
+        Base.metadata.create_all(bind=self.engine)
+        self.session_factory = sessionmaker(bind=self.engine)
+        with self.session_factory() as db:
+            db.add_all([
+                Fire(fire_date=datetime(2024, 5, 1), region='Akmola', area=10.0, damage_tenge=100.0, created_by=1,
+                     forces=[FireForce(force_type='APS', people_count=5, tecnic_count=1, aircraft_count=0)]),
+                Fire(fire_date=datetime(2024, 6, 1), region='Almaty', area=5.0, created_by=2)
+            ])
+            db.flush()
+            rollup.rebuild(db)
+            db.commit()
+        self.service = ReportService(self.session_factory, self.folder, workers=2)
+
+    def tearDown(self):
+        self.service.close()
+        Base.metadata.drop_all(bind=self.engine)
+        self.engine.dispose()
+        shutil.rmtree(self.folder)
+
+    def build(self, report_type='fires', fmt='pdf', **filters):
+        job = self.service.request(report_type, fmt, normalize_filters(**filters))
+        return self.service.wait(job['id'], timeout=30)
+
+    def test_pdf_built_and_served_from_cache(self):
+        job = self.build(year=2024)
+        self.assertEqual(job['status'], reports.DONE)
+        self.assertEqual(job['rows'], 2)
+        with open(job['file_path'], 'rb') as file:
+            self.assertEqual(file.read(4), b'%PDF')
+        cached = self.service.request('fires', 'pdf', normalize_filters(year=2024))
+        self.assertEqual(cached['id'], job['id'])
+        self.assertEqual(cached['finished_at'], job['finished_at'])
+
+    def test_csv_and_xlsx(self):
+        job = self.build('summary', 'csv')
+        with open(job['file_path'], encoding='utf-8-sig') as file:
+            lines = file.read().splitlines()
+        self.assertEqual(lines[0], 'Регион,Количество,Площадь (га),Ущерб (тенге),Пользователи')
+        self.assertIn('Akmola,1,10.0,100.0,1', lines)
+        job = self.build('analytics', 'xlsx', lang='kz')
+        rows = list(load_workbook(job['file_path']).active.values)
+        self.assertEqual(rows[0][0], 'Өңір')
+        self.assertEqual(rows[1][:3], ('Akmola', 'Мам', 1))
+
+    def test_identical_requests_share_one_job(self):
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            jobs = list(pool.map(lambda _: self.service.request('fires', 'csv', normalize_filters()), range(8)))
+        self.assertEqual(len({job['id'] for job in jobs}), 1)
+        with self.session_factory() as db:
+            self.assertEqual(db.query(ReportCache).count(), 1)
+
+    def test_fire_write_invalidates_matching_window(self):
+        akmola = self.build(region='Akmola', year=2024)
+        almaty = self.build(region='Almaty', year=2024)
+        everything = self.build()
+        with self.session_factory() as db:
+            db.add(Fire(fire_date=datetime(2024, 7, 1), region='Akmola', area=1.0, created_by=1))
+            db.commit()
+        self.assertEqual(self.service.job(akmola['id'])['status'], reports.STALE)
+        self.assertEqual(self.service.job(everything['id'])['status'], reports.STALE)
+        self.assertEqual(self.service.job(almaty['id'])['status'], reports.DONE)
+        rebuilt = self.build(region='Akmola', year=2024)
+        self.assertEqual(rebuilt['id'], akmola['id'])
+        self.assertEqual(rebuilt['rows'], 2)
+
+    def test_force_write_invalidates_fire_window(self):
+        almaty = self.build(region='Almaty')
+        with self.session_factory() as db:
+            fire = db.query(Fire).filter_by(region='Almaty').one()
+            fire.forces.append(FireForce(force_type='KPS', people_count=3, tecnic_count=0, aircraft_count=0))
+            db.commit()
+        self.assertEqual(self.service.job(almaty['id'])['status'], reports.STALE)
+
+    def test_rollback_keeps_report(self):
+        job = self.build()
+        with self.session_factory() as db:
+            db.add(Fire(fire_date=datetime(2024, 7, 1), region='Akmola', area=1.0, created_by=1))
+            db.flush()
+            db.rollback()
+        self.assertEqual(self.service.job(job['id'])['status'], reports.DONE)
+
+    def test_lost_job_restarted(self):
+        job = self.build()
+        with self.session_factory() as db:
+            db.query(ReportCache).update({'status': reports.RUNNING, 'created_at': datetime.utcnow() - timedelta(hours=1)})
+            db.commit()
+        restarted = self.service.wait(self.service.request('fires', 'pdf', normalize_filters())['id'], timeout=30)
+        self.assertEqual(restarted['id'], job['id'])
+        self.assertEqual(restarted['status'], reports.DONE)
+
+    def test_invalid_request(self):
+        with self.assertRaises(ValueError):
+            self.service.request('fires', 'docx', normalize_filters())
+        with self.assertRaises(ValueError):
+            normalize_filters(month=13)
+
+
+if __name__ == '__main__':
+    unittest.main()
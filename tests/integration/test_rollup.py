@@ -0,0 +1,101 @@
+import unittest
+from datetime import datetime
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from database import Base
+from models import Fire, FireForce, FireStatsMonthly, FireForceStatsMonthly, FireCreatorMonthly
+from queries import region_summary
+import rollup
+
+
+class TestMonthlyRollup(unittest.TestCase):
+    """Инкрементальное обновление сводки должно совпадать с полной пересборкой."""
+
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        Base.metadata.create_all(bind=self.engine)
+        self.db = sessionmaker(bind=self.engine)()
+
+    def tearDown(self):
+        self.db.close()
+        Base.metadata.drop_all(bind=self.engine)
+
+    def _snapshot(self):
+        return (
+            sorted((r.region, r.year, r.month, r.fires_count, r.total_area, r.total_damage, r.users_count)
+                   for r in self.db.query(FireStatsMonthly)),
+            sorted((r.region, r.year, r.month, r.force_type, r.people_count, r.tecnic_count, r.aircraft_count)
+                   for r in self.db.query(FireForceStatsMonthly)),
+            sorted((r.region, r.year, r.month, r.user_id) for r in self.db.query(FireCreatorMonthly))
+        )
+
+    def _assert_matches_rebuild(self):
+        incremental = self._snapshot()
+        rollup.rebuild(self.db)
+        self.db.flush()
+        self.assertEqual(incremental, self._snapshot())
+
+    def _add(self, region, date, area, user_id, people=0):
+        fire = Fire(fire_date=date, region=region, area=area, damage_tenge=area * 10, created_by=user_id,
+                    forces=[FireForce(force_type='APS', people_count=people, tecnic_count=1, aircraft_count=0)])
+        self.db.add(fire)
+        self.db.flush()
+        rollup.refresh(self.db, [(region, date)])
+        return fire
+
+    def test_insert_update_delete(self):
+        first = self._add('Akmola', datetime(2024, 5, 1), 10.0, 1, people=3)
+        self._add('Akmola', datetime(2024, 5, 31, 23, 59), 5.0, 2, people=4)
+        self._add('Almaty', datetime(2024, 6, 1), 2.0, 1)
+        self._assert_matches_rebuild()
+
+        old_key = (first.region, first.fire_date)
+        first.fire_date = datetime(2024, 6, 15)
+        first.region = 'Almaty'
+        self.db.flush()
+        rollup.refresh(self.db, [old_key, (first.region, first.fire_date)])
+        self._assert_matches_rebuild()
+
+        key = (first.region, first.fire_date)
+        self.db.delete(first)
+        self.db.flush()
+        rollup.refresh(self.db, [key])
+        self._assert_matches_rebuild()
+
+    def test_users_counted_once_across_months(self):
+        self._add('Akmola', datetime(2024, 1, 10), 1.0, 7)
+        self._add('Akmola', datetime(2024, 2, 10), 1.0, 7)
+        self._add('Akmola', datetime(2024, 2, 11), 1.0, 8)
+        summary = region_summary(self.db, {'year': 2024})
+        self.assertEqual(summary, [('Akmola', 3, 3.0, 30.0, 2)])
+
+    def test_cell_row_updated_in_place(self):
+        # Писатели одной ячейки блокируют одну и ту же строку, поэтому она не пересоздается
+        first = self._add('Akmola', datetime(2024, 3, 1), 1.0, 1)
+        row_id = self.db.query(FireStatsMonthly.id).scalar()
+        second = self._add('Akmola', datetime(2024, 3, 2), 2.0, 2)
+        self.assertEqual(self.db.query(FireStatsMonthly.id, FireStatsMonthly.fires_count).all(), [(row_id, 2)])
+        for fire in (first, second):
+            self.db.delete(fire)
+        self.db.flush()
+        rollup.refresh(self.db, [('Akmola', datetime(2024, 3, 1))])
+        self.assertEqual(self.db.query(FireStatsMonthly).count(), 0)
+
+    def test_cell_locked_before_fire_written(self):
+        # refresh сам отправляет пожар в БД после блокировки ячейки — писатели не ждут друг друга по кругу
+        statements = []
+        event.listen(self.engine, 'before_cursor_execute',
+                     lambda conn, cursor, statement, *args: statements.append(' '.join(statement.split()[:3])))
+        fire = Fire(fire_date=datetime(2024, 4, 1), region='Akmola', area=1.0, created_by=1)
+        self.db.add(fire)
+        rollup.refresh(self.db, [(fire.region, fire.fire_date)])
+        inserts = [statement for statement in statements if statement.startswith('INSERT')]
+        self.assertEqual(inserts[:2], ['INSERT INTO fire_stats_monthly', 'INSERT INTO fires'])
+        self.assertEqual(self.db.query(FireStatsMonthly.fires_count).scalar(), 1)
+
+    def test_month_bounds_december(self):
+        self.assertEqual(rollup.month_bounds(2024, 12), (datetime(2024, 12, 1), datetime(2025, 1, 1)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,143 @@
+import json
+import threading
+import unittest
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from database import Base
+from models import WeatherReading
+from http_client import HttpClient
+from weather import WeatherPrefetcher, REGION_COORDINATES
+
+
+class OpenWeatherHandler(BaseHTTPRequestHandler):
+    """Имитация OpenWeather: температура равна широте запроса."""
+    hits = 0
+
+    def do_GET(self):
+        OpenWeatherHandler.hits += 1
+        query = parse_qs(urlsplit(self.path).query)
+        body = json.dumps({
+            'dt': 1720000000,
+            'main': {'temp': float(query['lat'][0]), 'humidity': 40},
+            'wind': {'speed': 3.5},
+            'weather': [{'description': 'clear sky'}]
+        }).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class LockStore:
+    """Минимальный SET NX EX в памяти вместо Redis."""
+
+    def __init__(self):
+        self.keys = {}
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.keys:
+            return None
+        self.keys[key] = (value, ex)
+        return True
+
+
+class TestWeatherPrefetcher(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), OpenWeatherHandler)
+        cls.url = f"http://127.0.0.1:{cls.server.server_address[1]}/data/2.5/weather"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        OpenWeatherHandler.hits = 0
+        self.engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(bind=self.engine)
+        self.session_factory = sessionmaker(bind=self.engine)
+        self.prefetcher = WeatherPrefetcher(self.session_factory, 'KEY', client=HttpClient(), url=self.url)
+        self.prefetcher.ensure_started = lambda: None  # Обновления запускаются тестом явно
+
+    def tearDown(self):
+        Base.metadata.drop_all(bind=self.engine)
+
+    def test_refresh_all_regions(self):
+        self.assertEqual(self.prefetcher.refresh(), len(REGION_COORDINATES))
+        readings = self.prefetcher.readings(['Astana', 'Akmola'])
+        self.assertEqual([r['region'] for r in readings], ['Astana', 'Akmola'])
+        self.assertEqual(readings[0]['temp'], REGION_COORDINATES['Astana'][0])
+        self.assertFalse(readings[0]['stale'])
+
+    def test_readings_served_locally(self):
+        self.prefetcher.refresh(['Astana'])
+        hits = OpenWeatherHandler.hits
+        for _ in range(5):
+            self.prefetcher.readings(['Astana'])
+        self.assertEqual(OpenWeatherHandler.hits, hits)
+        self.assertFalse(self.prefetcher._wake.is_set())
+
+    def test_history_kept_and_latest_served(self):
+        self.prefetcher.refresh(['Astana'])
+        self.prefetcher.refresh(['Astana'])
+        with self.session_factory() as db:
+            self.assertEqual(db.query(WeatherReading).count(), 2)
+        self.assertEqual(len(self.prefetcher.readings(['Astana'])), 1)
+
+    def test_failed_upstream_keeps_last_reading(self):
+        self.prefetcher.refresh(['Astana'])
+        with self.session_factory() as db:
+            fetched_at = db.query(WeatherReading.fetched_at).scalar()
+        breaker = self.prefetcher.client.breaker(self.url)
+        for _ in range(breaker.failure_threshold):
+            breaker.record_failure()
+        self.assertEqual(self.prefetcher.refresh(['Astana']), 0)
+        with self.session_factory() as db:
+            self.assertEqual(db.query(WeatherReading.fetched_at).all(), [(fetched_at,)])
+
+    def test_stale_reading_served_and_revalidated(self):
+        self.prefetcher.refresh(['Astana'])
+        with self.session_factory() as db:
+            db.query(WeatherReading).update({'fetched_at': datetime.utcnow() - timedelta(hours=1)})
+            db.commit()
+        self.prefetcher._last_refresh -= self.prefetcher.min_revalidate
+        readings = self.prefetcher.readings(['Astana'])
+        self.assertTrue(readings[0]['stale'])
+        self.assertTrue(self.prefetcher._wake.is_set())
+
+    def test_one_pass_per_interval_across_workers(self):
+        store = LockStore()
+        workers = [WeatherPrefetcher(self.session_factory, 'KEY', client=HttpClient(), url=self.url, redis_client=store)
+                   for _ in range(3)]
+        passes = [worker.scheduled_refresh(worker.refresh_interval) for worker in workers]
+        self.assertEqual(passes, [len(REGION_COORDINATES), 0, 0])
+        self.assertEqual(OpenWeatherHandler.hits, len(REGION_COORDINATES))
+        self.assertEqual(store.keys['weather:refresh'][1], workers[0].refresh_interval)
+
+    def test_old_readings_pruned(self):
+        with self.session_factory() as db:
+            db.add(WeatherReading(region='Astana', temp=1.0, fetched_at=datetime.utcnow() - timedelta(days=31)))
+            db.add(WeatherReading(region='Astana', temp=2.0, fetched_at=datetime.utcnow() - timedelta(days=29)))
+            db.commit()
+        self.prefetcher.refresh(['Astana'])
+        with self.session_factory() as db:
+            self.assertEqual(sorted(r.temp for r in db.query(WeatherReading)), [2.0, REGION_COORDINATES['Astana'][0]])
+
+    def test_missing_region_triggers_refresh(self):
+        self.prefetcher._last_refresh -= self.prefetcher.min_revalidate
+        self.assertEqual(self.prefetcher.readings(['Astana']), [])
+        self.assertTrue(self.prefetcher._wake.is_set())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+from datetime import datetime
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from database import Base
+from models import Fire, FireForce
+from queries import forces_by_region_month, analytics_by_region_month
+from rollup import rebuild
+
+
+class QueryCountTestCase(unittest.TestCase):
+    """Базовый класс: SQLite в памяти и подсчет выполненных SQL-запросов."""
+
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        Base.metadata.create_all(bind=self.engine)
+        self.Session = sessionmaker(bind=self.engine)
+        self.statements = []
+        event.listen(self.engine, "before_cursor_execute", self._count)
+
+    def tearDown(self):
+        event.remove(self.engine, "before_cursor_execute", self._count)
+        Base.metadata.drop_all(bind=self.engine)
+
+    def _count(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def _seed(self, fires_count, forces_per_fire):
+        with self.Session() as db:
+            for i in range(fires_count):
+                fire = Fire(fire_date=datetime(2024, 1 + i % 12, 1 + i % 28), region=['Akmola', 'Almaty'][i % 2],
+                            area=1.0, created_by=1)
+                fire.forces = [FireForce(force_type='APS', people_count=2, tecnic_count=1, aircraft_count=0)
+                               for _ in range(forces_per_fire)]
+                db.add(fire)
+            db.flush()
+            rebuild(db)
+            db.commit()
+
+
+class TestForcesAggregationQueryCount(QueryCountTestCase):
+    """Количество SQL-запросов агрегации сил не должно зависеть от размера fire_forces."""
+
+    def _run(self):
+        keys = [('Akmola', 1), ('Almaty', 2), ('Akmola', 3)]
+        with self.Session() as db:
+            self.statements.clear()
+            result = forces_by_region_month(db, {'year': 2024}, keys)
+            return len(self.statements), result
+
+    def test_query_count_is_constant(self):
+        self._seed(24, 1)
+        small_count, small = self._run()
+        self._seed(240, 20)
+        large_count, large = self._run()
+        self.assertEqual(small_count, 1)
+        self.assertEqual(small_count, large_count)
+        self.assertEqual(small[('Akmola', 1)][0]['people_count'], 2 * 2)
+        self.assertEqual(large[('Akmola', 1)][0]['people_count'], 2 * 2 + 20 * 2 * 20)
+
+    def test_only_requested_keys_returned(self):
+        self._seed(24, 2)
+        _, result = self._run()
+        self.assertEqual(set(result), {('Akmola', 1), ('Almaty', 2), ('Akmola', 3)})
+
+
+class TestAnalyticsByRegionMonth(QueryCountTestCase):
+    """FastAPI /analytics выполняет ограниченное число запросов без загрузки всей таблицы fires."""
+
+    def _analytics(self):
+        with self.Session() as db:
+            self.statements.clear()
+            data = analytics_by_region_month(db, {'region': 'Akmola'})
+            return len(self.statements), data
+
+    def test_statement_count_is_bounded(self):
+        self._seed(24, 1)
+        small_count, small = self._analytics()
+        self._seed(480, 10)
+        large_count, large = self._analytics()
+        self.assertLessEqual(small_count, 2)
+        self.assertEqual(small_count, large_count)
+        self.assertEqual({row['region'] for row in large}, {'Akmola'})
+        january = next(row for row in large if row['month'] == 1)
+        self.assertEqual(january['count'], 2 + 40)
+        self.assertEqual(january['forces'][0]['people_count'], 2 * 2 + 40 * 10 * 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
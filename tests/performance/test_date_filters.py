@@ -0,0 +1,71 @@
+import unittest
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, extract, select, text
+from sqlalchemy.orm import sessionmaker
+from database import Base
+from models import Fire
+from queries import fire_date_filters
+
+
+class TestSargableDateFilters(unittest.TestCase):
+    """Фильтры по году/месяцу/периоду должны использовать индексы fire_date и (region, fire_date)."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.engine = create_engine("sqlite://")
+        Base.metadata.create_all(bind=cls.engine)
+        with sessionmaker(bind=cls.engine)() as db:
+            start = datetime(2020, 1, 1)
+            db.add_all([
+                Fire(fire_date=start + timedelta(hours=7 * i), region=['Akmola', 'Almaty', 'Abai'][i % 3], area=1.0, created_by=1)
+                for i in range(5000)
+            ])
+            db.commit()
+            db.execute(text("ANALYZE"))
+
+    @classmethod
+    def tearDownClass(cls):
+        Base.metadata.drop_all(bind=cls.engine)
+
+    def _plan(self, filters):
+        stmt = select(Fire.id).where(*filters).compile(self.engine, compile_kwargs={"literal_binds": True})
+        with self.engine.connect() as conn:
+            return " ".join(row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {stmt}")))
+
+    def _count(self, filters):
+        with self.engine.connect() as conn:
+            return len(conn.execute(select(Fire.id).where(*filters)).all())
+
+    def test_year_month_uses_fire_date_index(self):
+        plan = self._plan(fire_date_filters(year=2021, month=3))
+        self.assertRegex(plan, r"SEARCH fires USING (COVERING )?INDEX ix_fires_fire_date")
+        self.assertNotIn("SCAN", plan)
+
+    def test_region_and_year_use_composite_index(self):
+        plan = self._plan(fire_date_filters(year=2021, region='Akmola'))
+        self.assertRegex(plan, r"SEARCH fires USING (COVERING )?INDEX idx_region_date")
+        self.assertNotIn("SCAN", plan)
+
+    def test_extract_forces_full_scan(self):
+        plan = self._plan([extract('year', Fire.fire_date) == 2021])
+        self.assertIn("SCAN", plan)
+
+    def test_same_rows_as_extract(self):
+        for year, month in [(2020, 1), (2020, 12), (2021, 2), (2021, None)]:
+            legacy = [extract('year', Fire.fire_date) == year]
+            if month:
+                legacy.append(extract('month', Fire.fire_date) == month)
+            self.assertEqual(self._count(fire_date_filters(year=year, month=month)), self._count(legacy))
+
+    def test_date_to_includes_whole_day(self):
+        inclusive = fire_date_filters(date_from='2020-02-01', date_to='2020-02-29')
+        legacy = [extract('year', Fire.fire_date) == 2020, extract('month', Fire.fire_date) == 2]
+        self.assertEqual(self._count(inclusive), self._count(legacy))
+
+    def test_invalid_month_rejected(self):
+        with self.assertRaises(ValueError):
+            fire_date_filters(year=2021, month=13)
+
+
+if __name__ == "__main__":
+    unittest.main()
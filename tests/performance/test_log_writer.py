@@ -0,0 +1,81 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime
+from routes.logger import LogWriter, SCHEMA_SQL, INSERT_SQL
+
+THREADS = 8
+CALLS_PER_THREAD = 200
+
+
+def legacy_log_to_db(db_file, user, action, details=""):
+    """Прежняя реализация: отдельное соединение, CREATE TABLE и COMMIT на каждый вызов."""
+    conn = sqlite3.connect(db_file, timeout=30)
+    cursor = conn.cursor()
+    cursor.execute(SCHEMA_SQL)
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    cursor.execute(INSERT_SQL, (timestamp, user, action, details))
+    conn.commit()
+    conn.close()
+
+
+class TestLogWriterThroughput(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def run_concurrently(self, log):
+        def worker(n):
+            for i in range(CALLS_PER_THREAD):
+                log(f"user{n}", "READ", f"call {i}")
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(THREADS)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - start
+
+    def count_rows(self, db_file):
+        conn = sqlite3.connect(db_file)
+        try:
+            return conn.execute("SELECT COUNT(*) FROM audit_logs").fetchone()[0]
+        finally:
+            conn.close()
+
+    def test_writer_outperforms_per_call_connections(self):
+        total = THREADS * CALLS_PER_THREAD
+        legacy_file = os.path.join(self.tmpdir, "legacy.db")
+        legacy_time = self.run_concurrently(lambda *args: legacy_log_to_db(legacy_file, *args))
+
+        writer_file = os.path.join(self.tmpdir, "writer.db")
+        writer = LogWriter(writer_file)
+        start = time.perf_counter()
+        self.run_concurrently(writer.write)
+        writer.close()
+        writer_time = time.perf_counter() - start
+
+        self.assertEqual(self.count_rows(legacy_file), total)
+        self.assertEqual(self.count_rows(writer_file), total)
+        self.assertLess(writer_time, legacy_time)
+
+    def test_wal_mode(self):
+        db_file = os.path.join(self.tmpdir, "wal.db")
+        writer = LogWriter(db_file)
+        writer.write("admin", "login")
+        writer.close()
+        conn = sqlite3.connect(db_file)
+        try:
+            self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        finally:
+            conn.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import threading
+import time
+import unittest
+import bcrypt
+import eventlet
+from passwords import PasswordHasher
+
+LOGINS = 16
+ROUNDS = 10          # Стоимость bcrypt в бенчмарке (~50 мс на проверку)
+TICK = 0.005         # Период «других запросов» — зеленого потока, который должен просыпаться вовремя
+
+
+class TestLoginStorm(unittest.TestCase):
+    def setUp(self):
+        self.hashed = bcrypt.hashpw(b'secret', bcrypt.gensalt(rounds=ROUNDS)).decode('utf-8')
+        self.hasher = PasswordHasher(workers=4)
+
+    def storm(self, check):
+        """Шторм входов в зеленых потоках; возвращает максимальную задержку тикера и время шторма."""
+        gaps = []
+        done = eventlet.event.Event()
+
+        def ticker():
+            last = time.perf_counter()
+            while not done.ready():
+                eventlet.sleep(TICK)
+                now = time.perf_counter()
+                gaps.append(now - last - TICK)
+                last = now
+
+        def login():
+            self.assertTrue(check('secret', self.hashed))
+
+        ticking = eventlet.spawn(ticker)
+        eventlet.sleep(0)
+        start = time.perf_counter()
+        pool = eventlet.GreenPool()
+        for _ in range(LOGINS):
+            pool.spawn(login)
+        pool.waitall()
+        elapsed = time.perf_counter() - start
+        done.send()
+        ticking.wait()
+        return max(gaps), elapsed
+
+    def test_offloaded_hashing_keeps_hub_responsive(self):
+        inline_gap, _ = self.storm(
+            lambda password, hashed: bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8')))
+        pooled_gap, _ = self.storm(self.hasher.bcrypt_check)
+        self.assertLess(pooled_gap, inline_gap / 3)
+
+    def test_concurrency_bounded(self):
+        active, peak = [0], [0]
+        lock = threading.Lock()
+
+        def work():
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.02)
+            with lock:
+                active[0] -= 1
+            return True
+
+        pool = eventlet.GreenPool()
+        for _ in range(12):
+            pool.spawn(self.hasher.run, work)
+        pool.waitall()
+        threads = [threading.Thread(target=self.hasher.run, args=(work,)) for _ in range(12)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertLessEqual(peak[0], 4)
+
+    def test_werkzeug_hashes(self):
+        hashed = self.hasher.generate('secret')
+        self.assertTrue(self.hasher.check(hashed, 'secret'))
+        self.assertFalse(self.hasher.check(hashed, 'wrong'))
+        self.assertTrue(self.hasher.bcrypt_check('secret', self.hasher.bcrypt_hash('secret')))
+
+
+if __name__ == '__main__':
+    unittest.main()
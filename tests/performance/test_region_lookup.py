@@ -0,0 +1,23 @@
+import time
+import unittest
+import numpy as np
+from region_index import RegionIndex
+
+POINTS = 1000000
+
+
+class TestRegionLookupThroughput(unittest.TestCase):
+    def test_million_points(self):
+        index = RegionIndex()
+        index.grid  # Построение индекса не входит в замер
+        rng = np.random.default_rng(0)
+        lats, lons = rng.uniform(40, 56, POINTS), rng.uniform(46, 88, POINTS)
+        start = time.perf_counter()
+        codes = index.lookup_codes(lats, lons)
+        elapsed = time.perf_counter() - start
+        self.assertEqual(len(codes), POINTS)
+        self.assertLess(elapsed, 2.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from database import Base
+from models import AuditLog
+from audit import AuditQueue
+
+
+class TestAuditQueue(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(bind=self.engine)
+        self.session_factory = sessionmaker(bind=self.engine)
+        self.commits = 0
+
+        def on_commit(conn):
+            self.commits += 1
+        event.listen(self.engine, "commit", on_commit)
+
+    def tearDown(self):
+        Base.metadata.drop_all(bind=self.engine)
+
+    def count(self):
+        with self.session_factory() as db:
+            return db.query(AuditLog).count()
+
+    def test_batches_events(self):
+        audit_queue = AuditQueue(self.session_factory, batch_size=100, flush_interval=5)
+        for i in range(1000):
+            audit_queue.put(1, 'READ', 'fires', i)
+        audit_queue.flush()
+        self.assertEqual(self.count(), 1000)
+        self.assertLessEqual(self.commits, 20)
+        audit_queue.close()
+
+    def test_close_writes_pending_events(self):
+        audit_queue = AuditQueue(self.session_factory, batch_size=1000, flush_interval=60)
+        for i in range(10):
+            audit_queue.put(1, 'UPDATE', 'fires', i, 'x' * 2000)
+        audit_queue.close()
+        self.assertEqual(self.count(), 10)
+        with self.session_factory() as db:
+            self.assertEqual(len(db.query(AuditLog).first().changes), 1000)
+
+    def test_timestamp_on_database_clock(self):
+        # Часы сервера БД — местное время (UTC+5), а не время процесса приложения
+        server_now = '2024-07-01 17:00:00'
+        event.listen(self.engine, 'before_cursor_execute',
+                     lambda conn, cursor, statement, parameters, context, executemany:
+                     (statement.replace('CURRENT_TIMESTAMP', f"'{server_now}'"), parameters), retval=True)
+        with self.session_factory() as db:
+            db.add(AuditLog(user_id=1, action='LOGIN', table_name='users'))
+            db.commit()
+        audit_queue = AuditQueue(self.session_factory, flush_interval=0.2)
+        audit_queue.put(1, 'UPDATE', 'fires', 1)
+        audit_queue.close()
+        with self.session_factory() as db:
+            default, queued = [row.timestamp for row in db.query(AuditLog).order_by(AuditLog.id)]
+        self.assertEqual(default, datetime(2024, 7, 1, 17))
+        self.assertTrue(default - timedelta(seconds=5) < queued <= default)
+
+    def test_full_queue_writes_synchronously(self):
+        audit_queue = AuditQueue(self.session_factory, max_size=1, put_timeout=0)
+        audit_queue._ensure_started = lambda: None  # Фоновый поток не запущен, очередь не разгружается
+        audit_queue.put(1, 'INSERT', 'fires', 1)
+        audit_queue.put(1, 'INSERT', 'fires', 2)
+        self.assertEqual(self.count(), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
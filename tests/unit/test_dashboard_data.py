@@ -0,0 +1,89 @@
+import unittest
+from datetime import datetime
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from cache_tags import TagStore
+from database import Base
+from models import Fire
+from dashboard_data import DashboardData
+
+
+class TestDashboardData(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(bind=self.engine)
+        self.session_factory = sessionmaker(bind=self.engine)
+        with self.session_factory() as db:
+            db.add_all([
+                Fire(fire_date=datetime(2023, 5, 1), region='Akmola', area=10.0, damage_tenge=100.0, created_by=1),
+                Fire(fire_date=datetime(2024, 6, 1), region='Akmola', area=20.0, damage_tenge=None, created_by=1),
+                Fire(fire_date=datetime(2024, 7, 1), region='Almaty', area=5.0, damage_tenge=50.0, created_by=1)
+            ])
+            db.commit()
+        self.data = DashboardData(self.session_factory)
+
+    def tearDown(self):
+        Base.metadata.drop_all(bind=self.engine)
+
+    def test_typed_frame(self):
+        frame = self.data.fires('Akmola', 2024)
+        self.assertEqual(list(frame.columns), ['region', 'year', 'month', 'damage_area', 'damage_tenge'])
+        self.assertEqual(frame['month'].tolist(), [6])
+        self.assertEqual(frame['damage_tenge'].tolist(), [0.0])
+        self.assertEqual(str(frame['damage_area'].dtype), 'float64')
+
+    def test_frames_cached(self):
+        self.assertIs(self.data.fires('Akmola'), self.data.fires('Akmola'))
+        self.assertEqual(len(self.data.fires()), 3)
+
+    def test_write_invalidates_matching_keys(self):
+        akmola, almaty, everything = self.data.fires('Akmola', 2024), self.data.fires('Almaty', 2024), self.data.fires()
+        with self.session_factory() as db:
+            db.add(Fire(fire_date=datetime(2024, 8, 1), region='Akmola', area=1.0, created_by=1))
+            db.commit()
+        self.assertEqual(len(self.data.fires('Akmola', 2024)), 2)
+        self.assertEqual(len(self.data.fires()), 4)
+        self.assertIsNot(self.data.fires('Akmola', 2024), akmola)
+        self.assertIsNot(self.data.fires(), everything)
+        self.assertIs(self.data.fires('Almaty', 2024), almaty)
+
+    def test_update_invalidates_old_region(self):
+        self.assertEqual(len(self.data.fires('Almaty')), 1)
+        with self.session_factory() as db:
+            fire = db.query(Fire).filter_by(region='Almaty').one()
+            fire.region = 'Akmola'
+            db.commit()
+        self.assertEqual(len(self.data.fires('Almaty')), 0)
+
+    def test_rollback_keeps_cache(self):
+        frame = self.data.fires('Akmola')
+        with self.session_factory() as db:
+            db.add(Fire(fire_date=datetime(2024, 8, 1), region='Akmola', area=1.0, created_by=1))
+            db.flush()
+            db.rollback()
+        self.assertIs(self.data.fires('Akmola'), frame)
+
+    def test_bulk_update_invalidates_all_frames(self):
+        frame = self.data.fires('Almaty', 2024)
+        with self.session_factory() as db:
+            db.query(Fire).filter(Fire.region == 'Almaty').update({'area': 7.0}, synchronize_session=False)
+            db.commit()
+        self.assertEqual(self.data.fires('Almaty', 2024)['damage_area'].tolist(), [7.0])
+        self.assertIsNot(self.data.fires('Almaty', 2024), frame)
+
+    def test_versions_from_other_process(self):
+        store = TagStore()
+        data = DashboardData(self.session_factory, tag_store=store)
+        akmola, almaty = data.fires('Akmola', 2024), data.fires('Almaty', 2024)
+        # Так подписчик применяет версии, назначенные записью в другом процессе
+        store.apply({'fires:Akmola:2024': 'other-process'})
+        self.assertIsNot(data.fires('Akmola', 2024), akmola)
+        self.assertIs(data.fires('Almaty', 2024), almaty)
+
+    def test_empty_hotspots(self):
+        self.assertTrue(self.data.hotspots().empty)
+
+
+if __name__ == '__main__':
+    unittest.main()
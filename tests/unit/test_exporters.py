@@ -0,0 +1,97 @@
+import csv
+import unittest
+from datetime import datetime
+from io import BytesIO, StringIO
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from database import Base
+from models import Fire, FireForce
+from exporters import FIRE_ARROW_SCHEMA, csv_chunks, iter_record_batches, stream_fires_arrow, write_fires_parquet
+
+
+class TestCsvChunks(unittest.TestCase):
+    def test_chunks_reassemble_to_full_csv(self):
+        rows = [(i, f"Регион {i}", i * 1.5) for i in range(5000)]
+        chunks = list(csv_chunks(["id", "region", "area"], rows, chunk_size=4096))
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(all(len(chunk) < 4096 + 100 for chunk in chunks))
+        parsed = list(csv.reader(StringIO("".join(chunks))))
+        self.assertEqual(parsed[0], ["id", "region", "area"])
+        self.assertEqual(len(parsed), 5001)
+        self.assertEqual(parsed[-1], ["4999", "Регион 4999", "7498.5"])
+
+    def test_header_sent_before_rows_are_consumed(self):
+        consumed = []
+
+        def rows():
+            consumed.append(True)
+            yield (1,)
+        chunks = csv_chunks(["id"], rows(), bom=True)
+        self.assertEqual(next(chunks), "\ufeffid\r\n")
+        self.assertEqual(consumed, [])
+        self.assertEqual(list(chunks), ["1\r\n"])
+        self.assertEqual(consumed, [True])
+
+    def test_bom_prefix(self):
+        first = next(csv_chunks(["id"], [], bom=True))
+        self.assertTrue(first.startswith("﻿"))
+
+
+class TestColumnarExport(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(bind=self.engine)
+        self.session_factory = sessionmaker(bind=self.engine)
+        with self.session_factory() as db:
+            for i in range(2500):
+                forces = [FireForce(force_type='APS', people_count=i % 7, tecnic_count=1, aircraft_count=0)] if i % 2 else []
+                db.add(Fire(fire_date=datetime(2024, 5, 1, 12), region='Akmola' if i % 3 else 'Almaty',
+                            area=i * 0.5, damage_tenge=100.0, created_by=1, forces=forces))
+            db.commit()
+
+    def tearDown(self):
+        Base.metadata.drop_all(bind=self.engine)
+
+    def test_schema(self):
+        self.assertEqual(FIRE_ARROW_SCHEMA.field('fire_date').type, pa.timestamp('ms'))
+        for name in ('area', 'damage_tenge', 'damage_les'):
+            self.assertEqual(FIRE_ARROW_SCHEMA.field(name).type, pa.float64())
+        forces = FIRE_ARROW_SCHEMA.field('forces').type
+        self.assertTrue(pa.types.is_list(forces) and pa.types.is_struct(forces.value_type))
+
+    def test_record_batches_split_at_batch_size(self):
+        with self.session_factory() as db:
+            batches = list(iter_record_batches(db, [], batch_size=1000))
+        self.assertEqual([batch.num_rows for batch in batches], [1000, 1000, 500])
+        self.assertTrue(all(batch.schema.equals(FIRE_ARROW_SCHEMA) for batch in batches))
+
+    def test_parquet_round_trip(self):
+        table = pq.read_table(write_fires_parquet(self.session_factory, []))
+        self.assertTrue(table.schema.equals(FIRE_ARROW_SCHEMA))
+        self.assertEqual(table.num_rows, 2500)
+        rows = table.slice(1, 1).to_pylist()[0]
+        self.assertEqual((rows['fire_date'], rows['area'], rows['region']), (datetime(2024, 5, 1, 12), 0.5, 'Akmola'))
+        self.assertEqual(rows['forces'], [{'force_type': 'APS', 'people_count': 1, 'tecnic_count': 1, 'aircraft_count': 0}])
+        self.assertEqual(table.slice(0, 1).to_pylist()[0]['forces'], [])
+
+    def test_arrow_stream_round_trip(self):
+        chunks = list(stream_fires_arrow(self.session_factory, []))
+        reader = pa.ipc.open_stream(BytesIO(b''.join(chunks)))
+        self.assertTrue(reader.schema.equals(FIRE_ARROW_SCHEMA))
+        batches = list(reader)
+        self.assertEqual([batch.num_rows for batch in batches], [1000, 1000, 500])
+        self.assertEqual(pa.Table.from_batches(batches).column('region').to_pylist().count('Almaty'), 834)
+
+    def test_empty_result(self):
+        empty = [Fire.region == 'Nowhere']
+        table = pq.read_table(write_fires_parquet(self.session_factory, empty))
+        self.assertEqual((table.num_rows, table.schema.equals(FIRE_ARROW_SCHEMA)), (0, True))
+        reader = pa.ipc.open_stream(BytesIO(b''.join(stream_fires_arrow(self.session_factory, empty))))
+        self.assertEqual((reader.read_all().num_rows, reader.schema.equals(FIRE_ARROW_SCHEMA)), (0, True))
+
+
+if __name__ == "__main__":
+    unittest.main()
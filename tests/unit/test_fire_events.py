@@ -0,0 +1,63 @@
+import time
+import unittest
+from flask import Flask
+from flask_socketio import SocketIO, join_room
+from fire_events import FireEventBatcher, batch_message, user_rooms
+
+
+class TestFireEvents(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.socketio = SocketIO(self.app, async_mode='threading')
+
+        @self.socketio.on('connect')
+        def connect(auth=None):
+            for name in user_rooms(auth):
+                join_room(name)
+
+        self.batcher = FireEventBatcher(self.socketio, interval=3600)
+
+    def client(self, role, region=None):
+        return self.socketio.test_client(self.app, auth={'user_id': 1, 'role': role, 'region': region})
+
+    def events(self, client):
+        return [event['args'][0] for event in client.get_received() if event['name'] == 'new_fire']
+
+    def test_user_rooms(self):
+        self.assertEqual(user_rooms({'role': 'operator', 'region': 'Akmola'}), ['region:Akmola'])
+        self.assertEqual(user_rooms({'role': 'engineer', 'region': None}), ['region:*'])
+        self.assertEqual(user_rooms({'role': 'admin', 'region': 'Akmola'}), ['region:*'])
+
+    def test_batch_message(self):
+        self.assertEqual(batch_message([{'id': 1, 'region': 'Akmola'}])['message'], 'Новый пожар в Akmola')
+        burst = batch_message([{'id': 1, 'region': 'Akmola'}, {'id': 2, 'region': 'Akmola'}])
+        self.assertEqual((burst['message'], burst['region'], burst['fires']), ('Новых пожаров в Akmola: 2', 'Akmola', [1, 2]))
+        mixed = batch_message([{'id': 1, 'region': 'Almaty'}, {'id': 2, 'region': 'Akmola'}])
+        self.assertEqual((mixed['message'], mixed['region']), ('Новых пожаров: 2 (Akmola, Almaty)', None))
+
+    def test_burst_coalesced_per_room(self):
+        akmola, almaty, admin = self.client('operator', 'Akmola'), self.client('engineer', 'Almaty'), self.client('admin')
+        for fire_id in range(1, 4):
+            self.batcher.publish(fire_id, 'Akmola')
+        self.batcher.publish(4, 'Almaty')
+        self.assertEqual(self.batcher.flush(), 3)
+        self.assertEqual([event['fires'] for event in self.events(akmola)], [[1, 2, 3]])
+        self.assertEqual([event['fires'] for event in self.events(almaty)], [[4]])
+        self.assertEqual([event['count'] for event in self.events(admin)], [4])
+        self.assertEqual(self.batcher.flush(), 0)
+
+    def test_background_flush(self):
+        operator = self.client('operator', 'Akmola')
+        batcher = FireEventBatcher(self.socketio, interval=0.05)
+        batcher.publish(7, 'Akmola')
+        batcher.publish(8, 'Akmola')
+        deadline = time.monotonic() + 5
+        received = []
+        while not received and time.monotonic() < deadline:
+            time.sleep(0.05)
+            received = self.events(operator)
+        self.assertEqual(received, [batch_message([{'id': 7, 'region': 'Akmola'}, {'id': 8, 'region': 'Akmola'}])])
+
+
+if __name__ == '__main__':
+    unittest.main()
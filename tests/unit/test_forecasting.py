@@ -0,0 +1,154 @@
+import unittest
+from datetime import date, datetime, timedelta
+import numpy as np
+from flask import Flask, jsonify, request
+from flask_caching import Cache
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from database import Base
+from models import Fire, ForecastModel, Forecast
+import forecasting
+from forecasting import ForecastRegistry, ALL_REGIONS
+from response_cache import ResponseCache
+
+
+class TestForecastRegistry(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(bind=self.engine)
+        self.session_factory = sessionmaker(bind=self.engine)
+        self.today = date.today()
+        rng = np.random.default_rng(7)
+        with self.session_factory() as db:
+            db.add_all([
+                Fire(fire_date=datetime.combine(self.today - timedelta(days=day), datetime.min.time()),
+                     region='Akmola' if day % 3 else 'Almaty', area=float(rng.gamma(2.0, 5.0)), created_by=1)
+                for day in range(1, 181)
+            ])
+            db.commit()
+        self.registry = ForecastRegistry(self.session_factory)
+
+    def tearDown(self):
+        Base.metadata.drop_all(bind=self.engine)
+
+    def train(self, model_type, region=ALL_REGIONS):
+        with self.session_factory() as db:
+            record = forecasting.train(db, model_type, region, today=self.today)
+            db.commit()
+            return record is not None
+
+    def test_predict_from_stored_model(self):
+        self.assertTrue(self.train('arima'))
+        prediction = self.registry.predict('arima', days_ahead=10, today=self.today)
+        self.assertEqual(prediction['date'], (self.today + timedelta(days=10)).strftime('%Y-%m-%d'))
+        self.assertGreaterEqual(prediction['predicted_area'], 0.0)
+        self.assertEqual(prediction['model']['train_end'], (self.today - timedelta(days=1)).isoformat())
+        self.assertEqual(prediction['model']['fires_count'], 180)
+
+    def test_stored_model_matches_refit(self):
+        self.assertTrue(self.train('arima', 'Akmola'))
+        with self.session_factory() as db:
+            series = forecasting.load_series(db, 'Akmola', 'D', self.today).to_numpy()
+        refit = forecasting.MODEL_TYPES['arima']().fit(series).forecast(30)
+        np.testing.assert_allclose(self.registry.forecast('arima', 'Akmola', 30).to_numpy(), np.maximum(refit, 0.0))
+        loaded = self.registry.load('arima', 'Akmola')
+        np.testing.assert_allclose(loaded.forecast(30), refit)
+
+    def test_prediction_served_from_forecasts_table(self):
+        self.assertTrue(self.train('linear'))
+        with self.session_factory() as db:
+            self.assertEqual(db.query(Forecast).count(), forecasting.HORIZONS['D'])
+            target = self.today + timedelta(days=30)
+            stored = db.query(Forecast.predicted_area).filter(Forecast.period_start == target).scalar()
+        self.assertEqual(self.registry.predict('linear', days_ahead=30, today=self.today)['predicted_area'], stored)
+        self.assertNotIn(('linear', ALL_REGIONS), self.registry._loaded)
+
+    def test_beyond_horizon_uses_loaded_model(self):
+        self.assertTrue(self.train('linear'))
+        days_ahead = forecasting.HORIZONS['D'] + 10
+        self.assertIsNotNone(self.registry.predict('linear', days_ahead=days_ahead, today=self.today))
+        loaded = self.registry.load('linear')
+        self.registry.predict('linear', days_ahead=days_ahead, today=self.today)
+        self.assertIs(self.registry.load('linear'), loaded)
+
+    def test_retrained_model_reloaded(self):
+        self.assertTrue(self.train('linear'))
+        loaded = self.registry.load('linear')
+        with self.session_factory() as db:
+            db.query(ForecastModel).update({'fitted_at': datetime.utcnow() + timedelta(minutes=1)})
+            db.commit()
+        loaded.checked -= self.registry.reload_interval
+        self.assertIsNot(self.registry.load('linear'), loaded)
+
+    def test_short_series_not_trained(self):
+        self.assertFalse(self.train('sarima'))
+        self.assertIsNone(self.registry.predict('sarima', days_ahead=30, today=self.today))
+
+    def test_changed_models(self):
+        self.assertTrue(self.train('linear', 'Almaty'))
+        self.assertTrue(self.train('linear', 'Akmola'))
+        with self.session_factory() as db:
+            self.assertEqual(forecasting.changed_models(db), [])
+            db.add_all([Fire(fire_date=datetime.utcnow(), region='Almaty', area=1.0, created_by=1) for _ in range(10)])
+            db.commit()
+            self.assertEqual(forecasting.changed_models(db), [('linear', 'Almaty')])
+        self.assertEqual(forecasting.retrain_changed_forecasts(self.session_factory), 1)
+
+    def test_vectorized_series_match_per_region(self):
+        with self.session_factory() as db:
+            for freq in ('D', 'M'):
+                series = forecasting.load_all_series(db, freq, self.today)
+                self.assertEqual(set(series), {'Akmola', 'Almaty', ALL_REGIONS})
+                for region, values in series.items():
+                    expected = forecasting.load_series(db, region, freq, self.today)
+                    self.assertTrue(values.index.equals(expected.index))
+                    np.testing.assert_allclose(values.to_numpy(), expected.to_numpy())
+        self.assertEqual(series[ALL_REGIONS].sum(), series['Akmola'].sum() + series['Almaty'].sum())
+
+    def test_batch_training_in_process_pool(self):
+        trained = forecasting.train_forecasts(self.session_factory, workers=2, today=self.today)
+        self.assertEqual(trained, 6)  # linear и arima по двум регионам и стране; для sarima мало месяцев
+        self.assertEqual({model['region'] for model in self.registry.models(model_type='arima')},
+                         {'Akmola', 'Almaty', ALL_REGIONS})
+        self.assertIsNotNone(self.registry.predict('arima', 'Almaty', days_ahead=7, today=self.today))
+        self.assertEqual(len(self.registry.forecast('arima', 'Almaty')), forecasting.HORIZONS['D'])
+
+    def test_retrain_invalidates_cached_prediction(self):
+        app = Flask(__name__)
+        api_cache = ResponseCache(Cache(app, config={'CACHE_TYPE': 'SimpleCache'}))
+
+        @app.before_request
+        def authenticate():
+            request.user = {'user_id': 1, 'role': 'admin', 'region': None}
+
+        @app.route('/predict')
+        @api_cache.cached(timeout=3600, tags=lambda: ['forecasts'])
+        def predict():
+            return jsonify(self.registry.predict('linear', 'Almaty', days_ahead=7, today=self.today))
+
+        client = app.test_client()
+        self.assertEqual(forecasting.train_forecasts(self.session_factory, [('linear', 'Almaty')], workers=1, today=self.today), 1)
+        before = client.get('/predict').get_json()
+        with self.session_factory() as db:
+            db.add_all([Fire(fire_date=datetime.combine(self.today - timedelta(days=day), datetime.min.time()),
+                             region='Almaty', area=500.0, created_by=1) for day in range(1, 11)])
+            db.commit()
+        self.assertEqual(client.get('/predict').get_json(), before)
+        # Переобучение задачей tasks.py — без приложения Flask и без ResponseCache
+        self.assertEqual(forecasting.retrain_changed_forecasts(self.session_factory), 1)
+        after = client.get('/predict').get_json()
+        self.assertEqual(after['model']['fires_count'], 70)
+        self.assertNotEqual(after['predicted_area'], before['predicted_area'])
+
+    def test_metadata(self):
+        self.assertTrue(self.train('linear', 'Almaty'))
+        models = self.registry.models(region='Almaty')
+        self.assertEqual(len(models), 1)
+        self.assertEqual(models[0]['observations'], 180)
+        self.assertIsNotNone(models[0]['mae'])
+        self.assertNotIn('payload', models[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
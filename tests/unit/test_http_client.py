@@ -0,0 +1,108 @@
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from http_client import HttpClient, UpstreamError
+
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    """Отвечает JSON, пока healthy = True, иначе 500; status — принудительный код ответа."""
+    healthy = True
+    status = None
+    hits = 0
+
+    def do_GET(self):
+        FlakyHandler.hits += 1
+        if FlakyHandler.status:
+            body = b'rejected'
+            self.send_response(FlakyHandler.status)
+        elif FlakyHandler.healthy:
+            body = json.dumps({'path': self.path}).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+        else:
+            body = b'error'
+            self.send_response(500)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestHttpClient(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), FlakyHandler)
+        cls.url = f"http://127.0.0.1:{cls.server.server_address[1]}/weather"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        FlakyHandler.healthy = True
+        FlakyHandler.status = None
+        FlakyHandler.hits = 0
+        self.client = HttpClient(failure_threshold=2, reset_timeout=60)
+
+    def test_stale_payload_served_when_upstream_fails(self):
+        fresh = self.client.get_json(self.url, params={'q': 'Astana'})
+        FlakyHandler.healthy = False
+        self.assertEqual(self.client.get_json(self.url, params={'q': 'Astana'}), fresh)
+        with self.assertRaises(UpstreamError):
+            self.client.get_json(self.url, params={'q': 'Almaty'})
+
+    def test_no_fallback_raises_despite_stale_payload(self):
+        self.client.get_json(self.url, fallback=False)
+        FlakyHandler.healthy = False
+        for _ in range(2):
+            with self.assertRaises(UpstreamError):
+                self.client.get_json(self.url, fallback=False)
+        hits = FlakyHandler.hits
+        with self.assertRaises(UpstreamError):
+            self.client.get_json(self.url, fallback=False)
+        self.assertEqual(FlakyHandler.hits, hits)
+        self.assertEqual(self.client.get_json(self.url), {'path': '/weather'})
+
+    def test_open_circuit_skips_upstream(self):
+        self.client.get_json(self.url)
+        FlakyHandler.healthy = False
+        for _ in range(2):
+            self.client.get_json(self.url)
+        hits = FlakyHandler.hits
+        for _ in range(10):
+            self.assertEqual(self.client.get_json(self.url), {'path': '/weather'})
+        self.assertEqual(FlakyHandler.hits, hits)
+
+    def test_half_open_probe_closes_circuit(self):
+        FlakyHandler.healthy = False
+        for _ in range(2):
+            with self.assertRaises(UpstreamError):
+                self.client.get_json(self.url)
+        breaker = self.client.breaker(self.url)
+        self.assertFalse(breaker.allow())
+        breaker.opened_at -= 60
+        FlakyHandler.healthy = True
+        self.assertEqual(self.client.get_json(self.url), {'path': '/weather'})
+        self.assertIsNone(breaker.opened_at)
+
+    def test_client_errors_do_not_open_circuit(self):
+        self.client.get_json(self.url)
+        FlakyHandler.status = 404
+        for _ in range(5):
+            with self.assertRaises(UpstreamError):
+                self.client.get_json(self.url)  # Сохраненный ответ не маскирует ошибку запроса
+        self.assertIsNone(self.client.breaker(self.url).opened_at)
+        self.assertEqual(FlakyHandler.hits, 6)
+        FlakyHandler.status = 429
+        for _ in range(2):
+            self.assertEqual(self.client.get_json(self.url), {'path': '/weather'})
+        self.assertIsNotNone(self.client.breaker(self.url).opened_at)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from database import Base
+from models import AuditLog
+from pagination import encode_cursor, decode_cursor, keyset_page
+
+
+class TestCursor(unittest.TestCase):
+    def test_roundtrip(self):
+        value = datetime(2024, 7, 1, 12, 30, 5)
+        self.assertEqual(decode_cursor(encode_cursor(value, 42)), (value, 42))
+
+    def test_invalid_cursor(self):
+        with self.assertRaises(ValueError):
+            decode_cursor("not-a-cursor")
+
+
+class TestKeysetPage(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        Base.metadata.create_all(bind=self.engine)
+        self.db = sessionmaker(bind=self.engine)()
+        start = datetime(2024, 1, 1)
+        # Повторяющиеся метки времени проверяют порядок по id при равенстве
+        self.db.add_all([AuditLog(timestamp=start + timedelta(minutes=i // 3), user_id=1, action='INSERT',
+                                  table_name='fires', record_id=i) for i in range(50)])
+        self.db.commit()
+
+    def tearDown(self):
+        self.db.close()
+        Base.metadata.drop_all(bind=self.engine)
+
+    def test_walk_all_pages(self):
+        expected = [log.id for log in self.db.query(AuditLog).order_by(AuditLog.timestamp.desc(), AuditLog.id.desc())]
+        seen, cursor = [], ''
+        while cursor is not None:
+            rows, cursor = keyset_page(self.db.query(AuditLog), AuditLog.timestamp, AuditLog.id, cursor, 7)
+            seen.extend(row.id for row in rows)
+        self.assertEqual(seen, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
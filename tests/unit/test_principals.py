@@ -0,0 +1,113 @@
+import unittest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from database import Base
+from models import User
+from cache_tags import TagStore
+from principals import PrincipalCache
+
+
+class TestPrincipalCache(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(bind=self.engine)
+        self.session_factory = sessionmaker(bind=self.engine)
+        with self.session_factory() as db:
+            db.add_all([
+                User(id=1, username='admin', password_hash='x', role='admin'),
+                User(id=2, username='operator', password_hash='x', role='operator', region='Akmola')
+            ])
+            db.commit()
+        self.statements = []
+        event.listen(self.engine, 'before_cursor_execute', self.record)
+        self.cache = PrincipalCache()
+
+    def tearDown(self):
+        event.remove(self.engine, 'before_cursor_execute', self.record)
+        Base.metadata.drop_all(bind=self.engine)
+
+    def record(self, conn, cursor, statement, *args):
+        self.statements.append(statement)
+
+    def load(self, user_id):
+        with self.session_factory() as db:
+            return self.cache.load(db, user_id)
+
+    def test_repeated_lookups_skip_database(self):
+        first = self.load(2)
+        self.assertEqual((first.username, first.role, first.region), ('operator', 'operator', 'Akmola'))
+        queries = len(self.statements)
+        second = self.load(2)
+        self.assertEqual(len(self.statements), queries)
+        self.assertIsNot(second, first)
+        self.assertEqual(second.region, 'Akmola')
+
+    def test_attached_user_changes_are_saved(self):
+        self.load(2)
+        with self.session_factory() as db:
+            user = self.cache.attach(db, 2)
+            self.assertIn(user, db)
+            user.region = 'Almaty'
+            db.commit()
+        self.cache.invalidate(2)
+        with self.session_factory() as db:
+            self.assertEqual(db.get(User, 2).region, 'Almaty')
+        self.assertEqual(self.load(2).region, 'Almaty')
+
+    def test_invalidate_and_ttl(self):
+        self.assertEqual(self.load(1).role, 'admin')
+        with self.session_factory() as db:
+            db.get(User, 1).role = 'analyst'
+            db.commit()
+        self.assertEqual(self.load(1).role, 'analyst')
+        queries = len(self.statements)
+        self.cache.invalidate(1)
+        self.assertEqual(self.load(1).role, 'analyst')
+        self.assertGreater(len(self.statements), queries)
+        expiring = PrincipalCache(ttl=0)
+        with self.session_factory() as db:
+            expiring.load(db, 1)
+            queries = len(self.statements)
+            expiring.load(db, 1)
+        self.assertGreater(len(self.statements), queries)
+
+    def test_deleted_user(self):
+        self.load(2)
+        with self.session_factory() as db:
+            db.delete(db.get(User, 2))
+            db.commit()
+        self.cache.invalidate(2)
+        self.assertIsNone(self.load(2))
+        self.assertIsNone(self.load(99))
+
+    def test_changes_from_other_process(self):
+        store = TagStore()  # Версии тегов в Redis, общем для процессов
+        web, api = PrincipalCache(tag_store=store), PrincipalCache(tag_store=store)
+        with self.session_factory() as db:
+            self.assertEqual(web.load(db, 2).role, 'operator')
+            api.load(db, 2)
+            queries = len(self.statements)
+            web.load(db, 2)
+            self.assertEqual(len(self.statements), queries)
+        api.invalidate(2)  # Например, смена пароля через FastAPI
+        with self.session_factory() as db:
+            web.load(db, 2)
+        self.assertGreater(len(self.statements), queries)
+        # Массовое изменение users сбрасывает всех пользователей
+        self.assertEqual((self.load(1).region, self.load(2).region), (None, 'Akmola'))
+        with self.session_factory() as db:
+            db.query(User).update({'region': 'Almaty'})
+            db.commit()
+        self.assertEqual((self.load(1).region, self.load(2).region), ('Almaty', 'Almaty'))
+
+    def test_bounded_size(self):
+        cache = PrincipalCache(max_items=1)
+        with self.session_factory() as db:
+            cache.load(db, 1)
+            cache.load(db, 2)
+        self.assertEqual(list(cache._items), [2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,31 @@
+import unittest
+import numpy as np
+from region_index import RegionIndex
+
+
+class TestRegionIndex(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.index = RegionIndex()
+
+    def test_known_points(self):
+        self.assertEqual(self.index.region_at(51.16, 71.47), 'Акмолинская область')
+        self.assertEqual(self.index.region_at(43.24, 76.89), 'Алматинская область')
+
+    def test_point_outside(self):
+        self.assertIsNone(self.index.region_at(55.75, 37.62))
+        self.assertEqual(self.index.lookup([], []), [])
+
+    def test_mismatched_lengths(self):
+        with self.assertRaises(ValueError):
+            self.index.lookup([50.0, 51.0], [70.0])
+
+    def test_grid_matches_exact_test(self):
+        rng = np.random.default_rng(7)
+        lats, lons = rng.uniform(40, 56, 50000), rng.uniform(46, 88, 50000)
+        exact = self.index._exact_codes(lats, lons, self.index.regions)
+        np.testing.assert_array_equal(self.index.lookup_codes(lats, lons), exact)
+
+
+if __name__ == '__main__':
+    unittest.main()
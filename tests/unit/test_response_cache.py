@@ -0,0 +1,344 @@
+import queue
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from flask import Flask, jsonify, request
+from flask_caching import Cache
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from database import Base
+from models import AuditLog, Fire, FireForce, User
+from audit import AuditQueue
+import cache_tags
+import response_cache
+from cache_tags import TagStore
+from response_cache import LocalCache, ResponseCache, decode_entry, encode_entry, request_year
+
+
+class FakeRedis:
+    """Redis, общий для нескольких процессов: ключи и pub/sub в памяти."""
+
+    def __init__(self):
+        self.data = {}
+        self.subscribers = []
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+
+    def set(self, key, value, nx=False):
+        with self.lock:
+            if nx and key in self.data:
+                return None
+            self.data[key] = value.encode()
+            return True
+
+    def mset(self, mapping):
+        with self.lock:
+            self.data.update({key: value.encode() for key, value in mapping.items()})
+        return True
+
+    def publish(self, channel, message):
+        for messages in list(self.subscribers):
+            messages.put({'type': 'message', 'channel': channel, 'data': message})
+        return len(self.subscribers)
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        return FakePubSub(self)
+
+
+class FakePubSub:
+    def __init__(self, server):
+        self.server = server
+        self.messages = queue.Queue()
+
+    def subscribe(self, channel):
+        self.server.subscribers.append(self.messages)
+
+    def listen(self):
+        while True:
+            yield self.messages.get()
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(bind=self.engine)
+        self.session_factory = sessionmaker(bind=self.engine)
+        with self.session_factory() as db:
+            db.add_all([
+                Fire(fire_date=datetime(2024, 5, 1), region='Akmola', area=10.0, created_by=1),
+                Fire(fire_date=datetime(2024, 6, 1), region='Almaty', area=5.0, created_by=1)
+            ])
+            db.commit()
+        self.app = Flask(__name__)
+        self.backend = Cache(self.app, config={'CACHE_TYPE': 'SimpleCache'})
+        self.cache = ResponseCache(self.backend, wait_timeout=5, poll_interval=0.01)
+        self.calls = 0
+
+        def authenticate():
+            role, _, region = request.headers['X-User'].partition(':')
+            request.user = {'user_id': 1, 'role': role, 'region': region or None}
+
+        def fire_tags():
+            scope = request.user['region'] if request.user['role'] in response_cache.SCOPED_ROLES else None
+            return response_cache.fire_tags(scope, request.args.get('year', type=int))
+
+        @self.app.route('/fires')
+        @self.cache.cached(timeout=3600, tags=fire_tags)
+        def fires():
+            self.calls += 1
+            region = request.user['region'] if request.user['role'] in response_cache.SCOPED_ROLES else None
+            with self.session_factory() as db:
+                query = db.query(Fire)
+                if region:
+                    query = query.filter(Fire.region == region)
+                return jsonify({'total': query.count()})
+
+        @self.app.route('/users')
+        @self.cache.cached(timeout=3600, tags=lambda: ['users'])
+        def users():
+            self.calls += 1
+            with self.session_factory() as db:
+                return jsonify({'total': db.query(User).count()})
+
+        @self.app.route('/logs')
+        @self.cache.cached(timeout=600, tags=lambda: ['logs'])
+        def logs():
+            self.calls += 1
+            if request.args.get('fail'):
+                return jsonify({'success': False}), 403
+            with self.session_factory() as db:
+                return jsonify({'total': db.query(AuditLog).count()})
+
+        @self.app.route('/summary')
+        @self.cache.cached(timeout=3600, tags=lambda: response_cache.fire_tags())
+        def summary():
+            self.calls += 1
+            time.sleep(0.2)  # Тяжелая агрегация
+            return jsonify({'total': self.calls})
+
+        self.app.before_request(authenticate)
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        Base.metadata.drop_all(bind=self.engine)
+
+    def get(self, path, user='admin'):
+        response = self.client.get(path, headers={'X-User': user})
+        self.assertEqual(response.status_code, 200)
+        return response.get_json()['total']
+
+    def add_fire(self, region, date):
+        with self.session_factory() as db:
+            db.add(Fire(fire_date=date, region=region, area=1.0, created_by=1))
+            db.commit()
+
+    def test_key_includes_role_and_region(self):
+        self.assertEqual(self.get('/fires', 'engineer:Akmola'), 1)
+        self.assertEqual(self.get('/fires', 'engineer:Almaty'), 1)
+        self.assertEqual(self.get('/fires', 'admin'), 2)
+        self.assertEqual(self.calls, 3)
+        self.assertEqual(self.get('/fires', 'engineer:Akmola'), 1)
+        self.assertEqual(self.get('/fires?b=1&a=2', 'admin'), 2)
+        self.assertEqual(self.get('/fires?a=2&b=1', 'admin'), 2)
+        self.assertEqual(self.calls, 4)
+
+    def test_fire_write_invalidates_matching_window(self):
+        for path, user in [('/fires', 'engineer:Akmola'), ('/fires', 'engineer:Almaty'),
+                           ('/fires?year=2023', 'admin'), ('/fires', 'admin')]:
+            self.get(path, user)
+        self.add_fire('Akmola', datetime(2024, 7, 1))
+        self.calls = 0
+        self.assertEqual(self.get('/fires', 'engineer:Akmola'), 2)
+        self.assertEqual(self.get('/fires', 'admin'), 3)
+        self.assertEqual(self.calls, 2)
+        self.get('/fires', 'engineer:Almaty')
+        self.get('/fires?year=2023', 'admin')
+        self.assertEqual(self.calls, 2)
+
+    def test_update_invalidates_old_region(self):
+        self.assertEqual(self.get('/fires', 'operator:Almaty'), 1)
+        with self.session_factory() as db:
+            db.query(Fire).filter_by(region='Almaty').one().region = 'Akmola'
+            db.commit()
+        self.assertEqual(self.get('/fires', 'operator:Almaty'), 0)
+
+    def test_force_write_invalidates_fire_window(self):
+        self.get('/fires', 'engineer:Almaty')
+        with self.session_factory() as db:
+            fire = db.query(Fire).filter_by(region='Almaty').one()
+            fire.forces.append(FireForce(force_type='APS', people_count=3, tecnic_count=0, aircraft_count=0))
+            db.commit()
+        self.get('/fires', 'engineer:Almaty')
+        self.assertEqual(self.calls, 2)
+
+    def test_user_and_audit_writes(self):
+        self.assertEqual(self.get('/users'), 0)
+        self.assertEqual(self.get('/logs'), 0)
+        self.get('/fires')
+        with self.session_factory() as db:
+            db.add(User(username='operator1', password_hash='x', role='operator', region='Akmola'))
+            db.commit()
+        queue = AuditQueue(self.session_factory)
+        queue.put(1, 'INSERT', 'users', 1)
+        queue.close()
+        self.assertEqual(self.get('/users'), 1)
+        self.assertEqual(self.get('/logs'), 1)
+        self.get('/fires')
+        self.assertEqual(self.calls, 5)
+
+    def test_rollback_keeps_cache(self):
+        self.get('/fires')
+        with self.session_factory() as db:
+            db.add(Fire(fire_date=datetime(2024, 7, 1), region='Akmola', area=1.0, created_by=1))
+            db.flush()
+            db.rollback()
+        self.get('/fires')
+        self.assertEqual(self.calls, 1)
+
+    def test_errors_not_cached(self):
+        self.assertEqual(self.client.get('/logs?fail=1', headers={'X-User': 'admin'}).status_code, 403)
+        self.client.get('/logs?fail=1', headers={'X-User': 'admin'})
+        self.assertEqual(self.calls, 2)
+
+    def test_concurrent_misses_coalesced(self):
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            totals = list(pool.map(lambda _: self.get('/summary'), range(8)))
+        self.assertEqual(totals, [1] * 8)
+        self.assertEqual(self.calls, 1)
+        stats = self.cache.stats()
+        self.assertEqual((stats['misses'], stats['coalesced']), (1, 7))
+
+    def expire_and_lock(self, path):
+        with self.app.test_request_context(path, headers={'X-User': 'admin'}):
+            request.user = {'user_id': 1, 'role': 'admin', 'region': None}
+            key = self.cache.key(response_cache.fire_tags())
+        entry = decode_entry(self.backend.get(key))
+        if entry is not None:
+            self.backend.set(key, encode_entry(entry[:2] + (time.time() - 1,)))
+        self.cache.local.delete(key)
+        self.backend.add(f"lock:{key}", 'other-worker', timeout=60)
+        return key
+
+    def test_expired_entry_served_while_other_worker_refreshes(self):
+        self.get('/summary')
+        key = self.expire_and_lock('/summary')
+        self.assertEqual(self.get('/summary'), 1)
+        self.assertEqual((self.calls, self.cache.stats()['stale']), (1, 1))
+        self.backend.delete(f"lock:{key}")
+        self.assertEqual(self.get('/summary'), 2)
+        self.assertEqual(self.get('/summary'), 2)
+        self.assertEqual(self.cache.stats()['misses'], 2)
+
+    def test_stuck_lock_falls_back_to_own_computation(self):
+        self.cache.wait_timeout = 0.1
+        self.expire_and_lock('/summary')
+        self.assertEqual(self.get('/summary'), 1)
+        self.assertEqual(self.cache.stats()['fallbacks'], 1)
+
+    def test_request_year(self):
+        self.assertEqual(request_year(2024, None, None), 2024)
+        self.assertEqual(request_year(None, '2024-01-01', '2024-12-31'), 2024)
+        self.assertIsNone(request_year(None, '2023-12-01', '2024-01-31'))
+        self.assertIsNone(request_year(None, '2024-01-01', None))
+        self.assertIsNone(request_year(None, 'bad', 'bad'))
+
+    def test_local_tier_serves_repeated_hits(self):
+        self.get('/fires')
+        self.get('/fires')
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+        self.assertEqual(stats['l2'], {'hits': 0, 'misses': 1})
+        other = ResponseCache(self.backend)  # Другой процесс с пустым L1
+        with self.app.test_request_context('/fires'):
+            request.user = {'user_id': 1, 'role': 'admin', 'region': None}
+            key = other.key(response_cache.fire_tags())
+        self.assertIsNotNone(other._get(key))
+        self.assertIsNotNone(other._get(key))
+        self.assertEqual(other.stats()['l2']['hits'], 1)
+        self.assertEqual(other.stats()['l1']['hits'], 1)
+
+    def test_pubsub_versions_invalidate_other_process(self):
+        server = FakeRedis()
+        worker, task = TagStore(server), TagStore(server)
+        before = worker.versions(['users', 'fires'])
+        self.assertTrue(worker._subscribed.wait(1))
+        self.assertEqual(task.versions(['users', 'fires']), before)
+        task.bump(['users'])
+        self.assertTrue(wait_until(lambda: worker.versions(['users']) != {'users': before['users']}))
+        self.assertEqual(worker.versions(['users', 'fires']), task.versions(['users', 'fires']))
+        self.assertEqual(TagStore(server).versions(['fires']), {'fires': before['fires']})
+
+    def test_commit_in_process_without_flask_invalidates(self):
+        server = FakeRedis()
+        self.cache._tag_store = TagStore(server)  # Воркер Flask
+        previous = cache_tags.get_store()
+        cache_tags.configure(TagStore(server))  # Процесс FastAPI или tasks.py, без ResponseCache
+        self.addCleanup(cache_tags.configure, previous)
+        self.assertEqual(self.get('/users'), 0)
+        self.assertEqual(self.get('/fires', 'engineer:Akmola'), 1)
+        with self.session_factory() as db:
+            db.add(User(username='operator1', password_hash='x', role='operator', region='Akmola'))
+            db.commit()
+        self.assertTrue(wait_until(lambda: self.get('/users') == 1))
+        self.get('/fires', 'engineer:Akmola')
+        self.assertEqual(self.calls, 3)
+
+
+class TestLocalCache(unittest.TestCase):
+    def test_lru_eviction_by_items(self):
+        cache = LocalCache(max_items=2)
+        cache.set('a', b'1', 60)
+        cache.set('b', b'2', 60)
+        cache.get('a')
+        cache.set('c', b'3', 60)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual((cache.get('a'), cache.get('c')), (b'1', b'3'))
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_eviction_by_bytes(self):
+        cache = LocalCache(max_bytes=100)
+        cache.set('a', b'x' * 60, 60)
+        cache.set('b', b'x' * 30, 60)
+        cache.set('c', b'x' * 30, 60)
+        self.assertIsNone(cache.get('a'))
+        self.assertLessEqual(cache.stats()['bytes'], 100)
+        cache.set('big', b'x' * 200, 60)
+        self.assertIsNone(cache.get('big'))
+
+    def test_ttl_and_clear(self):
+        cache = LocalCache()
+        cache.set('a', b'1', -1)
+        cache.set('tag:fires', 'v1', 60)
+        cache.set('view:x', b'2', 60)
+        self.assertIsNone(cache.get('a'))
+        cache.clear('tag:')
+        self.assertIsNone(cache.get('tag:fires'))
+        self.assertEqual(cache.get('view:x'), b'2')
+        self.assertEqual(cache.stats()['items'], 1)
+
+    def test_entry_encoding(self):
+        small = (b'{"total": 1}', 'application/json', 1.5)
+        large = (b'{"data": [' + b'1, ' * 2000 + b'1]}', 'application/json', 2.5)
+        self.assertEqual(decode_entry(encode_entry(small)), small)
+        self.assertEqual(decode_entry(encode_entry(large)), large)
+        self.assertLess(len(encode_entry(large)), len(large[0]) // 10)
+        self.assertIsNone(decode_entry(None))
+
+
+if __name__ == '__main__':
+    unittest.main()
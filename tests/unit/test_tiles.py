@@ -0,0 +1,52 @@
+import json
+import os
+import unittest
+import numpy as np
+from tiles import RegionTiles, GEOJSON_PATH, simplify, tile_bounds
+
+
+class TestSimplify(unittest.TestCase):
+    def test_collinear_points_removed(self):
+        points = np.array([[0, 0], [1, 0.001], [2, 0], [3, 0.001], [4, 0]], dtype=float)
+        np.testing.assert_array_equal(simplify(points, 0.01), [[0, 0], [4, 0]])
+
+    def test_corner_kept(self):
+        points = np.array([[0, 0], [1, 0], [2, 0], [2, 1], [2, 2]], dtype=float)
+        np.testing.assert_array_equal(simplify(points, 0.1), [[0, 0], [2, 0], [2, 2]])
+
+    def test_closed_ring_keeps_endpoints(self):
+        ring = np.array([[0, 0], [1, 0], [1, 1], [0, 1], [0, 0]], dtype=float)
+        self.assertEqual(len(simplify(ring, 0.1)), 5)
+
+
+class TestRegionTiles(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tiles = RegionTiles()
+
+    def test_tile_bounds(self):
+        west, south, east, north = tile_bounds(0, 0, 0)
+        self.assertEqual((west, east), (-180.0, 180.0))
+        self.assertAlmostEqual(north, 85.0511, places=3)
+        self.assertAlmostEqual(south, -85.0511, places=3)
+
+    def test_country_tile_is_small(self):
+        body, etag = self.tiles.tile(3, 5, 2)
+        collection = json.loads(body)
+        self.assertEqual(len(collection['features']), 17)
+        self.assertLess(len(body), os.path.getsize(GEOJSON_PATH) / 50)
+        self.assertEqual(self.tiles.tile(3, 5, 2)[1], etag)
+
+    def test_empty_tile(self):
+        body, _ = self.tiles.tile(5, 0, 0)
+        self.assertEqual(json.loads(body)['features'], [])
+
+    def test_detail_grows_with_zoom(self):
+        def vertices(z):
+            return sum(len(ring) for item in self.tiles._level(z)
+                       for polygon in item['feature']['geometry']['coordinates'] for ring in polygon)
+        self.assertLess(vertices(4), vertices(8))
+
+
+if __name__ == '__main__':
+    unittest.main()